@@ -1,29 +1,54 @@
 from django.contrib import admin
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponseNotAllowed
-from django.shortcuts import redirect
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import path, reverse
 
-from .models import Activity, ActivityQueue, ActivityQueueItem, Category, Group, History, Schedule
+from config.db_router import replica_reads
+from .models import (
+    Activity,
+    ActivityQueue,
+    ActivityQueueItem,
+    Category,
+    Group,
+    History,
+    ImportJob,
+    Schedule,
+    ScopeRegistry,
+)
 from .services.activity_queue_reconciliation import activity_snapshot, reconcile_activity
-from .services.steam_import import SteamImportError, import_steam_games
+from .services.import_jobs import job_status, latest_import_job, start_steam_import
+
+
+class ReplicaChangeListMixin:
+    """Lê a listagem da réplica; ações em lote (POST) continuam no principal."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method not in ('GET', 'HEAD'):
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            # O TemplateResponse avalia os querysets ao renderizar.
+            if hasattr(response, 'render'):
+                response.render()
+        return response
 
 
 @admin.register(Group)
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'is_default', 'color', 'max_daily_minutes')
     list_filter = ('is_default',)
     search_fields = ('name',)
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'group', 'color', 'max_daily_executions')
     list_filter = ('group',)
     search_fields = ('name',)
 
 @admin.register(Activity)
-class ActivityAdmin(admin.ModelAdmin):
+class ActivityAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     change_list_template = 'admin/pomodoro/activity/change_list.html'
     list_display = (
         'name',
@@ -46,65 +71,123 @@ class ActivityAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.import_steam_games_view),
                 name='pomodoro_activity_import_steam',
             ),
+            path(
+                'importar-jogos-steam/<int:job_id>/status/',
+                self.admin_site.admin_view(self.import_steam_status_view),
+                name='pomodoro_activity_import_steam_status',
+            ),
         ]
         return custom_urls + super().get_urls()
 
+    def _can_import(self, request):
+        return self.has_add_permission(request) and self.has_change_permission(request)
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method in ('GET', 'HEAD') and self._can_import(request):
+            # Lido no principal: o job acabou de ser gravado e a réplica pode atrasar.
+            extra_context = {**(extra_context or {}), 'steam_import_job': latest_import_job()}
+        return super().changelist_view(request, extra_context)
+
     def import_steam_games_view(self, request):
         if request.method != 'POST':
             return HttpResponseNotAllowed(['POST'])
-        if not self.has_add_permission(request) or not self.has_change_permission(request):
+        if not self._can_import(request):
             raise PermissionDenied
 
         try:
-            result = import_steam_games()
-        except SteamImportError as exc:
-            self.message_user(request, str(exc), level=messages.ERROR)
+            job, created = start_steam_import(requested_by=request.user)
         except Exception:
             self.message_user(
                 request,
-                'Não foi possível concluir a importação da Steam.',
+                'Não foi possível iniciar a importação da Steam.',
                 level=messages.ERROR,
             )
         else:
-            level = messages.SUCCESS if result.errors == 0 else messages.WARNING
-            self.message_user(
-                request,
-                (
-                    f'Steam: {result.total} jogos encontrados; '
-                    f'{result.created} criados; {result.updated} atualizados; '
-                    f'{result.skipped} ignorados; {result.errors} erros.'
-                ),
-                level=level,
-            )
+            if created:
+                message = f'Importação da Steam #{job.id} iniciada; o progresso aparece abaixo.'
+            else:
+                message = f'A importação da Steam #{job.id} já está em andamento.'
+            self.message_user(request, message, level=messages.INFO)
 
         return redirect(reverse('admin:pomodoro_activity_changelist'))
 
+    def import_steam_status_view(self, request, job_id):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        if not self._can_import(request):
+            raise PermissionDenied
+        job = get_object_or_404(ImportJob, pk=job_id, source=ImportJob.SOURCE_STEAM)
+        return JsonResponse(job_status(job))
+
     def save_model(self, request, obj, form, change):
         previous = activity_snapshot(Activity.objects.get(pk=obj.pk)) if change else None
         super().save_model(request, obj, form, change)
         reconcile_activity(obj, previous=previous)
 
 @admin.register(History)
-class HistoryAdmin(admin.ModelAdmin):
+class HistoryAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('activity', 'start_time', 'duration')
     list_filter = ('activity',)
     date_hierarchy = 'start_time'
 
 @admin.register(Schedule)
-class ScheduleAdmin(admin.ModelAdmin):
+class ScheduleAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('activity', 'scheduled_date', 'completed')
     list_filter = ('completed', 'activity')
     date_hierarchy = 'scheduled_date'
 
 
 @admin.register(ActivityQueue)
-class ActivityQueueAdmin(admin.ModelAdmin):
-    list_display = ('id', 'scope_key', 'group', 'mode', 'state', 'pool_size', 'consumed_count')
+class ActivityQueueAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = (
+        'id',
+        'scope_key',
+        'group',
+        'mode',
+        'state',
+        'pool_size',
+        'consumed_count',
+        'expired_count',
+    )
     list_filter = ('state', 'mode', 'group')
-    readonly_fields = ('created_at', 'closed_at')
+    readonly_fields = ('created_at', 'closed_at', 'version')
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'source',
+        'state',
+        'total',
+        'created',
+        'updated',
+        'skipped',
+        'errors',
+        'requested_by',
+        'created_at',
+        'finished_at',
+    )
+    list_filter = ('source', 'state')
+    readonly_fields = [field.name for field in ImportJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ScopeRegistry)
+class ScopeRegistryAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('scope_key', 'default_group', 'first_seen_at', 'last_seen_at')
+    list_filter = ('default_group',)
+    list_select_related = ('default_group',)
+    ordering = ('-last_seen_at',)
+    readonly_fields = ('scope_key', 'first_seen_at', 'last_seen_at', 'default_group')
+
+    def has_add_permission(self, request):
+        return False
 
 
 @admin.register(ActivityQueueItem)
-class ActivityQueueItemAdmin(admin.ModelAdmin):
+class ActivityQueueItemAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'queue', 'activity', 'position', 'state')
     list_filter = ('state', 'queue__group')
@@ -0,0 +1,103 @@
+"""Servidor HTTP local que imita o GetOwnedGames da Steam, para testes e benchmarks."""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def owned_games_payload(count: int, *, start: int = 1, name_prefix: str = 'Jogo') -> bytes:
+    games = [
+        {
+            'appid': appid,
+            'name': f'{name_prefix} {appid}',
+            'playtime_forever': appid % 600,
+            'img_icon_url': f'{appid:040x}',
+        }
+        for appid in range(start, start + count)
+    ]
+    return json.dumps({'response': {'game_count': count, 'games': games}}).encode()
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clientes que desistem por timeout fecham a conexão no meio da resposta.
+        pass
+
+
+class FakeSteamServer:
+    """Serve ``payload`` em blocos de ``chunk_size`` bytes, com transferência chunked.
+
+    ``responses`` permite enfileirar status antes do payload normal, por
+    exemplo ``[503, 503]`` para simular uma indisponibilidade passageira, ou
+    ``[(429, {'Retry-After': '1'})]`` com cabeçalhos. ``delay`` atrasa cada
+    resposta, para simular timeouts.
+    """
+
+    def __init__(self, payload: bytes = b'', *, chunk_size: int = 16 * 1024):
+        self.payload = payload
+        self.chunk_size = chunk_size
+        self.responses: list[int | tuple[int, dict[str, str]]] = []
+        self.requests: list[dict[str, object]] = []
+        self.delay = 0.0
+        self._server = _QuietServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={'poll_interval': 0.05},
+            daemon=True,
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/IPlayerService/GetOwnedGames/v1/'
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                # A porta do cliente identifica a conexão, para testar o keep-alive.
+                fake.requests.append(
+                    {'path': self.path, 'client_port': self.client_address[1], **dict(self.headers)}
+                )
+                if fake.delay:
+                    time.sleep(fake.delay)
+                status, headers = fake.responses.pop(0) if fake.responses else 200, {}
+                if isinstance(status, tuple):
+                    status, headers = status
+                if status != 200:
+                    body = b'{}'
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for offset in range(0, len(fake.payload), fake.chunk_size):
+                    chunk = fake.payload[offset:offset + fake.chunk_size]
+                    self.wfile.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+                self.wfile.write(b'0\r\n\r\n')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
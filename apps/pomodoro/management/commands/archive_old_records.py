@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.pomodoro.services.archival import archive_old_records
+
+
+class Command(BaseCommand):
+    help = 'Arquiva filas encerradas, execucoes, historicos e eventos antigos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Horizonte de retencao em dias, no minimo 1 (padrao: ARCHIVE_RETENTION_DAYS).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Quantidade de filas ou execucoes por transacao.',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Interrompe apos este numero de lotes; uma nova execucao continua.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Percorre os lotes e reverte todas as escritas.',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size precisa ser positivo.')
+        if options['days'] is not None and options['days'] < 1:
+            raise CommandError('--days precisa ser pelo menos 1.')
+        try:
+            summary = archive_old_records(
+                days=options['days'],
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches'],
+                dry_run=options['dry_run'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(json.dumps(summary.as_dict(), sort_keys=True))
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.pomodoro.services.preference_weights import rebuild_preference_weights
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os pesos de preferencia a partir dos eventos gravados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Quantidade de eventos lidos e pesos gravados por lote.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calcula o agregado e reverte todas as escritas.',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size precisa ser positivo.')
+        summary = rebuild_preference_weights(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        self.stdout.write(json.dumps(
+            {'dry_run': options['dry_run'], **summary.as_dict()},
+            sort_keys=True,
+        ))
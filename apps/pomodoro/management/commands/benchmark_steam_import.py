@@ -0,0 +1,86 @@
+import json
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from apps.pomodoro.fake_steam_server import FakeSteamServer, owned_games_payload
+from apps.pomodoro.models import Category, Group
+from apps.pomodoro.services.external_import import ImportTimings, _persist_item
+from apps.pomodoro.services.steam_import import import_steam_games, steam_source
+
+
+@contextmanager
+def count_queries():
+    """Conta as consultas sem guardar o SQL, que estoura o limite do CaptureQueriesContext."""
+    counter = {'queries': 0}
+
+    def wrapper(execute, sql, params, many, context):
+        counter['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a importacao da Steam contra um servidor local com uma biblioteca '
+        'sintetica; todas as escritas sao revertidas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=10_000)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--per-game',
+            action='store_true',
+            help='Mede tambem o caminho antigo, uma transacao por jogo.',
+        )
+
+    def handle(self, *args, **options):
+        if options['games'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--games e --batch-size precisam ser positivos.')
+        payload = owned_games_payload(options['games'])
+        report = {'games': options['games'], 'payload_bytes': len(payload)}
+        with FakeSteamServer(payload) as server:
+            report['batched'] = self._measure(server, options, batched=True)
+            if options['per_game']:
+                report['per_game'] = self._measure(server, options, batched=False)
+        self.stdout.write(json.dumps(report, sort_keys=True))
+
+    def _measure(self, server, options, *, batched):
+        with transaction.atomic():
+            group = Group.objects.create(name='Benchmark Steam')
+            category = Category.objects.create(
+                name='Benchmark Steam',
+                group=group,
+                max_daily_executions=options['games'],
+            )
+            with override_settings(
+                STEAM_API_URL=server.url,
+                STEAM_API_KEY='benchmark',
+                STEAM_ID64='1',
+                STEAM_ACTIVITY_CATEGORY_ID=category.id,
+                STEAM_IMPORT_BATCH_SIZE=options['batch_size'],
+            ), count_queries() as counter:
+                started = time.perf_counter()
+                if batched:
+                    import_steam_games()
+                else:
+                    self._per_game()
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return {
+            'seconds': round(elapsed, 3),
+            'games_per_second': round(options['games'] / elapsed),
+            'queries': counter['queries'],
+        }
+
+    def _per_game(self):
+        source = steam_source()
+        timings = ImportTimings()
+        for game in source.iter_records(None):
+            _persist_item(source.normalize(game), source, timings=timings)
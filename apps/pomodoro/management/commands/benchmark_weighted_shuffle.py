@@ -0,0 +1,107 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.pomodoro.models import (
+    Activity,
+    ActivityPreferenceWeight,
+    ActivityQueue,
+    Category,
+    Group,
+)
+from apps.pomodoro.services.activity_queue import (
+    _create_normal_queue,
+    _weighted_order,
+    eligible_activity_rows,
+)
+
+
+SCOPE_KEY = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a ordenacao ponderada da criacao de filas, com os pesos de favoritas '
+        'lidos do banco, e a criacao da fila; todas as escritas sao revertidas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--activities', type=int, default=10_000)
+        parser.add_argument('--favorite-ratio', type=float, default=0.1)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['activities'] < 1 or options['repeat'] < 1:
+            raise CommandError('--activities e --repeat precisam ser positivos.')
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            group, favorites = self._seed(options, rng)
+            rows = eligible_activity_rows(selected_group=group)
+            phases = {
+                # Pesos de favoritas, chaves e ordenação sobre as linhas já lidas.
+                'weighted_order': self._measure(
+                    options,
+                    lambda: _weighted_order(rows, SCOPE_KEY, group, rng=rng),
+                ),
+                # Caminho completo: elegibilidade, ordenação e gravação dos itens.
+                'create_queue': self._measure(
+                    options,
+                    lambda: _create_normal_queue(SCOPE_KEY, group),
+                    after=lambda: ActivityQueue.objects.filter(scope_key=SCOPE_KEY, group=group).delete(),
+                ),
+            }
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps({
+            'activities': options['activities'],
+            'eligible': len(rows),
+            'favorites': favorites,
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+            'phases': phases,
+        }, sort_keys=True))
+
+    def _seed(self, options, rng):
+        group = Group.objects.create(name='Benchmark Fila')
+        category = Category.objects.create(
+            name='Benchmark Fila',
+            group=group,
+            max_daily_executions=options['activities'],
+        )
+        activities = Activity.objects.bulk_create([
+            Activity(name=f'Benchmark {index}', category=category, duration=25)
+            for index in range(options['activities'])
+        ])
+        now = timezone.now()
+        weights = ActivityPreferenceWeight.objects.bulk_create([
+            ActivityPreferenceWeight(
+                scope_key=SCOPE_KEY,
+                group=group,
+                activity=activity,
+                favorite_score=1,
+                event_count=1,
+                decayed_at=now,
+            )
+            for activity in activities
+            if rng.random() < options['favorite_ratio']
+        ])
+        return group, len(weights)
+
+    def _measure(self, options, run, *, after=None):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+            if after is not None:
+                after()
+        best = min(timings)
+        return {
+            'best_ms': round(best * 1000, 3),
+            'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+            'activities_per_second': round(options['activities'] / best),
+        }
@@ -0,0 +1,48 @@
+import json
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.pomodoro.services.external_import import ExternalImportError
+from apps.pomodoro.services.file_import import FORMATS, import_activities_file
+
+
+class Command(BaseCommand):
+    help = 'Importa atividades de um arquivo CSV ou JSON local.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--source',
+            required=True,
+            help='Valor de external_source das atividades importadas, por exemplo "planilha".',
+        )
+        parser.add_argument('--category', type=int, required=True, help='ID da categoria de destino.')
+        parser.add_argument('--duration', type=int, default=60, help='Duracao das atividades criadas.')
+        parser.add_argument('--format', choices=FORMATS, default=None, help='Padrao: extensao do arquivo.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--only-changed',
+            action='store_true',
+            help=(
+                'Compara com as atividades apenas os itens que mudaram desde a ultima importacao. '
+                'Atividades removidas sao recriadas; edicoes locais so sao desfeitas sem esta opcao.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['duration'] < 1:
+            raise CommandError('--batch-size e --duration precisam ser positivos.')
+        try:
+            result = import_activities_file(
+                options['path'],
+                source_name=options['source'],
+                category_id=options['category'],
+                default_duration=options['duration'],
+                file_format=options['format'],
+                batch_size=options['batch_size'],
+                only_changed=options['only_changed'],
+            )
+        except ExternalImportError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(json.dumps(asdict(result), sort_keys=True))
@@ -0,0 +1,64 @@
+import json
+import time
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.pomodoro.services.external_import import ImportTimings
+from apps.pomodoro.services.steam_import import SteamImportError, import_steam_games
+
+
+class Command(BaseCommand):
+    help = 'Importa a biblioteca Steam configurada como atividades.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only-changed',
+            action='store_true',
+            help=(
+                'Compara com as atividades apenas os jogos que mudaram desde a ultima importacao. '
+                'Atividades removidas sao recriadas; edicoes locais so sao desfeitas sem esta opcao.'
+            ),
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Grava cada lote e reverte as escritas, sem atualizar o cache.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Jogos por lote. Padrao: STEAM_IMPORT_BATCH_SIZE.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Para a leitura apos esse numero de jogos.',
+        )
+
+    def handle(self, *args, **options):
+        for option in ('batch_size', 'limit'):
+            if options[option] is not None and options[option] < 1:
+                raise CommandError(f'--{option.replace("_", "-")} precisa ser positivo.')
+
+        timings = ImportTimings()
+        started = time.perf_counter()
+        try:
+            result = import_steam_games(
+                only_changed=options['only_changed'],
+                dry_run=options['dry_run'],
+                batch_size=options['batch_size'],
+                limit=options['limit'],
+                timings=timings,
+            )
+        except SteamImportError as exc:
+            raise CommandError(str(exc)) from exc
+        payload = {
+            'dry_run': options['dry_run'],
+            **asdict(result),
+            'timings': timings.as_dict(),
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+        }
+        self.stdout.write(json.dumps(payload, sort_keys=True))
@@ -0,0 +1,20 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.pomodoro.services.queue_counters import verify_queue_counters
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores das filas a partir dos itens e aponta divergencias.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Grava os valores recalculados nas filas divergentes.',
+        )
+
+    def handle(self, *args, **options):
+        verification = verify_queue_counters(repair=options['repair'])
+        self.stdout.write(json.dumps(verification.as_dict(), sort_keys=True))
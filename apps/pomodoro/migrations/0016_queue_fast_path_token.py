@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pomodoro', '0015_activity_external_id_activity_external_source_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='activityqueue',
+            name='fast_path_token',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
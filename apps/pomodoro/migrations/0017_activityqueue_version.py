@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pomodoro', '0016_queue_fast_path_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activityqueue',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+def backfill_preference_weights(apps, schema_editor):
+    # Sem decaimento (padrao), o agregado e a soma simples dos eventos.
+    ActivityPreferenceEvent = apps.get_model('pomodoro', 'ActivityPreferenceEvent')
+    ActivityPreferenceWeight = apps.get_model('pomodoro', 'ActivityPreferenceWeight')
+    now = timezone.now()
+    rows = (
+        ActivityPreferenceEvent.objects.order_by()
+        .values('queue__scope_key', 'queue__group_id', 'activity_id')
+        .annotate(
+            favorite=Sum('weight_delta', filter=Q(event_type='favorite_completed'), default=0),
+            skipped=Sum('weight_delta', filter=Q(event_type='skipped'), default=0),
+            total=Count('id'),
+        )
+    )
+    ActivityPreferenceWeight.objects.bulk_create(
+        (
+            ActivityPreferenceWeight(
+                scope_key=row['queue__scope_key'],
+                group_id=row['queue__group_id'],
+                activity_id=row['activity_id'],
+                favorite_score=row['favorite'],
+                skip_score=row['skipped'],
+                event_count=row['total'],
+                decayed_at=now,
+            )
+            for row in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pomodoro', '0017_activityqueue_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityPreferenceWeight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope_key', models.CharField(max_length=64)),
+                ('favorite_score', models.FloatField(default=0)),
+                ('skip_score', models.FloatField(default=0)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('decayed_at', models.DateTimeField()),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='preference_weights', to='pomodoro.activity')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='preference_weights', to='pomodoro.group')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope_key', 'group', 'activity'), name='unique_preference_weight_per_scope_group_activity')],
+            },
+        ),
+        migrations.RunPython(backfill_preference_weights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pomodoro', '0019_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activityqueueitem',
+            index=models.Index(condition=models.Q(('state', 'pending')), fields=['queue', 'position'], name='queue_item_pending_pos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(condition=models.Q(('state__in', ['preparing', 'running'])), fields=['scope_key', '-created_at'], name='schedule_open_scope_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(condition=models.Q(('state__in', ['preparing', 'running'])), fields=['activity'], name='schedule_open_activity_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:13
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def recount_queue_counters(apps, schema_editor):
+    ActivityQueue = apps.get_model('pomodoro', 'ActivityQueue')
+    ActivityQueueItem = apps.get_model('pomodoro', 'ActivityQueueItem')
+    totals = (
+        ActivityQueueItem.objects.order_by()
+        .values('queue_id')
+        .annotate(
+            pool_size=Count('id'),
+            consumed=Count('id', filter=Q(state__in=['completed', 'skipped'])),
+            expired=Count('id', filter=Q(state='expired')),
+        )
+    )
+    for row in totals.iterator(chunk_size=2000):
+        ActivityQueue.objects.filter(pk=row['queue_id']).update(
+            pool_size=row['pool_size'],
+            consumed_count=row['consumed'],
+            expired_count=row['expired'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pomodoro', '0020_hot_path_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activityqueue',
+            name='expired_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(recount_queue_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pomodoro', '0021_activityqueue_expired_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activityqueue',
+            name='state',
+            field=models.CharField(choices=[('active', 'Active'), ('staged', 'Staged'), ('closed', 'Closed'), ('cancelled', 'Cancelled')], default='active', max_length=16),
+        ),
+        migrations.AddConstraint(
+            model_name='activityqueue',
+            constraint=models.UniqueConstraint(condition=models.Q(('state', 'staged')), fields=('scope_key', 'group'), name='unique_staged_queue_per_scope_group'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pomodoro', '0022_staged_queue_prefetch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityQueueOrder',
+            fields=[
+                ('queue', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='lazy_order', serialize=False, to='pomodoro.activityqueue')),
+                ('order_seed', models.BigIntegerField()),
+                ('activity_ids', models.BinaryField(default=b'')),
+                ('remaining_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
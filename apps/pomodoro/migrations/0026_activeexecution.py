@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_active_executions(apps, schema_editor):
+    ActiveExecution = apps.get_model('pomodoro', 'ActiveExecution')
+    Schedule = apps.get_model('pomodoro', 'Schedule')
+    open_schedules = (
+        Schedule.objects.filter(state__in=['preparing', 'running'])
+        .exclude(scope_key='')
+        .only('id', 'scope_key', 'expected_end_at')
+    )
+    ActiveExecution.objects.bulk_create(
+        [
+            ActiveExecution(
+                scope_key=schedule.scope_key,
+                schedule_id=schedule.id,
+                expected_end_at=schedule.expected_end_at,
+                version=1,
+            )
+            for schedule in open_schedules.iterator(chunk_size=2000)
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pomodoro', '0025_import_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveExecution',
+            fields=[
+                ('scope_key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('expected_end_at', models.DateTimeField(blank=True, null=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('schedule', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='active_pointer', to='pomodoro.schedule')),
+            ],
+        ),
+        migrations.RunPython(backfill_active_executions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def backfill_scope_registry(apps, schema_editor):
+    ActivityQueue = apps.get_model('pomodoro', 'ActivityQueue')
+    Schedule = apps.get_model('pomodoro', 'Schedule')
+    ScopeRegistry = apps.get_model('pomodoro', 'ScopeRegistry')
+    seen = {}
+    for model in (ActivityQueue, Schedule):
+        rows = (
+            model.objects.exclude(scope_key='')
+            .order_by()
+            .values('scope_key')
+            .annotate(first=Min('created_at'), last=Max('created_at'))
+        )
+        for row in rows.iterator(chunk_size=2000):
+            first, last = seen.get(row['scope_key'], (row['first'], row['last']))
+            seen[row['scope_key']] = (min(first, row['first']), max(last, row['last']))
+    latest_groups = {}
+    for scope_key, group_id in (
+        ActivityQueue.objects.exclude(scope_key='')
+        .order_by('scope_key', 'created_at')
+        .values_list('scope_key', 'group_id')
+        .iterator(chunk_size=2000)
+    ):
+        latest_groups[scope_key] = group_id
+    ScopeRegistry.objects.bulk_create(
+        [
+            ScopeRegistry(
+                scope_key=scope_key,
+                first_seen_at=first,
+                last_seen_at=last,
+                default_group_id=latest_groups.get(scope_key),
+            )
+            for scope_key, (first, last) in seen.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pomodoro', '0026_activeexecution'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScopeRegistry',
+            fields=[
+                ('scope_key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('first_seen_at', models.DateTimeField()),
+                ('last_seen_at', models.DateTimeField(db_index=True)),
+                ('default_group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pomodoro.group')),
+            ],
+        ),
+        migrations.RunPython(backfill_scope_registry, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
-from django.db import models
-from django.db.models import Q
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
 
@@ -134,6 +136,7 @@ class Activity(models.Model):
     # Identidade genérica para importações externas, sem acoplar Activity à Steam.
     external_source = models.CharField(max_length=30, blank=True, default='', db_index=True)
     external_id = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = 'Activity'
@@ -255,17 +258,112 @@ class Schedule(models.Model):
                 name='unique_open_schedule_per_scope',
             ),
         ]
+        # Índices parciais: só execuções abertas entram, então continuam pequenos
+        # mesmo com o histórico crescendo.
+        indexes = [
+            models.Index(
+                fields=['scope_key', '-created_at'],
+                condition=Q(state__in=['preparing', 'running']),
+                name='schedule_open_scope_idx',
+            ),
+            models.Index(
+                fields=['activity'],
+                condition=Q(state__in=['preparing', 'running']),
+                name='schedule_open_activity_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Schedule {self.id} for {self.scheduled_date}"
 
 
+class ActiveExecution(models.Model):
+    """Execução aberta de cada escopo, mantida por start_activity e complete_schedule.
+
+    Com ``schedule`` nulo o escopo está ocioso; ``/active/`` responde sem
+    consultar Schedule. ``version`` cresce a cada início ou conclusão no
+    escopo, ao contrário de ``Schedule.version``, que recomeça a cada execução.
+    """
+
+    scope_key = models.CharField(max_length=64, primary_key=True)
+    schedule = models.OneToOneField(
+        Schedule,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='active_pointer',
+    )
+    expected_end_at = models.DateTimeField(null=True, blank=True)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"ActiveExecution {self.scope_key[:12]} -> {self.schedule_id}"
+
+
+class ScopeRegistry(models.Model):
+    """Escopos (clientes identificados pelo Authorization) já vistos pela API.
+
+    Painéis e rotinas de limpeza descobrem os escopos aqui, sem varrer
+    ActivityQueue e Schedule. ``last_seen_at`` é atualizado no máximo uma vez
+    a cada SCOPE_REGISTRY_TOUCH_SECONDS por processo; ``default_group`` é o
+    grupo da última fila apresentada ao escopo.
+    """
+
+    scope_key = models.CharField(max_length=64, primary_key=True)
+    first_seen_at = models.DateTimeField()
+    last_seen_at = models.DateTimeField(db_index=True)
+    default_group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+
+    def __str__(self):
+        return self.scope_key[:12]
+
+
+class ReconciliationGeneration(models.Model):
+    """Contadores que invalidam o item já apresentado por ``/next/``.
+
+    ``catalog`` cresce a cada alteração de atividades, categorias e grupos;
+    ``executions`` a cada History gravado ou removido e a cada Schedule aberto
+    ou encerrado, em qualquer escopo, já que limites diários de categorias e
+    grupos e premiums em execução valem para todos. O caminho rápido compara
+    os valores atuais com os vistos na última reconciliação completa em uma
+    única leitura.
+    """
+
+    CATALOG = 'catalog'
+    EXECUTIONS = 'executions'
+
+    key = models.CharField(max_length=80, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def bump(cls, key: str) -> None:
+        if cls.objects.filter(pk=key).update(value=F('value') + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(key=key, value=1)
+        except IntegrityError:
+            cls.objects.filter(pk=key).update(value=F('value') + 1)
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+
 class ActivityQueue(models.Model):
     STATE_ACTIVE = 'active'
+    STATE_STAGED = 'staged'
     STATE_CLOSED = 'closed'
     STATE_CANCELLED = 'cancelled'
     STATE_CHOICES = [
         (STATE_ACTIVE, 'Active'),
+        (STATE_STAGED, 'Staged'),
         (STATE_CLOSED, 'Closed'),
         (STATE_CANCELLED, 'Cancelled'),
     ]
@@ -294,9 +392,18 @@ class ActivityQueue(models.Model):
     state = models.CharField(max_length=16, choices=STATE_CHOICES, default=STATE_ACTIVE)
     mode = models.CharField(max_length=24, choices=MODE_CHOICES, default=MODE_NORMAL)
     pool_number = models.PositiveIntegerField(default=1)
+    # Contadores mantidos incrementalmente pelos serviços a cada transição de
+    # item; verify_queue_counters recalcula e corrige eventuais desvios.
     pool_size = models.PositiveIntegerField(default=0)
     consumed_count = models.PositiveIntegerField(default=0)
+    expired_count = models.PositiveIntegerField(default=0)
     skip_locked = models.BooleanField(default=False)
+    # Incrementada a cada mudança de estado ou posição dos itens; clientes a
+    # enviam em If-Match para detectar uma fila desatualizada sem bloqueios.
+    version = models.PositiveIntegerField(default=1)
+    # Carimbo das ReconciliationGeneration vistas na última reconciliação
+    # completa; permite servir /next/ sem bloqueios.
+    fast_path_token = models.CharField(max_length=64, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     closed_at = models.DateTimeField(null=True, blank=True)
 
@@ -308,12 +415,23 @@ class ActivityQueue(models.Model):
                 condition=Q(state='active'),
                 name='unique_active_queue_per_scope_group',
             ),
+            # Próxima pool normal montada antes de a atual se esgotar.
+            models.UniqueConstraint(
+                fields=['scope_key', 'group'],
+                condition=Q(state='staged'),
+                name='unique_staged_queue_per_scope_group',
+            ),
         ]
         indexes = [
             models.Index(fields=['scope_key', 'group', 'state'], name='queue_scope_group_state_idx'),
             models.Index(fields=['source_queue', 'mode'], name='queue_source_mode_idx'),
         ]
 
+    @property
+    def available_count(self):
+        """Itens pendentes, apresentados ou iniciados."""
+        return self.pool_size - self.consumed_count - self.expired_count
+
     def __str__(self):
         return f"Queue {self.id} ({self.scope_key})"
 
@@ -365,12 +483,40 @@ class ActivityQueueItem(models.Model):
         ]
         indexes = [
             models.Index(fields=['queue', 'state', 'position'], name='queue_item_state_pos_idx'),
+            models.Index(
+                fields=['queue', 'position'],
+                condition=Q(state='pending'),
+                name='queue_item_pending_pos_idx',
+            ),
         ]
 
     def __str__(self):
         return f"QueueItem {self.id} ({self.activity_id})"
 
 
+class ActivityQueueOrder(models.Model):
+    """Restante ainda não materializado de uma fila grande.
+
+    Os ids seguem a ordem sorteada e viram ActivityQueueItem em pequenas
+    janelas à medida que a fila é apresentada.
+    """
+
+    queue = models.OneToOneField(
+        ActivityQueue,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='lazy_order',
+    )
+    # Semente do sorteio que produziu a ordem, para reproduzi-la.
+    order_seed = models.BigIntegerField()
+    # Ids de Activity empacotados como inteiros de 64 bits (array 'q').
+    activity_ids = models.BinaryField(default=b'')
+    remaining_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"QueueOrder {self.queue_id} ({self.remaining_count})"
+
+
 class ActivityPreferenceEvent(models.Model):
     EVENT_FAVORITE_COMPLETED = 'favorite_completed'
     EVENT_SKIPPED = 'skipped'
@@ -409,11 +555,173 @@ class ActivityPreferenceEvent(models.Model):
         return f"{self.event_type} for activity {self.activity_id}"
 
 
+class ActivityPreferenceWeight(models.Model):
+    """Agregado de ActivityPreferenceEvent por escopo, grupo e atividade.
+
+    Atualizado na mesma transação que grava o evento; os scores decaem a
+    partir de ``decayed_at`` conforme ``PREFERENCE_WEIGHT_HALF_LIFE_DAYS``.
+    """
+
+    scope_key = models.CharField(max_length=64)
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='preference_weights',
+    )
+    activity = models.ForeignKey(
+        Activity,
+        on_delete=models.CASCADE,
+        related_name='preference_weights',
+    )
+    favorite_score = models.FloatField(default=0)
+    skip_score = models.FloatField(default=0)
+    event_count = models.PositiveIntegerField(default=0)
+    decayed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope_key', 'group', 'activity'],
+                name='unique_preference_weight_per_scope_group_activity',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Weight {self.scope_key}/{self.group_id}/{self.activity_id}"
+
+
+class ImportJob(models.Model):
+    """Execução em segundo plano de uma importação de atividades externas.
+
+    Os contadores são gravados a cada lote para que o admin acompanhe o
+    progresso; ``updated_at`` serve de batimento para detectar jobs órfãos.
+    """
+
+    SOURCE_STEAM = 'steam'
+    SOURCE_CHOICES = [
+        (SOURCE_STEAM, 'Steam'),
+    ]
+    STATE_QUEUED = 'queued'
+    STATE_RUNNING = 'running'
+    STATE_SUCCEEDED = 'succeeded'
+    STATE_FAILED = 'failed'
+    STATE_CHOICES = [
+        (STATE_QUEUED, 'Queued'),
+        (STATE_RUNNING, 'Running'),
+        (STATE_SUCCEEDED, 'Succeeded'),
+        (STATE_FAILED, 'Failed'),
+    ]
+    OPEN_STATES = [STATE_QUEUED, STATE_RUNNING]
+
+    source = models.CharField(max_length=32, choices=SOURCE_CHOICES, default=SOURCE_STEAM)
+    state = models.CharField(max_length=16, choices=STATE_CHOICES, default=STATE_QUEUED)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+    )
+    total = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    # Mensagem segura para o admin; nunca contém credenciais.
+    error_message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source'],
+                condition=Q(state__in=['queued', 'running']),
+                name='unique_open_import_job_per_source',
+            ),
+        ]
+
+    @property
+    def is_open(self):
+        return self.state in self.OPEN_STATES
+
+    def __str__(self):
+        return f"ImportJob {self.id} ({self.source}, {self.state})"
+
+
+class ImportSourceState(models.Model):
+    """Hash da última resposta completa recebida de uma origem de importação."""
+
+    source = models.CharField(max_length=32, unique=True)
+    payload_hash = models.CharField(max_length=64)
+    item_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} {self.payload_hash[:12]}"
+
+
+class ImportFingerprint(models.Model):
+    """Impressão digital do último estado importado de cada item externo.
+
+    Para a Steam cobre AppID, nome e tempo de jogo; o modo incremental só
+    compara com as atividades os jogos cuja impressão mudou.
+    """
+
+    source = models.CharField(max_length=32)
+    external_id = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=40)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'external_id'],
+                name='unique_import_fingerprint_per_source',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.source}:{self.external_id}"
+
+
 @receiver(pre_delete, sender=Category)
 def prevent_default_category_delete(sender, instance, **kwargs):
     if instance.pk == DEFAULT_CATEGORY_ID and instance.name == DEFAULT_CATEGORY_NAME:
         raise ValidationError('A categoria padrao Todos nao pode ser removida.')
 
+# Campos contadores que não alteram a elegibilidade das atividades.
+CATALOG_COUNTER_FIELDS = frozenset({'executions_today', 'last_executed'})
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Group)
+def bump_catalog_generation(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= CATALOG_COUNTER_FIELDS:
+        return
+    ReconciliationGeneration.bump(ReconciliationGeneration.CATALOG)
+
+
+@receiver(post_delete, sender=Activity)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Group)
+def bump_catalog_generation_on_delete(sender, instance, **kwargs):
+    ReconciliationGeneration.bump(ReconciliationGeneration.CATALOG)
+
+
+@receiver(post_delete, sender=Activity)
+def drop_import_fingerprint(sender, instance, **kwargs):
+    """Sem a impressão, o modo incremental recria a atividade removida."""
+    if instance.external_source and instance.external_id:
+        ImportFingerprint.objects.filter(
+            source=instance.external_source,
+            external_id=instance.external_id,
+        ).delete()
+
+
 class History(models.Model):
     activity = models.ForeignKey(
         Activity,
@@ -439,8 +747,72 @@ class History(models.Model):
         """Atualiza o contador ao criar um novo histórico"""
         if not self.pk:  # Se for uma criação nova
             self.activity.executions_today += 1
-            self.activity.save()
+            self.activity.save(update_fields=['executions_today'])
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"History {self.id} of {self.activity.name}"
+
+
+# Campos do Schedule que abrem ou encerram uma execução.
+SCHEDULE_STATE_FIELDS = frozenset({'state', 'completed'})
+
+
+@receiver(post_save, sender=History)
+@receiver(post_delete, sender=History)
+@receiver(post_delete, sender=Schedule)
+def bump_executions_generation(sender, instance, **kwargs):
+    """Invalida o caminho rápido de todos os escopos: os limites diários são globais."""
+    ReconciliationGeneration.bump(ReconciliationGeneration.EXECUTIONS)
+
+
+@receiver(post_save, sender=Schedule)
+def bump_executions_generation_on_schedule(sender, instance, created, update_fields=None, **kwargs):
+    if created or not update_fields or SCHEDULE_STATE_FIELDS & set(update_fields):
+        ReconciliationGeneration.bump(ReconciliationGeneration.EXECUTIONS)
+
+
+class ArchivedRecord(models.Model):
+    """Cópia compacta de uma linha removida pela rotina de arquivamento."""
+
+    model_label = models.CharField(max_length=64)
+    object_id = models.BigIntegerField()
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model_label', 'object_id'],
+                name='unique_archived_record_per_model',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} {self.object_id}"
+
+
+class HistoryDailySummary(models.Model):
+    """Totais diários por atividade preservados quando History é arquivado."""
+
+    activity = models.ForeignKey(
+        Activity,
+        on_delete=models.CASCADE,
+        related_name='daily_summaries',
+    )
+    date = models.DateField()
+    executions = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    total_minutes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['activity', 'date'],
+                name='unique_history_summary_per_activity_date',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Summary {self.activity_id} {self.date}"
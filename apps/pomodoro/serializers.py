@@ -164,6 +164,7 @@ class ActivityQueueItemSerializer(QueueContextSerializerMixin, serializers.Model
     pool_number = serializers.IntegerField(source='queue.pool_number', read_only=True)
     pool_size = serializers.IntegerField(source='queue.pool_size', read_only=True)
     consumed_count = serializers.IntegerField(source='queue.consumed_count', read_only=True)
+    queue_version = serializers.IntegerField(source='queue.version', read_only=True)
     skip_locked = serializers.SerializerMethodField()
     queue_group_id = serializers.SerializerMethodField()
     queue_group_name = serializers.SerializerMethodField()
@@ -201,6 +202,7 @@ class ActivityQueueItemSerializer(QueueContextSerializerMixin, serializers.Model
             'pool_number',
             'pool_size',
             'consumed_count',
+            'queue_version',
             'skip_locked',
             'queue_group_id',
             'queue_group_name',
@@ -0,0 +1,185 @@
+"""Espera longa de ``/active/`` até a execução do escopo mudar.
+
+Com ``?wait=<segundos>&since_version=<n>`` a resposta só sai quando a versão
+do escopo em ``ActiveExecution`` deixa de ser ``n``, quando a execução aberta
+vence ou quando o prazo acaba. Nos workers gthread do Gunicorn cada espera
+ocupa uma thread da requisição; no máximo ``ACTIVE_LONG_POLL_MAX_WAITERS``
+esperam ao mesmo tempo por processo e as demais recebem ``LongPollBusy``, que
+a view responde com 503 e ``Retry-After`` para o cliente voltar ao intervalo
+normal de consulta. Uma única thread por processo consulta de uma vez as
+versões de todos os escopos aguardados e acorda quem mudou.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from apps.pomodoro.models import ActiveExecution
+from apps.pomodoro.services import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class LongPollBusy(Exception):
+    """Todas as vagas de espera do processo estão ocupadas."""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__('long poll busy')
+
+
+def long_poll_params(query) -> tuple[float, int | None] | None:
+    """``(wait, since_version)`` da query string; None sem ``wait``.
+
+    Levanta ``ValueError`` para valores inválidos. ``wait`` é limitado a
+    ``ACTIVE_LONG_POLL_MAX_SECONDS``.
+    """
+    raw_wait = (query.get('wait') or '').strip()
+    if not raw_wait:
+        return None
+    wait = float(raw_wait)
+    if not math.isfinite(wait) or wait < 0:
+        raise ValueError(raw_wait)
+    raw_since = (query.get('since_version') or '').strip()
+    if raw_since and not raw_since.isdigit():
+        raise ValueError(raw_since)
+    since_version = int(raw_since) if raw_since else None
+    return min(wait, float(getattr(settings, 'ACTIVE_LONG_POLL_MAX_SECONDS', 25))), since_version
+
+
+def scope_state(scope_key: str):
+    """``(version, expected_end_at)`` do ponteiro do escopo; ``(0, None)`` se nunca houve execução."""
+    row = (
+        ActiveExecution.objects.filter(pk=scope_key)
+        .values_list('version', 'expected_end_at')
+        .first()
+    )
+    return row or (0, None)
+
+
+def _scope_versions(scope_keys: list[str]) -> dict[str, int]:
+    return dict(
+        ActiveExecution.objects.filter(pk__in=scope_keys).values_list('scope_key', 'version')
+    )
+
+
+class _Waiter:
+    __slots__ = ('since_version', 'event')
+
+    def __init__(self, since_version: int):
+        self.since_version = since_version
+        self.event = threading.Event()
+
+
+class ScopeWatcher:
+    """Acorda as esperas de ``/active/`` quando a versão do escopo muda."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: dict[str, set[_Waiter]] = {}
+        self._count = 0
+        self._thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    def wait(self, scope_key: str, since_version: int, timeout: float) -> bool | None:
+        """True se a versão mudou antes de ``timeout``; None se não havia vaga para esperar."""
+        waiter = _Waiter(since_version)
+        with self._lock:
+            if self._count >= int(getattr(settings, 'ACTIVE_LONG_POLL_MAX_WAITERS', 4)):
+                return None
+            self._waiters.setdefault(scope_key, set()).add(waiter)
+            self._count += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='active-long-poll',
+                    daemon=True,
+                )
+                self._thread.start()
+        try:
+            return waiter.event.wait(timeout)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(scope_key)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[scope_key]
+                self._count -= 1
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Encerra a thread de consulta e espera ela terminar; uma nova espera a recria."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping.set()
+        thread.join(timeout)
+        self._stopping.clear()
+
+    def _run(self) -> None:
+        interval = float(getattr(settings, 'ACTIVE_LONG_POLL_INTERVAL_SECONDS', 1))
+        try:
+            while not self._stopping.wait(interval):
+                with self._lock:
+                    if not self._waiters:
+                        return
+                    scope_keys = list(self._waiters)
+                try:
+                    versions = _scope_versions(scope_keys)
+                except Exception:
+                    # As esperas seguem até o prazo; a resposta relê o estado.
+                    logger.exception('Falha ao consultar as versoes dos escopos em espera')
+                    continue
+                with self._lock:
+                    for scope_key, waiters in self._waiters.items():
+                        for waiter in waiters:
+                            if versions.get(scope_key, 0) != waiter.since_version:
+                                waiter.event.set()
+        finally:
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+            # A thread não passa pelo ciclo de requisição que fecharia a conexão.
+            connections.close_all()
+
+
+_watcher = ScopeWatcher()
+
+
+def stop_watcher(timeout: float | None = None) -> None:
+    _watcher.stop(timeout)
+
+
+def wait_for_active_change(scope_key: str, wait: float, since_version: int | None) -> None:
+    """Segura a requisição até o escopo mudar, a execução vencer ou ``wait`` acabar.
+
+    Levanta ``LongPollBusy`` quando não há vaga para esperar.
+    """
+    version, expected_end_at = scope_state(scope_key)
+    if since_version is not None and since_version != version:
+        metrics.increment('active_long_poll', outcome='stale')
+        return
+    timeout = wait
+    if expected_end_at is not None:
+        timeout = min(timeout, max((expected_end_at - timezone.now()).total_seconds(), 0))
+    if timeout <= 0:
+        metrics.increment('active_long_poll', outcome='expired' if expected_end_at else 'timeout')
+        return
+    changed = _watcher.wait(scope_key, version, timeout)
+    if changed is None:
+        metrics.increment('active_long_poll', outcome='busy')
+        raise LongPollBusy(int(getattr(settings, 'ACTIVE_LONG_POLL_RETRY_AFTER_SECONDS', 5)))
+    if changed:
+        outcome = 'changed'
+    elif expected_end_at is not None and expected_end_at <= timezone.now():
+        outcome = 'expired'
+    else:
+        outcome = 'timeout'
+    metrics.increment('active_long_poll', outcome=outcome)
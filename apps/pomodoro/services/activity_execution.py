@@ -4,9 +4,11 @@ import hashlib
 from datetime import timedelta
 
 from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.utils import timezone
 
 from apps.pomodoro.models import (
+    ActiveExecution,
     Activity,
     ActivityPreferenceEvent,
     ActivityQueueItem,
@@ -16,11 +18,20 @@ from apps.pomodoro.models import (
     Schedule,
 )
 from apps.pomodoro.services.activity_queue import (
+    QueueConflict,
+    bump_queue_version,
     category_started_count,
+    check_queue_version,
     finalize_queue_if_finished,
     group_remaining_minutes,
+    lock_queue_for_item,
     queue_context,
 )
+from apps.pomodoro.services.execution_cache import invalidate_execution
+from apps.pomodoro.services.preference_weights import record_preference_event
+from apps.pomodoro.services.queue_counters import CONSUMED_STATES, adjust_queue_counters
+from apps.pomodoro.services.queue_prefetch import schedule_prefetch
+from apps.pomodoro.services.transactions import lock_in_order, service_transaction
 
 
 class ActivityExecutionConflict(Exception):
@@ -81,21 +92,87 @@ def _raise_integrity_conflict(*, activity: Activity, queue_item: ActivityQueueIt
     )
 
 
+def derived_scope_key(request) -> str | None:
+    """Escopo já derivado nesta requisição, ou None se nenhuma view o pediu."""
+    return getattr(getattr(request, '_request', request), '_pomodoro_scope_key', None)
+
+
 def build_scope_key(request) -> str:
-    authorization = (request.META.get('HTTP_AUTHORIZATION') or '').strip()
+    """Escopo da requisição, derivado do Authorization uma única vez.
+
+    O valor fica guardado na HttpRequest (também por trás da Request do DRF).
+    """
+    scope_key = derived_scope_key(request)
+    if scope_key is not None:
+        return scope_key
+    http_request = getattr(request, '_request', request)
+    authorization = (http_request.META.get('HTTP_AUTHORIZATION') or '').strip()
     if not authorization:
-        return 'anonymous'
-    return hashlib.sha256(authorization.encode('utf-8')).hexdigest()
+        scope_key = 'anonymous'
+    else:
+        scope_key = hashlib.sha256(authorization.encode('utf-8')).hexdigest()
+    http_request._pomodoro_scope_key = scope_key
+    return scope_key
+
+
+def open_schedules_for_scope(scope_key: str):
+    """Execuções abertas do escopo, da mais recente; servidas por schedule_open_scope_idx."""
+    return Schedule.objects.filter(
+        scope_key=scope_key,
+        state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING],
+    ).order_by('-created_at')
+
+
+def overdue_schedules_for_scope(scope_key: str, now):
+    """Execuções abertas do escopo cujo prazo já passou."""
+    return open_schedules_for_scope(scope_key).filter(expected_end_at__lte=now)
+
+
+def _point_active_execution(schedule: Schedule) -> None:
+    """Aponta o escopo para a execução recém-criada, na mesma transação."""
+    if not schedule.scope_key:
+        return
+    updated = ActiveExecution.objects.filter(scope_key=schedule.scope_key).update(
+        schedule=schedule,
+        expected_end_at=schedule.expected_end_at,
+        version=F('version') + 1,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        ActiveExecution.objects.create(
+            scope_key=schedule.scope_key,
+            schedule=schedule,
+            expected_end_at=schedule.expected_end_at,
+            version=1,
+        )
+
+
+def _clear_active_execution(schedule: Schedule) -> None:
+    ActiveExecution.objects.filter(scope_key=schedule.scope_key, schedule_id=schedule.pk).update(
+        schedule=None,
+        expected_end_at=None,
+        version=F('version') + 1,
+        updated_at=timezone.now(),
+    )
 
 
 def get_active_schedule(scope_key: str) -> Schedule | None:
+    """Execução aberta do escopo, lida pelo ponteiro ActiveExecution.
+
+    Um escopo ocioso custa uma busca por chave primária; com execução aberta,
+    outra busca por chave em Schedule, seguida da conclusão se já venceu.
+    """
+    schedule_id = (
+        ActiveExecution.objects.filter(pk=scope_key).values_list('schedule_id', flat=True).first()
+    )
+    if schedule_id is None:
+        return None
     schedule = (
         Schedule.objects.select_related(
             'activity__category__group',
             'queue_item__queue__group',
         )
-        .filter(scope_key=scope_key, state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING])
-        .order_by('-created_at')
+        .filter(pk=schedule_id)
         .first()
     )
     if not schedule:
@@ -115,17 +192,34 @@ def reconcile_schedule(schedule: Schedule) -> Schedule:
     return schedule
 
 
-@transaction.atomic
+@service_transaction('start_activity')
 def start_activity(
     *,
     activity: Activity,
     queue_item: ActivityQueueItem,
     scope_key: str,
+    expected_version: int | None = None,
 ) -> tuple[Schedule, bool]:
     now = timezone.now()
+    # Execucoes vencidas do escopo sao concluidas antes dos bloqueios desta
+    # operacao: complete_schedule bloqueia outra fila e precisa respeitar a
+    # ordem global (fila, item, categoria, grupo, agendamento).
+    for overdue in overdue_schedules_for_scope(scope_key, now):
+        complete_schedule(overdue)
+
+    locked_queue = lock_queue_for_item(queue_item.pk)
+    if expected_version is not None and locked_queue.version != expected_version:
+        try:
+            check_queue_version(
+                queue_item_id=queue_item.pk,
+                expected_version=expected_version,
+                idempotent_state=ActivityQueueItem.STATE_STARTED,
+            )
+        except QueueConflict as exc:
+            raise ActivityExecutionConflict(exc.code, exc.detail, payload=exc.payload) from None
     queue_item = (
         ActivityQueueItem.objects.select_related('queue__group', 'activity__category')
-        .select_for_update()
+        .select_for_update(of=('self',))
         .get(pk=queue_item.pk)
     )
 
@@ -202,8 +296,8 @@ def start_activity(
             },
         )
 
-    category = Category.objects.select_for_update().get(pk=activity.category_id)
-    group = Group.objects.select_for_update().get(pk=queue_item.queue.group_id)
+    category = lock_in_order(Category.objects.filter(pk=activity.category_id)).get()
+    group = lock_in_order(Group.objects.filter(pk=queue_item.queue.group_id)).get()
 
     started_daily_executions = category_started_count(category)
     if started_daily_executions >= category.max_daily_executions:
@@ -231,12 +325,7 @@ def start_activity(
 
     # PostgreSQL does not allow FOR UPDATE over the nullable side of the
     # outer join created by select_related('queue_item__queue').
-    existing = (
-        Schedule.objects.select_for_update()
-        .filter(scope_key=scope_key, state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING])
-        .order_by('-created_at')
-        .first()
-    )
+    existing = open_schedules_for_scope(scope_key).select_for_update().first()
     if existing:
         existing = reconcile_schedule(existing)
         if existing.state in [Schedule.STATE_PREPARING, Schedule.STATE_RUNNING]:
@@ -272,6 +361,7 @@ def start_activity(
     queue_item.presented_at = queue_item.presented_at or now
     queue_item.started_at = now
     queue_item.save(update_fields=['state', 'presented_at', 'started_at'])
+    bump_queue_version(queue_item.queue)
 
     try:
         with transaction.atomic():
@@ -288,6 +378,7 @@ def start_activity(
                 starts_at=now,
                 expected_end_at=expected_end_at,
             )
+            _point_active_execution(schedule)
     except IntegrityError:
         return _raise_integrity_conflict(
             activity=activity,
@@ -304,13 +395,19 @@ def start_activity(
     return schedule, True
 
 
-@transaction.atomic
+@service_transaction('complete_schedule')
 def complete_schedule(schedule: Schedule) -> Schedule:
+    queue_item_id = (
+        Schedule.objects.filter(pk=schedule.pk).values_list('queue_item_id', flat=True).get()
+    )
+    if queue_item_id:
+        lock_queue_for_item(queue_item_id)
+        lock_in_order(ActivityQueueItem.objects.filter(pk=queue_item_id)).get()
     # Reverse OneToOne relations also generate LEFT OUTER JOINs, which are not
     # compatible with PostgreSQL FOR UPDATE on the nullable side.
     schedule = (
         Schedule.objects.select_related('activity')
-        .select_for_update()
+        .select_for_update(of=('self',))
         .get(pk=schedule.pk)
     )
     if schedule.state == Schedule.STATE_COMPLETED or schedule.completed:
@@ -327,33 +424,38 @@ def complete_schedule(schedule: Schedule) -> Schedule:
     schedule.completed = True
     schedule.state = Schedule.STATE_COMPLETED
     schedule.completed_at = completion_time
+    invalidate_execution(schedule.scope_key, schedule.pk, schedule.version)
     schedule.version += 1
     schedule.save(
         update_fields=['end_time', 'completed', 'state', 'completed_at', 'version']
     )
+    _clear_active_execution(schedule)
 
     if schedule.queue_item_id:
         queue_item = schedule.queue_item
+        already_consumed = queue_item.state in CONSUMED_STATES
         queue_item.state = ActivityQueueItem.STATE_COMPLETED
         queue_item.completed_at = completion_time
         queue_item.save(update_fields=['state', 'completed_at'])
 
         queue = queue_item.queue
-        queue.consumed_count = queue.items.filter(
-            state__in=[ActivityQueueItem.STATE_COMPLETED, ActivityQueueItem.STATE_SKIPPED]
-        ).count()
-        queue.save(update_fields=['consumed_count'])
+        if not already_consumed:
+            adjust_queue_counters(queue, consumed=1)
+        bump_queue_version(queue)
 
         event_type = ActivityPreferenceEvent.EVENT_FAVORITE_COMPLETED
         if queue.mode == queue.MODE_SKIPPED_REVIEW:
             event_type = ActivityPreferenceEvent.EVENT_SKIPPED_COMPLETED
-        ActivityPreferenceEvent.objects.get_or_create(
+        event, created = ActivityPreferenceEvent.objects.get_or_create(
             activity=schedule.activity,
             queue=queue,
             queue_item=queue_item,
             event_type=event_type,
             defaults={'weight_delta': 1},
         )
+        if created:
+            record_preference_event(event, queue)
         finalize_queue_if_finished(queue)
+        schedule_prefetch(queue)
 
     return schedule
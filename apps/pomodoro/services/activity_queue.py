@@ -1,11 +1,23 @@
 from __future__ import annotations
 
+import hashlib
 import random
-from collections import Counter
 from dataclasses import dataclass
-
-from django.db import IntegrityError, transaction
-from django.db.models import Count, F, Max, Q, Sum
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Sum,
+)
 from django.utils import timezone
 
 from apps.pomodoro.models import (
@@ -13,11 +25,24 @@ from apps.pomodoro.models import (
     ActivityPreferenceEvent,
     ActivityQueue,
     ActivityQueueItem,
+    ActivityQueueOrder,
     Category,
     Group,
     History,
+    ReconciliationGeneration,
     Schedule,
 )
+from apps.pomodoro.services.lazy_queue import lazy_order, pack_activity_ids, take_window
+from apps.pomodoro.services.metrics import increment as increment_metric
+from apps.pomodoro.services.preference_weights import favorite_weights, record_preference_event
+from apps.pomodoro.services.queue_counters import (
+    COUNTER_FIELDS,
+    adjust_queue_counters,
+    refresh_counters_if_drifted,
+)
+from apps.pomodoro.services.queue_prefetch import schedule_prefetch
+from apps.pomodoro.services.transactions import lock_in_order, service_transaction
+from apps.pomodoro.services.weighted_shuffle import efraimidis_spirakis_keys
 
 
 class QueueConflict(Exception):
@@ -74,6 +99,16 @@ def default_group() -> Group:
     return group
 
 
+def lock_queue_for_item(queue_item_id: int) -> ActivityQueue:
+    """Bloqueia a fila antes do item, conforme ``LOCK_ORDER``."""
+    queue_id = (
+        ActivityQueueItem.objects.filter(pk=queue_item_id)
+        .values_list('queue_id', flat=True)
+        .get()
+    )
+    return lock_in_order(ActivityQueue.objects.filter(pk=queue_id)).get()
+
+
 def normalize_group(selected_group: Group | None) -> Group:
     return selected_group or default_group()
 
@@ -90,10 +125,12 @@ def get_requested_group(request):
 
 
 def expire_finished_premiums():
-    Activity.objects.filter(
+    expired = Activity.objects.filter(
         premium=True,
         premium_until__lt=timezone.localdate(),
-    ).update(premium=False)
+    ).update(premium=False, updated_at=timezone.now())
+    if expired:
+        ReconciliationGeneration.bump(ReconciliationGeneration.CATALOG)
 
 
 def group_reserved_minutes(group: Group, *, day=None) -> int:
@@ -168,78 +205,124 @@ def activity_is_eligible(
         end_time__date=timezone.localdate(),
     ).exists():
         return False
-    if allow_global_premium and activity.is_premium_active and Schedule.objects.filter(
-        activity=activity,
-        state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING],
+    if allow_global_premium and activity.is_premium_active and open_schedules_for_activity(
+        activity.id
     ).exists():
         return False
     remaining = group_remaining_minutes(group)
     return remaining is None or activity.duration <= remaining
 
 
+def open_schedules_for_activity(activity_id: int):
+    """Execuções abertas da atividade; servidas pelo índice parcial schedule_open_activity_idx."""
+    return Schedule.objects.filter(
+        activity_id=activity_id,
+        state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING],
+    )
+
+
+def pending_items(queue_id: int):
+    """Itens pendentes da fila em ordem; servidos pelo índice parcial queue_item_pending_pos_idx."""
+    return ActivityQueueItem.objects.filter(
+        queue_id=queue_id,
+        state=ActivityQueueItem.STATE_PENDING,
+    ).order_by('position')
+
+
+class EligibleActivity(NamedTuple):
+    id: int
+    duration: int
+    is_premium_active: bool
+
+
+def _premium_active_q(today) -> Q:
+    return Q(premium=True, premium_from__lte=today, premium_until__gte=today)
+
+
+def exhausted_category_ids(*, day=None) -> list[int]:
+    """Categorias que atingiram o limite diário, a partir dos History do dia.
+
+    Categorias com limite zero não aparecem aqui quando não têm History no dia;
+    ``eligible_activities`` as exclui direto na consulta principal.
+    """
+    day = day or timezone.localdate()
+    return list(
+        History.objects.filter(start_time__date=day)
+        .order_by()
+        .values('activity__category_id')
+        .annotate(started=Count('id'))
+        .filter(started__gte=F('activity__category__max_daily_executions'))
+        .values_list('activity__category_id', flat=True)
+    )
+
+
 def eligible_activities(*, selected_group: Group | None, include_done_today: bool = False):
+    """Atividades elegíveis em uma única consulta, sem DISTINCT nem joins multivalorados.
+
+    Os contadores diários (categorias esgotadas e minutos restantes do grupo)
+    são calculados antes e entram como parâmetros; as demais regras viram
+    subconsultas ``NOT EXISTS`` correlacionadas.
+    """
     expire_finished_premiums()
     group = normalize_group(selected_group)
     today = timezone.localdate()
+    premium_active = _premium_active_q(today)
     queryset = Activity.objects.select_related('category', 'category__group').filter(
         active=True,
         category__isnull=False,
+        category__max_daily_executions__gt=0,
     )
     if not include_done_today:
-        queryset = queryset.exclude(
-            id__in=History.objects.filter(end_time__date=today).values('activity_id')
-        )
+        queryset = queryset.filter(~Exists(
+            History.objects.filter(activity=OuterRef('pk'), end_time__date=today)
+        ))
     if not group.is_default:
-        queryset = queryset.filter(
-            Q(category__group=group)
-            | Q(
-                premium=True,
-                premium_from__lte=today,
-                premium_until__gte=today,
-            )
-        )
-    exhausted = Category.objects.annotate(
-        started=Count(
-            'activities__histories',
-            filter=Q(activities__histories__start_time__date=today),
-        )
-    ).filter(started__gte=F('max_daily_executions'))
-    queryset = queryset.exclude(category_id__in=exhausted.values('id'))
-    remaining = group_remaining_minutes(group)
+        queryset = queryset.filter(Q(category__group=group) | premium_active)
+    exhausted = exhausted_category_ids(day=today)
+    if exhausted:
+        queryset = queryset.exclude(category_id__in=exhausted)
+    remaining = group_remaining_minutes(group, day=today)
     if remaining is not None:
         queryset = queryset.filter(duration__lte=remaining)
-    queryset = queryset.exclude(
-        Q(
-            premium=True,
-            premium_from__lte=today,
-            premium_until__gte=today,
+    return queryset.exclude(premium_active & Q(Exists(
+        Schedule.objects.filter(
+            activity=OuterRef('pk'),
+            state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING],
         )
-        & Q(schedules__state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING])
-    )
-    return queryset.distinct()
+    )))
+
+
+def eligible_activity_rows(*, selected_group: Group | None) -> list[EligibleActivity]:
+    """Somente id, duração e vigência premium: o necessário para criar a fila."""
+    today = timezone.localdate()
+    rows = eligible_activities(selected_group=selected_group).select_related(None).annotate(
+        premium_now=ExpressionWrapper(_premium_active_q(today), output_field=BooleanField()),
+    ).order_by('pk').values_list('id', 'duration', 'premium_now')
+    return [
+        EligibleActivity(activity_id, duration, bool(premium_now))
+        for activity_id, duration, premium_now in rows
+    ]
 
 
 def _favorite_weights(scope_key: str, group: Group) -> dict[int, int]:
-    events = ActivityPreferenceEvent.objects.filter(
-        queue__scope_key=scope_key,
-        queue__group=group,
-    ).order_by('created_at', 'id').values('activity_id', 'event_type')
-    favorites = Counter()
-    for event in events:
-        if event['event_type'] == ActivityPreferenceEvent.EVENT_FAVORITE_COMPLETED:
-            favorites[event['activity_id']] += 1
-    return {activity_id: 4 if count else 1 for activity_id, count in favorites.items()}
-
-
-def _weighted_order(activities, scope_key: str, group: Group):
+    return favorite_weights(scope_key, group)
+
+
+def _weighted_order(activities, scope_key: str, group: Group, *, rng=random):
     weights = _favorite_weights(scope_key, group)
-    ranked = []
-    for activity in activities:
-        weight = max(weights.get(activity.id, 1), 1)
-        score = random.random() ** (1.0 / weight)
-        ranked.append((not activity.is_premium_active, -score, activity.id, activity))
-    ranked.sort(key=lambda row: row[:3])
-    return [row[3] for row in ranked]
+    keys = efraimidis_spirakis_keys(
+        [weights.get(activity.id, 1) for activity in activities],
+        rng=rng,
+    )
+    ranked = sorted(
+        range(len(activities)),
+        key=lambda index: (
+            not activities[index].is_premium_active,
+            -keys[index],
+            activities[index].id,
+        ),
+    )
+    return [activities[index] for index in ranked]
 
 
 def _next_pool_number(scope_key: str, group: Group) -> int:
@@ -259,12 +342,45 @@ def _available_items(queue: ActivityQueue):
     )
 
 
-def _refresh_queue_counters(queue: ActivityQueue):
-    queue.consumed_count = queue.items.filter(
-        state__in=[ActivityQueueItem.STATE_COMPLETED, ActivityQueueItem.STATE_SKIPPED]
-    ).count()
-    queue.pool_size = queue.items.count()
-    queue.save(update_fields=['consumed_count', 'pool_size'])
+def bump_queue_version(queue: ActivityQueue) -> int:
+    """Incrementa a versão no banco, imune a instâncias desatualizadas da fila."""
+    ActivityQueue.objects.filter(pk=queue.pk).update(version=F('version') + 1)
+    queue.version = ActivityQueue.objects.filter(pk=queue.pk).values_list(
+        'version', flat=True
+    ).get()
+    return queue.version
+
+
+def check_queue_version(
+    *,
+    queue_item_id: int,
+    expected_version: int | None,
+    idempotent_state: str | None = None,
+) -> None:
+    """Compara If-Match com a versão atual sem bloquear linhas.
+
+    Um item que já está no estado que a operação produziria passa adiante,
+    preservando a idempotência de repetições com a versão anterior.
+    """
+    if expected_version is None:
+        return
+    current = ActivityQueueItem.objects.filter(pk=queue_item_id).values(
+        'state', 'queue_id', 'queue__version'
+    ).first()
+    if current is None or current['queue__version'] == expected_version:
+        return
+    if idempotent_state and current['state'] == idempotent_state:
+        return
+    raise QueueConflict(
+        'queue_version_mismatch',
+        'A fila mudou desde a ultima leitura; atualize antes de continuar.',
+        payload={
+            'queue_id': current['queue_id'],
+            'queue_version': current['queue__version'],
+            'queue_item_id': queue_item_id,
+            'recoverable': True,
+        },
+    )
 
 
 def close_queue(queue: ActivityQueue):
@@ -272,7 +388,7 @@ def close_queue(queue: ActivityQueue):
         queue.state = ActivityQueue.STATE_CLOSED
         queue.closed_at = timezone.now()
         queue.save(update_fields=['state', 'closed_at'])
-    _refresh_queue_counters(queue)
+        bump_queue_version(queue)
     return queue
 
 
@@ -310,8 +426,16 @@ def _create_review(source_queue: ActivityQueue) -> ActivityQueue | None:
 
 
 def finalize_queue_if_finished(queue: ActivityQueue) -> ActivityQueue | None:
+    """Fecha a fila quando os contadores indicam que nada resta.
+
+    Os contadores dispensam a contagem de itens a cada transição; só o
+    fechamento, que é raro, confirma contra os itens antes de agir.
+    """
+    queue.refresh_from_db(fields=list(COUNTER_FIELDS))
+    if queue.available_count > 0:
+        return queue
     if _available_items(queue).exists():
-        _refresh_queue_counters(queue)
+        refresh_counters_if_drifted(queue)
         return queue
     close_queue(queue)
     if queue.mode == ActivityQueue.MODE_NORMAL:
@@ -320,40 +444,70 @@ def finalize_queue_if_finished(queue: ActivityQueue) -> ActivityQueue | None:
 
 
 def _expire_invalid_items(queue: ActivityQueue):
+    """Sincroniza os itens com suas execuções e expira os que não são mais elegíveis.
+
+    As transições são calculadas primeiro e gravadas em no máximo duas
+    instruções, independentemente do tamanho da fila.
+    """
     now = timezone.now()
+    changed = False
+    completed = 0
+    synced = []
     for item in queue.items.select_related('schedule').filter(
         state__in=[ActivityQueueItem.STATE_PENDING, ActivityQueueItem.STATE_PRESENTED, ActivityQueueItem.STATE_STARTED],
         schedule__isnull=False,
     ):
         if item.schedule.state in [Schedule.STATE_PREPARING, Schedule.STATE_RUNNING]:
+            if item.state == ActivityQueueItem.STATE_STARTED and item.started_at:
+                continue
+            changed = changed or item.state != ActivityQueueItem.STATE_STARTED
             item.state = ActivityQueueItem.STATE_STARTED
             item.started_at = item.started_at or item.schedule.starts_at or now
-            item.save(update_fields=['state', 'started_at'])
         elif item.schedule.state == Schedule.STATE_COMPLETED:
+            changed = True
+            completed += 1
             item.state = ActivityQueueItem.STATE_COMPLETED
             item.completed_at = item.completed_at or item.schedule.completed_at or now
-            item.save(update_fields=['state', 'completed_at'])
-
-    for item in queue.items.select_related('activity__category__group').filter(
-        state__in=[ActivityQueueItem.STATE_PENDING, ActivityQueueItem.STATE_PRESENTED]
-    ):
-        if activity_is_eligible(
+        else:
+            continue
+        synced.append(item)
+    if synced:
+        ActivityQueueItem.objects.bulk_update(synced, ['state', 'started_at', 'completed_at'])
+
+    expired_ids = [
+        item.id
+        for item in queue.items.select_related('activity__category__group').filter(
+            state__in=[ActivityQueueItem.STATE_PENDING, ActivityQueueItem.STATE_PRESENTED]
+        )
+        if not activity_is_eligible(
             item.activity,
             queue.group,
             include_done_today=queue.mode == ActivityQueue.MODE_SKIPPED_REVIEW,
             allow_global_premium=queue.mode == ActivityQueue.MODE_NORMAL,
-        ):
-            continue
-        item.state = ActivityQueueItem.STATE_EXPIRED
-        item.save(update_fields=['state'])
-    _refresh_queue_counters(queue)
+        )
+    ]
+    if expired_ids:
+        ActivityQueueItem.objects.filter(pk__in=expired_ids).update(
+            state=ActivityQueueItem.STATE_EXPIRED
+        )
+        changed = True
+    if changed:
+        adjust_queue_counters(queue, consumed=completed, expired=len(expired_ids))
+        bump_queue_version(queue)
 
 
-def _create_normal_queue(scope_key: str, group: Group) -> ActivityQueue | None:
+def _create_normal_queue(
+    scope_key: str,
+    group: Group,
+    *,
+    staged: bool = False,
+) -> ActivityQueue | None:
+    order_seed = random.getrandbits(63)
     activities = _weighted_order(
-        list(eligible_activities(selected_group=group)),
+        eligible_activity_rows(selected_group=group),
         scope_key,
         group,
+        rng=random.Random(order_seed),
     )
     if not activities:
         return None
@@ -362,24 +516,129 @@ def _create_normal_queue(scope_key: str, group: Group) -> ActivityQueue | None:
             group=group,
             scope_key=scope_key,
             mode=ActivityQueue.MODE_NORMAL,
-            pool_number=_next_pool_number(scope_key, group),
+            state=ActivityQueue.STATE_STAGED if staged else ActivityQueue.STATE_ACTIVE,
+            # A pool pré-montada recebe o número só ao ser promovida.
+            pool_number=0 if staged else _next_pool_number(scope_key, group),
             pool_size=len(activities),
             skip_locked=False,
         )
     except IntegrityError:
+        if staged:
+            return None
         return ActivityQueue.objects.get(
             scope_key=scope_key,
             group=group,
             state=ActivityQueue.STATE_ACTIVE,
         )
+    lazy_min_pool = settings.QUEUE_LAZY_MIN_POOL
+    if lazy_min_pool is not None and len(activities) > lazy_min_pool:
+        deferred = activities[settings.QUEUE_MATERIALIZE_WINDOW:]
+        activities = activities[:settings.QUEUE_MATERIALIZE_WINDOW]
+        ActivityQueueOrder.objects.create(
+            queue=queue,
+            order_seed=order_seed,
+            activity_ids=pack_activity_ids(activity.id for activity in deferred),
+            remaining_count=len(deferred),
+        )
     ActivityQueueItem.objects.bulk_create([
-        ActivityQueueItem(queue=queue, activity=activity, position=position)
+        ActivityQueueItem(queue=queue, activity_id=activity.id, position=position)
         for position, activity in enumerate(activities, start=1)
     ])
     return queue
 
 
-@transaction.atomic
+def _materialize_window(queue: ActivityQueue) -> int:
+    """Cria os itens da próxima janela de uma fila com ordem compactada.
+
+    Devolve quantos ids saíram do restante; zero quando não há restante.
+    Atividades removidas do catálogo ou já presentes na fila são descartadas.
+    """
+    order = lazy_order(queue)
+    if order is None:
+        return 0
+    window = take_window(order, settings.QUEUE_MATERIALIZE_WINDOW)
+    valid = set(
+        Activity.objects.filter(pk__in=window)
+        .exclude(queue_items__queue=queue)
+        .values_list('pk', flat=True)
+    )
+    maximum = queue.items.aggregate(value=Max('position'))['value'] or 0
+    created = ActivityQueueItem.objects.bulk_create([
+        ActivityQueueItem(queue=queue, activity_id=activity_id, position=position)
+        for position, activity_id in enumerate(
+            (activity_id for activity_id in window if activity_id in valid),
+            start=maximum + 1,
+        )
+    ])
+    if len(created) < len(window):
+        adjust_queue_counters(queue, pool_size=len(created) - len(window))
+    bump_queue_version(queue)
+    increment_metric('queue_materialized_items', amount=len(created))
+    return len(window)
+
+
+@service_transaction('stage_next_queue')
+def stage_next_queue(*, scope_key: str, group_id: int) -> ActivityQueue | None:
+    """Monta a próxima pool normal enquanto a fila ativa ainda tem itens."""
+    group = Group.objects.get(pk=group_id)
+    active = ActivityQueue.objects.select_for_update().filter(
+        scope_key=scope_key,
+        group=group,
+        state=ActivityQueue.STATE_ACTIVE,
+    ).first()
+    if active is None:
+        # Sem fila ativa a próxima requisição monta a pool normalmente.
+        return None
+    if ActivityQueue.objects.filter(
+        scope_key=scope_key,
+        group=group,
+        state=ActivityQueue.STATE_STAGED,
+    ).exists():
+        increment_metric('queue_prefetch', result='exists')
+        return None
+    staged = _create_normal_queue(scope_key, group, staged=True)
+    increment_metric('queue_prefetch', result='staged' if staged else 'empty')
+    return staged
+
+
+def _promote_staged_queue(scope_key: str, group: Group) -> ActivityQueue | None:
+    """Ativa a pool pré-montada, expirando o que deixou de ser elegível desde então.
+
+    Substitui a consulta de elegibilidade com sorteio e a inserção de todos os
+    itens por uma única atualização dos itens pendentes.
+    """
+    staged = ActivityQueue.objects.select_for_update().filter(
+        scope_key=scope_key,
+        group=group,
+        state=ActivityQueue.STATE_STAGED,
+    ).first()
+    if staged is None:
+        increment_metric('queue_prefetch', result='miss')
+        return None
+    # As exclusões de "feita hoje" valem apenas para o dia da montagem.
+    fresh = timezone.localdate(staged.created_at) == timezone.localdate()
+    expired = 0
+    if fresh:
+        expired = staged.items.filter(state=ActivityQueueItem.STATE_PENDING).exclude(
+            activity_id__in=eligible_activities(selected_group=group).values('id')
+        ).update(state=ActivityQueueItem.STATE_EXPIRED)
+        adjust_queue_counters(staged, expired=expired)
+    if not fresh or staged.available_count <= 0:
+        staged.state = ActivityQueue.STATE_CANCELLED
+        staged.closed_at = timezone.now()
+        staged.save(update_fields=['state', 'closed_at'])
+        increment_metric('queue_prefetch', result='discarded')
+        return None
+    staged.state = ActivityQueue.STATE_ACTIVE
+    staged.pool_number = _next_pool_number(scope_key, group)
+    staged.save(update_fields=['state', 'pool_number'])
+    if expired:
+        bump_queue_version(staged)
+    increment_metric('queue_prefetch', result='promoted')
+    return staged
+
+
+@service_transaction('get_or_create_active_queue')
 def get_or_create_active_queue(*, scope_key: str, selected_group: Group | None):
     group = normalize_group(selected_group)
     queue = ActivityQueue.objects.select_for_update().filter(
@@ -398,65 +657,133 @@ def get_or_create_active_queue(*, scope_key: str, selected_group: Group | None):
         next_queue = finalize_queue_if_finished(queue)
         if next_queue:
             return next_queue
-    return _create_normal_queue(scope_key, group)
+    return _promote_staged_queue(scope_key, group) or _create_normal_queue(scope_key, group)
+
+
+def reconciliation_token() -> str:
+    """Resume o estado que pode invalidar o item apresentado aos escopos.
+
+    Cobre o dia local (vigências premium) e as ReconciliationGeneration do
+    catálogo e das execuções. As execuções são globais: outro escopo pode
+    esgotar a categoria ou os minutos do grupo ou abrir um premium.
+    """
+    keys = [ReconciliationGeneration.CATALOG, ReconciliationGeneration.EXECUTIONS]
+    generations = dict(
+        ReconciliationGeneration.objects.filter(pk__in=keys).values_list('key', 'value')
+    )
+    return '|'.join([
+        timezone.localdate().isoformat(),
+        *(str(generations.get(key, 0)) for key in keys),
+    ])
+
+
+def _presentation(group: Group, item: ActivityQueueItem | None, reason: str | None = None):
+    metrics = group_daily_metrics(group)
+    return QueuePresentationResult(
+        item=item,
+        reason=reason,
+        group=group,
+        consumed_daily_minutes=metrics['group_consumed_daily_minutes'],
+        remaining_daily_minutes=metrics['group_remaining_daily_minutes'],
+    )
+
+
+def _present_current_item(*, scope_key: str, group: Group) -> QueuePresentationResult | None:
+    """Devolve, sem bloqueios, o item já apresentado quando nada mudou."""
+    queue = ActivityQueue.objects.filter(
+        scope_key=scope_key,
+        group=group,
+        state=ActivityQueue.STATE_ACTIVE,
+    ).only('id', 'fast_path_token', 'version').first()
+    if not queue or not queue.fast_path_token:
+        return None
+    if queue.fast_path_token != _fast_path_token(reconciliation_token(), queue.version):
+        return None
+    item = ActivityQueueItem.objects.select_related(
+        'queue__group', 'activity__category__group'
+    ).filter(
+        queue_id=queue.id,
+        state__in=[ActivityQueueItem.STATE_PRESENTED, ActivityQueueItem.STATE_STARTED],
+    ).order_by('position').first()
+    if not item:
+        return None
+    return _presentation(group, item)
 
 
-@transaction.atomic
 def present_next_item(*, scope_key: str, selected_group: Group | None) -> QueuePresentationResult:
     group = normalize_group(selected_group)
+    result = _present_current_item(scope_key=scope_key, group=group)
+    increment_metric('queue_next_fast_path', result='hit' if result else 'miss')
+    if result:
+        return result
+    return _present_next_item_locked(scope_key=scope_key, group=group)
+
+
+def _fast_path_token(token: str, version: int) -> str:
+    return hashlib.sha256(f'{token}:{version}'.encode('utf-8')).hexdigest()
+
+
+def _remember_reconciliation(queue: ActivityQueue, token: str) -> None:
+    queue.version = ActivityQueue.objects.filter(pk=queue.pk).values_list(
+        'version', flat=True
+    ).get()
+    token = _fast_path_token(token, queue.version)
+    if queue.fast_path_token != token:
+        queue.fast_path_token = token
+        queue.save(update_fields=['fast_path_token'])
+
+
+def _first_pending_item(queue: ActivityQueue) -> ActivityQueueItem | None:
+    return pending_items(queue.id).select_related(
+        'queue__group', 'activity__category__group'
+    ).first()
+
+
+@service_transaction('present_next_item')
+def _present_next_item_locked(*, scope_key: str, group: Group) -> QueuePresentationResult:
+    # O token é lido antes da reconciliação: uma alteração concorrente que a
+    # reconciliação não enxergou sempre invalida o caminho rápido seguinte.
+    token = reconciliation_token()
     for _attempt in range(3):
         queue = get_or_create_active_queue(scope_key=scope_key, selected_group=group)
         if not queue:
-            metrics = group_daily_metrics(group)
-            return QueuePresentationResult(
-                item=None,
-                reason=diagnose_empty_queue(group),
-                group=group,
-                consumed_daily_minutes=metrics['group_consumed_daily_minutes'],
-                remaining_daily_minutes=metrics['group_remaining_daily_minutes'],
-            )
+            return _presentation(group, None, diagnose_empty_queue(group))
         item = queue.items.select_related('queue__group', 'activity__category__group').filter(
             state__in=[ActivityQueueItem.STATE_PRESENTED, ActivityQueueItem.STATE_STARTED]
         ).order_by('position').first()
         if item:
-            metrics = group_daily_metrics(group)
-            return QueuePresentationResult(
-                item=item,
-                reason=None,
-                group=group,
-                consumed_daily_minutes=metrics['group_consumed_daily_minutes'],
-                remaining_daily_minutes=metrics['group_remaining_daily_minutes'],
-            )
-        item = queue.items.select_related('queue__group', 'activity__category__group').filter(
-            state=ActivityQueueItem.STATE_PENDING
-        ).order_by('position').first()
+            _remember_reconciliation(queue, token)
+            return _presentation(group, item)
+        item = _first_pending_item(queue)
+        while not item and _materialize_window(queue):
+            _expire_invalid_items(queue)
+            item = _first_pending_item(queue)
         if item:
             item.state = ActivityQueueItem.STATE_PRESENTED
             item.presented_at = timezone.now()
             item.save(update_fields=['state', 'presented_at'])
-            metrics = group_daily_metrics(group)
-            return QueuePresentationResult(
-                item=item,
-                reason=None,
-                group=group,
-                consumed_daily_minutes=metrics['group_consumed_daily_minutes'],
-                remaining_daily_minutes=metrics['group_remaining_daily_minutes'],
-            )
+            item.queue.version = bump_queue_version(queue)
+            _remember_reconciliation(queue, token)
+            return _presentation(group, item)
+        # Nenhum item disponível: contadores que ainda prometem algum divergiram.
+        refresh_counters_if_drifted(queue)
         finalize_queue_if_finished(queue)
-    metrics = group_daily_metrics(group)
-    return QueuePresentationResult(
-        item=None,
-        reason='unknown',
-        group=group,
-        consumed_daily_minutes=metrics['group_consumed_daily_minutes'],
-        remaining_daily_minutes=metrics['group_remaining_daily_minutes'],
-    )
+    return _presentation(group, None, 'unknown')
 
 
-@transaction.atomic
-def skip_item(*, queue_item_id: int, scope_key: str):
-    item = ActivityQueueItem.objects.select_related('queue', 'activity').select_for_update().get(
-        pk=queue_item_id
+@service_transaction('skip_item')
+def skip_item(*, queue_item_id: int, scope_key: str, expected_version: int | None = None):
+    locked_queue = lock_queue_for_item(queue_item_id)
+    if expected_version is not None and locked_queue.version != expected_version:
+        check_queue_version(
+            queue_item_id=queue_item_id,
+            expected_version=expected_version,
+            idempotent_state=ActivityQueueItem.STATE_SKIPPED,
+        )
+    item = (
+        ActivityQueueItem.objects.select_related('queue', 'activity')
+        .select_for_update(of=('self',))
+        .get(pk=queue_item_id)
     )
     queue = item.queue
     if queue.scope_key != scope_key:
@@ -487,12 +814,17 @@ def skip_item(*, queue_item_id: int, scope_key: str):
     item.state = ActivityQueueItem.STATE_SKIPPED
     item.skipped_at = timezone.now()
     item.save(update_fields=['state', 'skipped_at'])
-    ActivityPreferenceEvent.objects.get_or_create(
+    adjust_queue_counters(queue, consumed=1)
+    bump_queue_version(queue)
+    event, created = ActivityPreferenceEvent.objects.get_or_create(
         activity=item.activity,
         queue=queue,
         queue_item=item,
         event_type=ActivityPreferenceEvent.EVENT_SKIPPED,
         defaults={'weight_delta': 1},
     )
+    if created:
+        record_preference_event(event, queue)
     finalize_queue_if_finished(queue)
+    schedule_prefetch(queue)
     return item
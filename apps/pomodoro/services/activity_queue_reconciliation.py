@@ -9,16 +9,26 @@ from django.db import transaction
 from django.db.models import F, Max
 from django.utils import timezone
 
-from apps.pomodoro.models import Activity, ActivityQueue, ActivityQueueItem, History, Schedule
+from apps.pomodoro.models import Activity, ActivityQueue, ActivityQueueItem, History
 from apps.pomodoro.services.activity_queue import (
     activity_is_eligible,
+    bump_queue_version,
     category_started_count,
     group_remaining_minutes,
+    open_schedules_for_activity,
+    pending_items,
 )
+from apps.pomodoro.services.lazy_queue import insert_deferred, lazy_order, remove_deferred
+from apps.pomodoro.services.queue_counters import adjust_queue_counters
+from apps.pomodoro.services.transactions import service_transaction
 
 
 logger = logging.getLogger(__name__)
 
+# Pools pré-montadas acompanham o catálogo como as ativas para não precisarem
+# ser refeitas na promoção.
+RECONCILED_QUEUE_STATES = [ActivityQueue.STATE_ACTIVE, ActivityQueue.STATE_STAGED]
+
 
 class RandomSource(Protocol):
     def shuffle(self, values: list[object]) -> None: ...
@@ -88,10 +98,7 @@ def _premium_is_operationally_eligible(activity: Activity, queue: ActivityQueue)
     remaining = group_remaining_minutes(queue.group)
     if remaining is not None and activity.duration > remaining:
         return False
-    return not Schedule.objects.filter(
-        activity=activity,
-        state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING],
-    ).exists()
+    return not open_schedules_for_activity(activity.id).exists()
 
 
 def _eligible_premiums(queue: ActivityQueue) -> list[Activity]:
@@ -156,12 +163,16 @@ def reconcile_premium_queue(
     if not transaction.get_connection().in_atomic_block:
         raise RuntimeError('reconcile_premium_queue exige uma transacao ativa.')
 
-    queue = ActivityQueue.objects.select_for_update().select_related('group').get(pk=queue.pk)
-    if queue.state != ActivityQueue.STATE_ACTIVE or queue.mode != ActivityQueue.MODE_NORMAL:
+    queue = (
+        ActivityQueue.objects.select_for_update(of=('self',))
+        .select_related('group')
+        .get(pk=queue.pk)
+    )
+    if queue.state not in RECONCILED_QUEUE_STATES or queue.mode != ActivityQueue.MODE_NORMAL:
         return ReconciliationResult(queue_id=queue.id)
 
     items = list(
-        queue.items.select_for_update()
+        queue.items.select_for_update(of=('self',))
         .select_related('activity__category__group')
         .order_by('position', 'id')
     )
@@ -202,6 +213,13 @@ def reconcile_premium_queue(
     if not missing and desired_ids == current_ids:
         return ReconciliationResult(queue_id=queue.id)
 
+    pulled: list[int] = []
+    if missing:
+        order = lazy_order(queue)
+        if order is not None:
+            # Premiums ainda não materializados saem do restante compactado.
+            pulled = remove_deferred(order, [activity.id for activity in missing])
+
     last_active_premium_index = max(
         (index for index, item in enumerate(pending) if item.activity_id in eligible_ids),
         default=-1,
@@ -218,9 +236,8 @@ def reconcile_premium_queue(
         existing_pending=pending,
         desired=desired,
     )
-    if missing:
-        queue.pool_size = queue.items.count()
-        queue.save(update_fields=['pool_size'])
+    adjust_queue_counters(queue, pool_size=len(missing) - len(pulled))
+    bump_queue_version(queue)
 
     return ReconciliationResult(
         queue_id=queue.id,
@@ -239,7 +256,7 @@ def reconcile_all_premium_queues(
     summary = ReconciliationSummary()
     queue_ids = list(
         ActivityQueue.objects.filter(
-            state=ActivityQueue.STATE_ACTIVE,
+            state__in=RECONCILED_QUEUE_STATES,
             mode=ActivityQueue.MODE_NORMAL,
         ).order_by('id').values_list('id', flat=True)
     )
@@ -262,14 +279,18 @@ def reconcile_all_premium_queues(
     return summary
 
 
-def _insert_randomly(queue: ActivityQueue, activity: Activity) -> ActivityQueueItem:
+def _insert_randomly(queue: ActivityQueue, activity: Activity) -> ActivityQueueItem | None:
     existing = queue.items.filter(activity=activity).first()
     if existing:
         return existing
+    order = lazy_order(queue)
+    if order is not None:
+        # Com restante compactado a atividade entra nele, sem criar item.
+        if insert_deferred(order, activity.id):
+            adjust_queue_counters(queue, pool_size=1)
+        return None
     maximum = queue.items.aggregate(value=Max('position'))['value'] or 0
-    first_unconsumed = queue.items.filter(
-        state=ActivityQueueItem.STATE_PENDING
-    ).order_by('position').values_list('position', flat=True).first()
+    first_unconsumed = pending_items(queue.id).values_list('position', flat=True).first()
     position = random.randint(first_unconsumed or maximum + 1, maximum + 1)
     tail = list(
         queue.items.filter(position__gte=position)
@@ -286,36 +307,67 @@ def _insert_randomly(queue: ActivityQueue, activity: Activity) -> ActivityQueueI
         activity=activity,
         position=position,
     )
-    queue.pool_size = queue.items.count()
-    queue.save(update_fields=['pool_size'])
+    adjust_queue_counters(queue, pool_size=1)
     return item
 
 
-@transaction.atomic
-def reconcile_activity(activity: Activity, *, previous: dict[str, object] | None = None):
-    activity = Activity.objects.select_related('category__group').get(pk=activity.pk)
+def _reconcile_in_queue(queue: ActivityQueue, activity: Activity, item: ActivityQueueItem | None) -> bool:
+    eligible = activity_is_eligible(activity, queue.group, allow_global_premium=True)
+    if item:
+        if not eligible and item.state in [
+            ActivityQueueItem.STATE_PENDING,
+            ActivityQueueItem.STATE_PRESENTED,
+        ]:
+            item.state = ActivityQueueItem.STATE_EXPIRED
+            item.save(update_fields=['state'])
+            adjust_queue_counters(queue, expired=1)
+            bump_queue_version(queue)
+            return True
+    elif eligible and not activity.is_premium_active:
+        _insert_randomly(queue, activity)
+        bump_queue_version(queue)
+        return True
+    return False
+
+
+def _reconcile_activities(activity_ids: list[int]) -> bool:
+    activities = list(
+        Activity.objects.select_related('category__group')
+        .filter(pk__in=activity_ids)
+        .order_by('pk')
+    )
     queues = list(
-        ActivityQueue.objects.select_for_update()
+        ActivityQueue.objects.select_for_update(of=('self',))
         .select_related('group')
-        .filter(state=ActivityQueue.STATE_ACTIVE, mode=ActivityQueue.MODE_NORMAL)
+        .filter(state__in=RECONCILED_QUEUE_STATES, mode=ActivityQueue.MODE_NORMAL)
         .order_by('id')
     )
     changed = False
     for queue in queues:
-        item = queue.items.filter(activity=activity).first()
-        eligible = activity_is_eligible(activity, queue.group, allow_global_premium=True)
-        if item:
-            if not eligible and item.state in [
-                ActivityQueueItem.STATE_PENDING,
-                ActivityQueueItem.STATE_PRESENTED,
-            ]:
-                item.state = ActivityQueueItem.STATE_EXPIRED
-                item.save(update_fields=['state'])
-                changed = True
-        elif eligible and not activity.is_premium_active:
-            _insert_randomly(queue, activity)
-            changed = True
+        items = {
+            item.activity_id: item
+            for item in queue.items.filter(activity_id__in=activity_ids)
+        }
+        for activity in activities:
+            changed = _reconcile_in_queue(queue, activity, items.get(activity.id)) or changed
 
         result = reconcile_premium_queue(queue, rng=random)
         changed = changed or result.changed
     return changed
+
+
+@service_transaction('reconcile_activity')
+def reconcile_activity(activity: Activity, *, previous: dict[str, object] | None = None):
+    return _reconcile_activities([activity.pk])
+
+
+@service_transaction('reconcile_activities')
+def reconcile_activities(activities: list[Activity]) -> bool:
+    """Reconcilia um lote de atividades bloqueando cada fila uma única vez.
+
+    A reconciliação premium de cada fila também roda uma vez por lote, e não
+    uma vez por atividade.
+    """
+    if not activities:
+        return False
+    return _reconcile_activities([activity.pk for activity in activities])
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import serializers
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from apps.pomodoro.models import (
+    ActivityPreferenceEvent,
+    ActivityQueue,
+    ActivityQueueItem,
+    ArchivedRecord,
+    History,
+    HistoryDailySummary,
+    Schedule,
+)
+
+
+FINISHED_QUEUE_STATES = [ActivityQueue.STATE_CLOSED, ActivityQueue.STATE_CANCELLED]
+FINISHED_SCHEDULE_STATES = [
+    Schedule.STATE_COMPLETED,
+    Schedule.STATE_CANCELLED,
+    Schedule.STATE_EXPIRED,
+]
+
+
+@dataclass
+class ArchiveSummary:
+    cutoff: datetime
+    dry_run: bool = False
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+    rows: Counter = field(default_factory=Counter)
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+    def as_dict(self) -> dict[str, object]:
+        elapsed = self.elapsed_seconds
+        return {
+            'cutoff': self.cutoff.isoformat(),
+            'dry_run': self.dry_run,
+            'batches': self.batches,
+            'rows': dict(sorted(self.rows.items())),
+            'total_rows': self.total_rows,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.total_rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def retention_cutoff(days: int | None = None, *, now: datetime | None = None) -> datetime:
+    if days is None:
+        days = settings.ARCHIVE_RETENTION_DAYS
+    if days < 1:
+        # Com zero dias o corte cai no próprio dia e arquivaria o histórico de hoje.
+        raise ValueError(f'horizonte de retenção precisa ser de pelo menos 1 dia (recebido: {days})')
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def _archive(objects, summary: ArchiveSummary, extra=None) -> None:
+    if not objects:
+        return
+    label = objects[0]._meta.label_lower
+    records = []
+    for obj, serialized in zip(objects, serializers.serialize('python', objects)):
+        payload = serialized['fields']
+        if extra:
+            payload.update(extra(obj))
+        records.append(ArchivedRecord(model_label=label, object_id=obj.pk, payload=payload))
+    # Repetir um lote interrompido não duplica o arquivo.
+    ArchivedRecord.objects.bulk_create(records, ignore_conflicts=True)
+    summary.rows[label] += len(objects)
+
+
+def _summarize_histories(histories) -> None:
+    totals: dict[tuple[int, object], Counter] = {}
+    for history in histories:
+        key = (history.activity_id, timezone.localdate(history.start_time))
+        counter = totals.setdefault(key, Counter())
+        counter['executions'] += 1
+        if history.end_time is not None:
+            counter['completed'] += 1
+            counter['total_minutes'] += history.duration or 0
+    for (activity_id, date), counter in sorted(totals.items()):
+        summary, _ = HistoryDailySummary.objects.select_for_update().get_or_create(
+            activity_id=activity_id,
+            date=date,
+        )
+        HistoryDailySummary.objects.filter(pk=summary.pk).update(
+            executions=F('executions') + counter['executions'],
+            completed=F('completed') + counter['completed'],
+            total_minutes=F('total_minutes') + counter['total_minutes'],
+        )
+
+
+def _archive_schedules(schedules, summary: ArchiveSummary) -> None:
+    histories = list(History.objects.filter(schedule__in=schedules).order_by('pk'))
+    _archive(histories, summary)
+    _summarize_histories(histories)
+    _archive(schedules, summary)
+    # History acompanha o Schedule por cascata.
+    Schedule.objects.filter(pk__in=[schedule.pk for schedule in schedules]).delete()
+
+
+def archivable_queues(cutoff: datetime):
+    """Filas encerradas antes do horizonte e sem execução aberta."""
+    open_execution = Schedule.objects.filter(
+        queue_item__queue=OuterRef('pk'),
+        state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING],
+    )
+    return ActivityQueue.objects.filter(
+        Q(closed_at__lt=cutoff) | Q(closed_at__isnull=True, created_at__lt=cutoff),
+        state__in=FINISHED_QUEUE_STATES,
+    ).exclude(Exists(open_execution))
+
+
+def archivable_schedules(cutoff: datetime):
+    """Execuções encerradas fora de filas (legado) anteriores ao horizonte."""
+    return Schedule.objects.filter(
+        queue_item__isnull=True,
+        state__in=FINISHED_SCHEDULE_STATES,
+        scheduled_date__lt=timezone.localdate(cutoff),
+    )
+
+
+def _archive_queue_batch(queue_ids: list[int], summary: ArchiveSummary) -> None:
+    # A fila de revisão protege a fila de origem; a origem só sai junto dela.
+    blocked = set(
+        ActivityQueue.objects.filter(source_queue_id__in=queue_ids)
+        .exclude(pk__in=queue_ids)
+        .values_list('source_queue_id', flat=True)
+    )
+    queue_ids = [queue_id for queue_id in queue_ids if queue_id not in blocked]
+    if not queue_ids:
+        return
+    queues = list(ActivityQueue.objects.filter(pk__in=queue_ids).order_by('pk'))
+    _archive_schedules(
+        list(Schedule.objects.filter(queue_item__queue_id__in=queue_ids).order_by('pk')),
+        summary,
+    )
+    scopes = {queue.pk: (queue.scope_key, queue.group_id) for queue in queues}
+    _archive(
+        list(ActivityPreferenceEvent.objects.filter(queue_id__in=queue_ids).order_by('pk')),
+        summary,
+        # O agregado de preferências precisa do escopo depois que a fila some.
+        extra=lambda event: dict(zip(('scope_key', 'group_id'), scopes[event.queue_id])),
+    )
+    _archive(
+        list(ActivityQueueItem.objects.filter(queue_id__in=queue_ids).order_by('pk')),
+        summary,
+    )
+    _archive(queues, summary)
+    ActivityPreferenceEvent.objects.filter(queue_id__in=queue_ids).delete()
+    ActivityQueueItem.objects.filter(queue_id__in=queue_ids).delete()
+    # Filas de revisão primeiro: ids maiores referenciam as de origem.
+    for queue_id in sorted(queue_ids, reverse=True):
+        ActivityQueue.objects.filter(pk=queue_id).delete()
+
+
+def _run_batches(queryset, handler, summary, *, batch_size, max_batches, dry_run):
+    cursor = None
+    while max_batches is None or summary.batches < max_batches:
+        page = queryset.order_by('-pk')
+        if cursor is not None:
+            page = page.filter(pk__lt=cursor)
+        ids = list(page.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        cursor = ids[-1]
+        with transaction.atomic():
+            handler(ids, summary)
+            if dry_run:
+                transaction.set_rollback(True)
+        summary.batches += 1
+
+
+def archive_old_records(
+    *,
+    days: int | None = None,
+    batch_size: int = 500,
+    max_batches: int | None = None,
+    dry_run: bool = False,
+) -> ArchiveSummary:
+    """Move filas encerradas e execuções antigas para ArchivedRecord.
+
+    Cada lote roda na própria transação; interromper o comando preserva os
+    lotes concluídos e uma nova execução continua de onde parou.
+    """
+    summary = ArchiveSummary(cutoff=retention_cutoff(days), dry_run=dry_run)
+    started = time.perf_counter()
+    options = {'batch_size': batch_size, 'max_batches': max_batches, 'dry_run': dry_run}
+    _run_batches(
+        archivable_queues(summary.cutoff),
+        _archive_queue_batch,
+        summary,
+        **options,
+    )
+    _run_batches(
+        archivable_schedules(summary.cutoff),
+        lambda ids, batch_summary: _archive_schedules(
+            list(Schedule.objects.filter(pk__in=ids).order_by('pk')),
+            batch_summary,
+        ),
+        summary,
+        **options,
+    )
+    summary.elapsed_seconds = time.perf_counter() - started
+    return summary
@@ -0,0 +1,117 @@
+"""Cache curto das respostas de execução consultadas pelos timers.
+
+``/active/``, ``/status/<id>/`` e a leitura da execução serializam o mesmo
+``ActivityExecutionSerializer``, que agrega o saldo diário do grupo. A resposta
+fica guardada com chave ``(escopo, execução, versão)``; como toda mudança de
+estado incrementa ``Schedule.version``, uma entrada nunca é lida depois da
+mudança. ``server_now`` e ``remaining_seconds`` são recalculados a cada resposta.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.pomodoro.models import ActiveExecution, Schedule
+from apps.pomodoro.services import metrics
+
+
+OPEN_STATES = (Schedule.STATE_PREPARING, Schedule.STATE_RUNNING)
+# Campos que dependem do relógio e nunca são guardados.
+SERVER_TIME_FIELDS = ('server_now', 'remaining_seconds')
+
+
+def _cache_seconds() -> int:
+    return int(getattr(settings, 'EXECUTION_RESPONSE_CACHE_SECONDS', 0) or 0)
+
+
+def execution_cache_key(scope_key: str, schedule_id: int, version: int) -> str:
+    return f'pomodoro:execution:{scope_key}:{schedule_id}:{version}'
+
+
+def invalidate_execution(scope_key: str, schedule_id: int, version: int) -> None:
+    """Descarta, após o commit, a resposta guardada da versão anterior."""
+    if not _cache_seconds():
+        return
+    key = execution_cache_key(scope_key, schedule_id, version)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _with_server_time(payload: dict, expected_end_at, now) -> dict:
+    remaining = 0
+    if expected_end_at:
+        remaining = max(int((expected_end_at - now).total_seconds()), 0)
+    return {**payload, 'server_now': now, 'remaining_seconds': remaining}
+
+
+def execution_payload(
+    scope_key: str,
+    schedule_id: int,
+    serialize: Callable[[Schedule], dict],
+) -> dict | None:
+    """Resposta serializada da execução do escopo, ou None se ela não existe.
+
+    Uma leitura por chave de ``version``, ``state`` e ``expected_end_at`` decide
+    entre o cache e o caminho completo; execuções vencidas sempre seguem o
+    caminho completo, que as conclui.
+    """
+    from apps.pomodoro.services.activity_execution import reconcile_schedule
+
+    row = (
+        Schedule.objects.filter(pk=schedule_id, scope_key=scope_key)
+        .values_list('version', 'state', 'expected_end_at')
+        .first()
+    )
+    if row is None:
+        return None
+    version, state, expected_end_at = row
+    now = timezone.now()
+    ttl = _cache_seconds()
+    overdue = state in OPEN_STATES and expected_end_at is not None and expected_end_at <= now
+    if ttl and not overdue:
+        cached = cache.get(execution_cache_key(scope_key, schedule_id, version))
+        if cached is not None:
+            metrics.increment('execution_cache', result='hit')
+            return _with_server_time(cached, expected_end_at, now)
+
+    schedule = reconcile_schedule(
+        Schedule.objects.select_related(
+            'activity__category__group',
+            'queue_item__queue__group',
+        ).get(pk=schedule_id)
+    )
+    payload = dict(serialize(schedule))
+    if ttl:
+        metrics.increment('execution_cache', result='miss')
+        cached = {key: value for key, value in payload.items() if key not in SERVER_TIME_FIELDS}
+        cache.set(execution_cache_key(scope_key, schedule.pk, schedule.version), cached, ttl)
+    return payload
+
+
+def active_execution_payload(
+    scope_key: str,
+    serialize: Callable[[Schedule], dict],
+) -> tuple[dict | None, int]:
+    """Resposta de ``/active/`` e a versão do escopo.
+
+    A resposta é None quando o escopo está ocioso. Se a execução venceu e foi
+    concluída agora, a versão devolvida já é a posterior à conclusão.
+    """
+    schedule_id, version = (
+        ActiveExecution.objects.filter(pk=scope_key)
+        .values_list('schedule_id', 'version')
+        .first()
+    ) or (None, 0)
+    if schedule_id is None:
+        return None, version
+    payload = execution_payload(scope_key, schedule_id, serialize)
+    if payload is None or payload['state'] not in OPEN_STATES:
+        version = (
+            ActiveExecution.objects.filter(pk=scope_key).values_list('version', flat=True).first()
+            or version
+        )
+        return None, version
+    return payload, version
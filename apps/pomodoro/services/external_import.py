@@ -0,0 +1,421 @@
+"""Motor de importação de atividades de origens externas.
+
+Cada origem (Steam, arquivo local, ...) só sabe produzir registros e
+normalizá-los em ``ExternalItem``; a comparação com as atividades, a gravação
+em lotes, a reconciliação das filas e o cache de impressões ficam aqui.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Protocol
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.pomodoro.models import Activity, Category, ReconciliationGeneration
+from apps.pomodoro.services.activity_queue_reconciliation import (
+    activity_snapshot,
+    reconcile_activities,
+    reconcile_activity,
+)
+from apps.pomodoro.services.import_cache import load_import_cache, save_import_cache
+from apps.pomodoro.services.metrics import increment as increment_metric
+
+
+DEFAULT_BATCH_SIZE = 500
+PHASES = ('fetch', 'parse', 'diff', 'write', 'reconcile')
+
+
+class ExternalImportError(Exception):
+    """Erro seguro para apresentação na interface administrativa."""
+
+
+@dataclass(frozen=True)
+class ImportResult:
+    total: int
+    created: int
+    updated: int
+    skipped: int
+    errors: int
+
+
+@dataclass
+class ImportTimings:
+    """Segundos gastos em cada fase de uma importação.
+
+    ``fetch`` é a espera pela origem, ``parse`` a decodificação e normalização
+    dos registros, ``diff`` a comparação com as atividades, ``write`` a
+    gravação dos lotes e ``reconcile`` a reconciliação das filas.
+    """
+
+    fetch: float = 0.0
+    parse: float = 0.0
+    diff: float = 0.0
+    write: float = 0.0
+    reconcile: float = 0.0
+
+    @contextmanager
+    def measure(self, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, phase, getattr(self, phase) + time.perf_counter() - started)
+
+    def as_dict(self) -> dict[str, float]:
+        return {phase: round(getattr(self, phase), 3) for phase in PHASES}
+
+
+@dataclass(frozen=True)
+class ExternalItem:
+    external_id: str
+    name: str
+    description: str
+    fingerprint: str
+
+
+class ImportSource(Protocol):
+    """Origem de atividades externas.
+
+    ``name`` é gravado em ``Activity.external_source``. ``iter_records`` deve
+    alimentar ``digest`` com os bytes brutos lidos, para o cache da resposta,
+    e somar em ``timings.fetch`` a espera pela origem, quando recebidos;
+    ``normalize`` levanta ``ValueError`` para registros inválidos, que contam
+    como erro sem interromper a importação.
+    """
+
+    name: str
+    category: Category
+    default_duration: int
+
+    def iter_records(self, digest, timings: ImportTimings | None = None) -> Iterator[object]: ...
+
+    def normalize(self, record: object) -> ExternalItem: ...
+
+
+def positive_integer(
+    value: object,
+    *,
+    setting_name: str,
+    error_class: type[ExternalImportError] = ExternalImportError,
+) -> int:
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError) as exc:
+        raise error_class(f'A configuração {setting_name} deve ser um inteiro positivo.') from exc
+    if parsed <= 0:
+        raise error_class(f'A configuração {setting_name} deve ser um inteiro positivo.')
+    return parsed
+
+
+def load_category(
+    category_id: int,
+    *,
+    error_class: type[ExternalImportError] = ExternalImportError,
+) -> Category:
+    try:
+        return Category.objects.get(pk=category_id)
+    except Category.DoesNotExist as exc:
+        raise error_class(
+            f'A categoria de ID {category_id} não existe. '
+            'Cadastre ou configure uma categoria válida antes de importar.'
+        ) from exc
+
+
+def item_fingerprint(*parts: object) -> str:
+    payload = json.dumps(list(parts), ensure_ascii=False)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def validated_name(raw_name: object) -> str:
+    if not isinstance(raw_name, str) or not raw_name.strip():
+        raise ValueError('nome inválido')
+    name = raw_name.strip()
+    if len(name) > Activity._meta.get_field('name').max_length:
+        raise ValueError('nome excede o limite do model')
+    return name
+
+
+def validated_external_id(raw_id: object) -> str:
+    if isinstance(raw_id, bool) or raw_id is None:
+        raise ValueError('identificador inválido')
+    external_id = str(raw_id).strip()
+    if not external_id or len(external_id) > Activity._meta.get_field('external_id').max_length:
+        raise ValueError('identificador inválido')
+    return external_id
+
+
+def _new_activity(item: ExternalItem, source: ImportSource) -> Activity:
+    return Activity(
+        name=item.name,
+        description=item.description,
+        category=source.category,
+        duration=source.default_duration,
+        active=True,
+        premium=False,
+        executions_today=0,
+        priority=1,
+        external_source=source.name,
+        external_id=item.external_id,
+    )
+
+
+def _changed_fields(activity: Activity, item: ExternalItem, category: Category) -> list[str]:
+    controlled_values = {
+        'name': item.name,
+        'description': item.description,
+        'category_id': category.id,
+    }
+    changed_fields = []
+    for field_name, expected_value in controlled_values.items():
+        if getattr(activity, field_name) != expected_value:
+            setattr(activity, field_name, expected_value)
+            changed_fields.append(field_name)
+    return changed_fields
+
+
+@transaction.atomic
+def _persist_item(
+    item: ExternalItem,
+    source: ImportSource,
+    *,
+    timings: ImportTimings,
+    dry_run: bool = False,
+) -> str:
+    """Caminho item a item, usado quando a gravação de um lote falha."""
+    activity = (
+        Activity.objects.select_for_update()
+        .filter(external_source=source.name, external_id=item.external_id)
+        .first()
+    )
+    if dry_run:
+        transaction.set_rollback(True)
+
+    if activity is None:
+        activity = _new_activity(item, source)
+        activity.save()
+        with timings.measure('reconcile'):
+            reconcile_activity(activity)
+        return 'created'
+
+    previous = activity_snapshot(activity)
+    changed_fields = _changed_fields(activity, item, source.category)
+    if not changed_fields:
+        return 'skipped'
+
+    activity.save(update_fields=changed_fields)
+    if 'category_id' in changed_fields:
+        with timings.measure('reconcile'):
+            reconcile_activity(activity, previous=previous)
+    return 'updated'
+
+
+@dataclass
+class _PendingBatch:
+    creates: list[ExternalItem] = field(default_factory=list)
+    updates: list[tuple[ExternalItem, Activity, dict[str, object] | None, list[str]]] = field(
+        default_factory=list
+    )
+
+    def __len__(self) -> int:
+        return len(self.creates) + len(self.updates)
+
+
+def _existing_activities(source_name: str) -> dict[str, Activity]:
+    """Todas as atividades da origem em uma consulta, indexadas pelo id externo."""
+    return {
+        activity.external_id: activity
+        for activity in Activity.objects.filter(external_source=source_name).only(
+            'id', 'external_source', 'external_id', 'name', 'description', 'category_id',
+            'active', 'duration', 'premium', 'premium_from', 'premium_until',
+        )
+    }
+
+
+def _write_batch(batch: _PendingBatch, source: ImportSource, *, timings: ImportTimings, dry_run: bool) -> None:
+    """Grava um lote inteiro, com suas reconciliações, em uma transação."""
+    with transaction.atomic():
+        if batch.creates or batch.updates:
+            # bulk_create e bulk_update não disparam os sinais de Activity.
+            ReconciliationGeneration.bump(ReconciliationGeneration.CATALOG)
+        created = Activity.objects.bulk_create([_new_activity(item, source) for item in batch.creates])
+        with timings.measure('reconcile'):
+            reconcile_activities(created)
+
+        if batch.updates:
+            now = timezone.now()
+            activities = [activity for _item, activity, _previous, _fields in batch.updates]
+            for activity in activities:
+                # bulk_update não aplica auto_now.
+                activity.updated_at = now
+            Activity.objects.bulk_update(
+                activities,
+                ['name', 'description', 'category', 'updated_at'],
+            )
+            with timings.measure('reconcile'):
+                for _item, activity, previous, changed_fields in batch.updates:
+                    if 'category_id' in changed_fields:
+                        reconcile_activity(activity, previous=previous)
+        if dry_run:
+            transaction.set_rollback(True)
+
+
+def _flush(
+    batch: _PendingBatch,
+    counters: dict[str, int],
+    source: ImportSource,
+    *,
+    timings: ImportTimings,
+    dry_run: bool = False,
+) -> list[str]:
+    """Grava o lote e devolve os ids externos que falharam."""
+    failed: list[str] = []
+    if not batch:
+        return failed
+    try:
+        _write_batch(batch, source, timings=timings, dry_run=dry_run)
+    except Exception:
+        # Refaz o lote item a item para que uma falha afete apenas o próprio item.
+        for item in [*batch.creates, *(item for item, _activity, _previous, _fields in batch.updates)]:
+            try:
+                outcome = _persist_item(item, source, timings=timings, dry_run=dry_run)
+            except Exception:
+                counters['errors'] += 1
+                failed.append(item.external_id)
+                continue
+            counters[outcome] += 1
+    else:
+        counters['created'] += len(batch.creates)
+        counters['updated'] += len(batch.updates)
+    batch.creates.clear()
+    batch.updates.clear()
+    return failed
+
+
+_END = object()
+
+
+def run_import(
+    source: ImportSource,
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Callable[[ImportResult], None] | None = None,
+    only_changed: bool = False,
+    dry_run: bool = False,
+    limit: int | None = None,
+    timings: ImportTimings | None = None,
+) -> ImportResult:
+    """Importa os registros de ``source`` em lotes.
+
+    As atividades existentes da origem são lidas uma vez e comparadas em
+    memória; cada lote de criações e alterações é gravado com
+    ``bulk_create``/``bulk_update`` em sua própria transação, com a
+    reconciliação das filas feita uma vez por lote. Um erro no meio da leitura
+    mantém os lotes já gravados, e repetir a importação é idempotente.
+    ``progress`` recebe os contadores parciais após cada lote gravado.
+
+    Ao fim de uma leitura completa, o hash dos bytes e a impressão de cada item
+    ficam guardados. Com ``only_changed`` só os itens cuja impressão mudou são
+    comparados com as atividades; se nada mudou, as atividades nem são lidas.
+    Remover uma atividade apaga a sua impressão, e a próxima importação a
+    recria; edições locais de itens que não mudaram na origem são mantidas até
+    uma importação completa.
+
+    ``dry_run`` reverte cada lote depois de gravá-lo e não atualiza o cache;
+    ``limit`` para a leitura após esse número de registros, também sem cache,
+    já que a resposta não foi lida inteira.
+    """
+    timings = timings if timings is not None else ImportTimings()
+    cache = load_import_cache(source.name)
+    digest = hashlib.sha256()
+    fingerprints: dict[str, str] = {}
+    seen: set[str] = set()
+    existing: dict[str, Activity] | None = None
+    batch = _PendingBatch()
+    counters = {'created': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
+    total = 0
+    truncated = False
+    fetch_before = timings.fetch
+    write_seconds = 0.0
+    reconcile_before = timings.reconcile
+
+    def flush():
+        nonlocal write_seconds
+        started = time.perf_counter()
+        failed = _flush(batch, counters, source, timings=timings, dry_run=dry_run)
+        write_seconds += time.perf_counter() - started
+        for external_id in failed:
+            # Sem impressão, o modo incremental tenta o item de novo na próxima vez.
+            fingerprints.pop(external_id, None)
+
+    records = iter(source.iter_records(digest, timings))
+    parse_seconds = 0.0
+    try:
+        while True:
+            if limit is not None and total >= limit:
+                truncated = True
+                break
+            started = time.perf_counter()
+            record = next(records, _END)
+            if record is _END:
+                parse_seconds += time.perf_counter() - started
+                break
+            total += 1
+            try:
+                item = source.normalize(record)
+            except ValueError:
+                counters['errors'] += 1
+                continue
+            finally:
+                parse_seconds += time.perf_counter() - started
+            if item.external_id in seen:
+                counters['skipped'] += 1
+                continue
+            seen.add(item.external_id)
+            fingerprints[item.external_id] = item.fingerprint
+            if only_changed and cache.fingerprints.get(item.external_id) == item.fingerprint:
+                counters['skipped'] += 1
+                continue
+
+            with timings.measure('diff'):
+                if existing is None:
+                    existing = _existing_activities(source.name)
+                activity = existing.get(item.external_id)
+                if activity is None:
+                    batch.creates.append(item)
+                else:
+                    # O snapshot só interessa à reconciliação de uma troca de categoria.
+                    category_changed = activity.category_id != source.category.id
+                    previous = activity_snapshot(activity) if category_changed else None
+                    changed_fields = _changed_fields(activity, item, source.category)
+                    if changed_fields:
+                        batch.updates.append((item, activity, previous, changed_fields))
+                    else:
+                        counters['skipped'] += 1
+            if len(batch) >= batch_size:
+                flush()
+                if progress is not None:
+                    progress(ImportResult(total=total, **counters))
+
+        flush()
+    finally:
+        close = getattr(records, 'close', None)
+        if close is not None:
+            # Libera a conexão quando a leitura para antes do fim.
+            close()
+        # A espera pela origem acontece dentro da leitura dos registros.
+        timings.parse += parse_seconds - (timings.fetch - fetch_before)
+        timings.write += write_seconds - (timings.reconcile - reconcile_before)
+
+    if dry_run or truncated:
+        increment_metric('import_cache', source=source.name, result='skipped')
+    elif save_import_cache(cache, payload_hash=digest.hexdigest(), fingerprints=fingerprints):
+        increment_metric('import_cache', source=source.name, result='miss')
+    else:
+        increment_metric('import_cache', source=source.name, result='hit')
+    return ImportResult(total=total, **counters)
@@ -0,0 +1,145 @@
+"""Origem de importação a partir de um arquivo local CSV ou JSON.
+
+CSV: cabeçalho com ``external_id`` e ``name``; ``description`` é opcional.
+JSON: lista de objetos com as mesmas chaves, ou um objeto com ``items``.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import re
+from collections.abc import Iterator
+from pathlib import Path
+
+from apps.pomodoro.models import Activity, Category
+from apps.pomodoro.services.external_import import (
+    DEFAULT_BATCH_SIZE,
+    ExternalImportError,
+    ExternalItem,
+    ImportResult,
+    ImportTimings,
+    item_fingerprint,
+    load_category,
+    run_import,
+    validated_external_id,
+    validated_name,
+)
+
+
+FORMAT_CSV = 'csv'
+FORMAT_JSON = 'json'
+FORMATS = (FORMAT_CSV, FORMAT_JSON)
+CSV_REQUIRED_COLUMNS = {'external_id', 'name'}
+# Origens com importador próprio; um arquivo não pode sobrescrever as atividades delas.
+RESERVED_SOURCES = {'steam'}
+
+_SOURCE_NAME = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
+
+
+class FileImportError(ExternalImportError):
+    pass
+
+
+class FileSource:
+    """Atividades descritas em um arquivo, identificadas por ``source_name``."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        source_name: str,
+        category: Category,
+        default_duration: int,
+        file_format: str | None = None,
+    ):
+        max_length = Activity._meta.get_field('external_source').max_length
+        if not _SOURCE_NAME.match(source_name) or len(source_name) > max_length:
+            raise FileImportError(
+                f'A origem deve ter até {max_length} caracteres minúsculos, dígitos, "-" ou "_".'
+            )
+        if source_name in RESERVED_SOURCES:
+            raise FileImportError(f'A origem {source_name} tem importador próprio.')
+        self.path = Path(path)
+        if not self.path.is_file():
+            raise FileImportError(f'O arquivo {self.path} não existe.')
+        self.file_format = file_format or self.path.suffix.lstrip('.').lower()
+        if self.file_format not in FORMATS:
+            raise FileImportError('O arquivo deve ser CSV ou JSON.')
+        self.name = source_name
+        self.category = category
+        self.default_duration = default_duration
+
+    def iter_records(self, digest, timings: ImportTimings | None = None) -> Iterator[dict[str, object]]:
+        if self.file_format == FORMAT_CSV:
+            return self._iter_csv(digest)
+        return self._iter_json(digest)
+
+    def _iter_csv(self, digest) -> Iterator[dict[str, object]]:
+        with self.path.open('rb') as handle:
+            reader = csv.DictReader(self._decoded_lines(handle, digest))
+            if not CSV_REQUIRED_COLUMNS.issubset(reader.fieldnames or ()):
+                raise FileImportError('O CSV precisa das colunas external_id e name.')
+            yield from reader
+
+    @staticmethod
+    def _decoded_lines(handle, digest) -> Iterator[str]:
+        for line in handle:
+            if digest is not None:
+                digest.update(line)
+            try:
+                yield line.decode('utf-8-sig')
+            except UnicodeDecodeError as exc:
+                raise FileImportError('O arquivo precisa estar em UTF-8.') from exc
+
+    def _iter_json(self, digest) -> Iterator[dict[str, object]]:
+        # Arquivos locais são lidos de uma vez; o streaming fica para respostas HTTP.
+        raw = self.path.read_bytes()
+        if digest is not None:
+            digest.update(raw)
+        try:
+            data = json.loads(raw.decode('utf-8-sig'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise FileImportError('O arquivo não contém um JSON válido.') from exc
+        if isinstance(data, dict):
+            data = data.get('items')
+        if not isinstance(data, list):
+            raise FileImportError('O JSON deve ser uma lista de itens ou um objeto com "items".')
+        yield from data
+
+    def normalize(self, record: object) -> ExternalItem:
+        if not isinstance(record, dict):
+            raise ValueError('item inválido')
+        external_id = validated_external_id(record.get('external_id'))
+        name = validated_name(record.get('name'))
+        description = record.get('description') or (
+            f'Atividade importada de {self.name}. ID externo: {external_id}.'
+        )
+        if not isinstance(description, str):
+            raise ValueError('descrição inválida')
+        description = description.strip()
+        return ExternalItem(
+            external_id=external_id,
+            name=name,
+            description=description,
+            fingerprint=item_fingerprint(external_id, name, description),
+        )
+
+
+def import_activities_file(
+    path: str | Path,
+    *,
+    source_name: str,
+    category_id: int,
+    default_duration: int,
+    file_format: str | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    only_changed: bool = False,
+) -> ImportResult:
+    source = FileSource(
+        path,
+        source_name=source_name,
+        category=load_category(category_id, error_class=FileImportError),
+        default_duration=default_duration,
+        file_format=file_format,
+    )
+    return run_import(source, batch_size=batch_size, only_changed=only_changed)
@@ -0,0 +1,338 @@
+"""Cliente HTTP de saída comum às integrações.
+
+Mantém conexões keep-alive por host, repete com backoff e jitter as respostas
+429/5xx e as falhas de rede, e abre um circuito por serviço quando chamadas
+seguidas falham, para que as próximas falhem na hora durante uma
+indisponibilidade. Latência e resultados vão para ``metrics``.
+"""
+from __future__ import annotations
+
+import http.client
+import random
+import socket
+import ssl
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+from apps.pomodoro.services import metrics
+
+
+DEFAULT_HTTP_CLIENT_CONFIG = {
+    'attempts': 3,
+    'base_delay_ms': 250,
+    'max_delay_ms': 4000,
+    'pool_size': 4,
+    'idle_timeout_seconds': 30,
+    'failure_threshold': 5,
+    'reset_timeout_seconds': 30,
+}
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Conexão keep-alive que o servidor já fechou; vale abrir outra sem contar tentativa.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class HttpClientError(Exception):
+    pass
+
+
+class HttpStatusError(HttpClientError):
+    def __init__(self, status: int):
+        super().__init__(f'HTTP {status}')
+        self.status = status
+
+
+class HttpTimeoutError(HttpClientError):
+    pass
+
+
+class HttpUnavailableError(HttpClientError):
+    pass
+
+
+class HttpCircuitOpenError(HttpUnavailableError):
+    """O serviço falhou seguidamente e o circuito ainda não foi reaberto."""
+
+
+def client_config(service: str) -> dict[str, int]:
+    configured = getattr(settings, 'OUTBOUND_HTTP_CLIENTS', {})
+    return {
+        **DEFAULT_HTTP_CLIENT_CONFIG,
+        **configured.get('default', {}),
+        **configured.get(service, {}),
+    }
+
+
+class _ConnectionPool:
+    """Conexões ociosas de um host, reaproveitadas da mais recente para a mais antiga."""
+
+    def __init__(self, scheme: str, host: str, port: int | None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self._idle: list[tuple[http.client.HTTPConnection, float]] = []
+        self._lock = threading.Lock()
+
+    def acquire(self, *, timeout: float, idle_timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                connection, released_at = self._idle.pop()
+                if now - released_at <= idle_timeout:
+                    connection.timeout = timeout
+                    if connection.sock is not None:
+                        connection.sock.settimeout(timeout)
+                    return connection, True
+                connection.close()
+        if self.scheme == 'https':
+            connection = http.client.HTTPSConnection(
+                self.host,
+                self.port,
+                timeout=timeout,
+                context=ssl.create_default_context(),
+            )
+        else:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        return connection, False
+
+    def release(self, connection: http.client.HTTPConnection, *, size: int) -> None:
+        with self._lock:
+            if len(self._idle) < size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _released_at in idle:
+            connection.close()
+
+
+class CircuitBreaker:
+    """Fecha a porta após ``failure_threshold`` chamadas falhas seguidas.
+
+    Passados ``reset_timeout_seconds``, uma única chamada de teste é liberada;
+    o sucesso dela fecha o circuito e a falha o mantém aberto por mais um ciclo.
+    """
+
+    STATE_CLOSED = 'closed'
+    STATE_OPEN = 'open'
+    STATE_HALF_OPEN = 'half_open'
+
+    def __init__(self, service: str, *, clock=time.monotonic):
+        self.service = service
+        self.clock = clock
+        self.state = self.STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self, config: dict[str, int]) -> bool:
+        with self._lock:
+            if self.state == self.STATE_CLOSED:
+                return True
+            if self.state == self.STATE_OPEN and (
+                self.clock() - self.opened_at >= config['reset_timeout_seconds']
+            ):
+                self._transition(self.STATE_HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            if self.state != self.STATE_CLOSED:
+                self._transition(self.STATE_CLOSED)
+
+    def record_failure(self, config: dict[str, int]) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.STATE_HALF_OPEN or (
+                self.state == self.STATE_CLOSED and self.failures >= config['failure_threshold']
+            ):
+                self.opened_at = self.clock()
+                self._transition(self.STATE_OPEN)
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        metrics.increment('http_circuit', service=self.service, state=state)
+
+
+class HttpClient:
+    """Cliente de um serviço externo; use ``get_client`` para compartilhar pools e circuito."""
+
+    def __init__(self, service: str, *, sleep=time.sleep, rng=random, clock=time.monotonic):
+        self.service = service
+        self.breaker = CircuitBreaker(service, clock=clock)
+        self._sleep = sleep
+        self._rng = rng
+        self._pools: dict[tuple[str, str, int | None], _ConnectionPool] = {}
+        self._pools_lock = threading.Lock()
+
+    @contextmanager
+    def stream(
+        self,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        timeout: float,
+    ) -> Iterator[http.client.HTTPResponse]:
+        """Faz um GET e entrega a resposta 2xx para leitura incremental.
+
+        As novas tentativas só acontecem antes de o corpo ser entregue; falhas
+        durante a leitura, dentro do bloco ``with``, são convertidas nas mesmas
+        exceções, mas não repetidas.
+        """
+        config = client_config(self.service)
+        if not self.breaker.allow(config):
+            metrics.increment('http_client_requests', service=self.service, outcome='circuit_open')
+            raise HttpCircuitOpenError()
+
+        parts = urlsplit(url)
+        pool = self._pool(parts.scheme, parts.hostname, parts.port)
+        target = parts.path or '/'
+        if parts.query:
+            target = f'{target}?{parts.query}'
+        # Durante o teste do circuito semiaberto, uma única tentativa.
+        attempts = 1 if self.breaker.state == CircuitBreaker.STATE_HALF_OPEN else config['attempts']
+
+        connection, response = self._send_with_retries(
+            pool, target, headers or {}, timeout, config, attempts
+        )
+        self.breaker.record_success()
+        try:
+            yield response
+        except (TimeoutError, socket.timeout):
+            connection.close()
+            self.breaker.record_failure(config)
+            raise HttpTimeoutError() from None
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.breaker.record_failure(config)
+            raise HttpUnavailableError() from None
+        except BaseException:
+            connection.close()
+            raise
+        if response.isclosed() and not response.will_close:
+            pool.release(connection, size=config['pool_size'])
+        else:
+            # Corpo não lido até o fim: a conexão não pode ser reaproveitada.
+            connection.close()
+
+    def close(self) -> None:
+        with self._pools_lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+    def _pool(self, scheme: str, host: str | None, port: int | None) -> _ConnectionPool:
+        if scheme not in ('http', 'https') or not host:
+            raise HttpUnavailableError()
+        key = (scheme, host, port)
+        with self._pools_lock:
+            if key not in self._pools:
+                self._pools[key] = _ConnectionPool(scheme, host, port)
+            return self._pools[key]
+
+    def _send_with_retries(self, pool, target, headers, timeout, config, attempts):
+        for attempt in range(1, attempts + 1):
+            started = time.perf_counter()
+            retry_after = None
+            try:
+                connection, response = self._send(pool, target, headers, timeout, config)
+            except (TimeoutError, socket.timeout):
+                outcome, error = 'timeout', HttpTimeoutError()
+            except (OSError, http.client.HTTPException):
+                outcome, error = 'unavailable', HttpUnavailableError()
+            else:
+                status = response.status
+                if 200 <= status < 300:
+                    self._record(started, 'ok')
+                    return connection, response
+                retry_after = response.getheader('Retry-After')
+                self._discard(pool, connection, response, config)
+                outcome, error = str(status), HttpStatusError(status)
+                if status not in RETRYABLE_STATUSES:
+                    # Erro do cliente: o serviço está de pé, não conta para o circuito.
+                    self._record(started, outcome)
+                    self.breaker.record_success()
+                    raise error
+            self._record(started, outcome)
+            if attempt == attempts:
+                self.breaker.record_failure(config)
+                raise error
+            self._sleep(self._retry_delay(attempt, retry_after, config))
+
+    def _send(self, pool, target, headers, timeout, config):
+        connection, reused = pool.acquire(timeout=timeout, idle_timeout=config['idle_timeout_seconds'])
+        try:
+            connection.request('GET', target, headers=headers)
+            return connection, connection.getresponse()
+        except _STALE_CONNECTION_ERRORS:
+            connection.close()
+            if not reused:
+                raise
+        except BaseException:
+            connection.close()
+            raise
+        # As demais ociosas provavelmente também caíram: descarta todas e abre uma nova.
+        connection, _reused = pool.acquire(timeout=timeout, idle_timeout=0)
+        try:
+            connection.request('GET', target, headers=headers)
+            return connection, connection.getresponse()
+        except BaseException:
+            connection.close()
+            raise
+
+    def _discard(self, pool, connection, response, config) -> None:
+        try:
+            response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            return
+        if response.will_close:
+            connection.close()
+        else:
+            pool.release(connection, size=config['pool_size'])
+
+    def _retry_delay(self, attempt: int, retry_after: str | None, config: dict[str, int]) -> float:
+        """Full jitter até o teto exponencial, respeitando Retry-After dentro do teto."""
+        ceiling_ms = min(config['max_delay_ms'], config['base_delay_ms'] * 2 ** (attempt - 1))
+        delay = self._rng.uniform(0, ceiling_ms) / 1000
+        if retry_after and retry_after.strip().isdigit():
+            delay = max(delay, min(int(retry_after), config['max_delay_ms'] / 1000))
+        return delay
+
+    def _record(self, started: float, outcome: str) -> None:
+        metrics.increment('http_client_requests', service=self.service, outcome=outcome)
+        metrics.observe('http_client_latency', time.perf_counter() - started, service=self.service)
+
+
+_clients: dict[str, HttpClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(service: str) -> HttpClient:
+    with _clients_lock:
+        if service not in _clients:
+            _clients[service] = HttpClient(service)
+        return _clients[service]
+
+
+def reset_clients() -> None:
+    """Fecha os pools e esquece os circuitos; usado nos testes."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from apps.pomodoro.models import ImportFingerprint, ImportSourceState
+
+
+# Mantém cada IN abaixo do limite de parâmetros do SQLite.
+DELETE_CHUNK_SIZE = 500
+
+
+@dataclass(frozen=True)
+class ImportCache:
+    source: str
+    payload_hash: str | None
+    fingerprints: dict[str, str]
+
+
+def load_import_cache(source: str) -> ImportCache:
+    state = ImportSourceState.objects.filter(source=source).first()
+    return ImportCache(
+        source=source,
+        payload_hash=state.payload_hash if state else None,
+        fingerprints=dict(
+            ImportFingerprint.objects.filter(source=source).values_list('external_id', 'fingerprint')
+        ),
+    )
+
+
+def save_import_cache(cache: ImportCache, *, payload_hash: str, fingerprints: dict[str, str]) -> bool:
+    """Grava o hash e as impressões de uma resposta completa.
+
+    Devolve falso sem escrever nada quando a resposta é idêntica à anterior.
+    """
+    if payload_hash == cache.payload_hash and fingerprints == cache.fingerprints:
+        return False
+
+    stale = [
+        external_id
+        for external_id, fingerprint in cache.fingerprints.items()
+        if fingerprints.get(external_id) != fingerprint
+    ]
+    fresh = [
+        ImportFingerprint(source=cache.source, external_id=external_id, fingerprint=fingerprint)
+        for external_id, fingerprint in fingerprints.items()
+        if cache.fingerprints.get(external_id) != fingerprint
+    ]
+    with transaction.atomic():
+        ImportSourceState.objects.update_or_create(
+            source=cache.source,
+            defaults={'payload_hash': payload_hash, 'item_count': len(fingerprints)},
+        )
+        for start in range(0, len(stale), DELETE_CHUNK_SIZE):
+            ImportFingerprint.objects.filter(
+                source=cache.source,
+                external_id__in=stale[start:start + DELETE_CHUNK_SIZE],
+            ).delete()
+        ImportFingerprint.objects.bulk_create(fresh, batch_size=DELETE_CHUNK_SIZE)
+    return True
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from apps.pomodoro.models import ImportJob
+from apps.pomodoro.services.metrics import increment as increment_metric
+from apps.pomodoro.services.steam_import import (
+    SteamImportError,
+    SteamImportResult,
+    import_steam_games,
+)
+
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('total', 'created', 'updated', 'skipped', 'errors')
+GENERIC_FAILURE_MESSAGE = 'Não foi possível concluir a importação da Steam.'
+STALE_FAILURE_MESSAGE = 'A importação foi interrompida antes de terminar.'
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def start_steam_import(*, requested_by=None) -> tuple[ImportJob, bool]:
+    """Enfileira uma importação da Steam, ou devolve a que já está em andamento.
+
+    O job só é despachado depois do commit, para que a thread de fundo
+    encontre a linha gravada.
+    """
+    with transaction.atomic():
+        _fail_stale_jobs(ImportJob.SOURCE_STEAM)
+        job = _open_job(ImportJob.SOURCE_STEAM)
+        if job is not None:
+            return job, False
+        try:
+            with transaction.atomic():
+                job = ImportJob.objects.create(
+                    source=ImportJob.SOURCE_STEAM,
+                    requested_by=requested_by,
+                )
+        except IntegrityError:
+            # Outra requisição enfileirou no mesmo instante.
+            return _open_job(ImportJob.SOURCE_STEAM), False
+        job_id = job.id
+        transaction.on_commit(lambda: _dispatch(job_id))
+    increment_metric('import_job', source=job.source, result='queued')
+    return job, True
+
+
+def latest_import_job(source: str = ImportJob.SOURCE_STEAM) -> ImportJob | None:
+    return ImportJob.objects.filter(source=source).order_by('-created_at', '-id').first()
+
+
+def job_status(job: ImportJob) -> dict[str, object]:
+    """Representação usada pelo admin para acompanhar o job."""
+    return {
+        'id': job.id,
+        'source': job.source,
+        'state': job.state,
+        'state_display': job.get_state_display(),
+        'finished': not job.is_open,
+        **{counter: getattr(job, counter) for counter in COUNTER_FIELDS},
+        'error_message': job.error_message,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def run_import_job(job_id: int) -> None:
+    """Executa um job enfileirado; outro executor que o pegue primeiro vence."""
+    now = timezone.now()
+    claimed = ImportJob.objects.filter(pk=job_id, state=ImportJob.STATE_QUEUED).update(
+        state=ImportJob.STATE_RUNNING,
+        started_at=now,
+        updated_at=now,
+    )
+    if not claimed:
+        return
+
+    try:
+        result = import_steam_games(progress=lambda partial: _save_counters(job_id, partial))
+    except SteamImportError as exc:
+        _finish(job_id, ImportJob.STATE_FAILED, error_message=str(exc))
+        increment_metric('import_job', source=ImportJob.SOURCE_STEAM, result='failed')
+        return
+    except Exception:
+        logger.exception('Falha na importacao em segundo plano', extra={'import_job_id': job_id})
+        _finish(job_id, ImportJob.STATE_FAILED, error_message=GENERIC_FAILURE_MESSAGE)
+        increment_metric('import_job', source=ImportJob.SOURCE_STEAM, result='error')
+        return
+    _finish(job_id, ImportJob.STATE_SUCCEEDED, result=result)
+    increment_metric('import_job', source=ImportJob.SOURCE_STEAM, result='succeeded')
+
+
+def _open_job(source: str) -> ImportJob | None:
+    return ImportJob.objects.filter(source=source, state__in=ImportJob.OPEN_STATES).first()
+
+
+def _fail_stale_jobs(source: str) -> None:
+    """Libera a vaga de jobs cujo processo morreu sem finalizá-los."""
+    deadline = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+    stale = ImportJob.objects.filter(
+        source=source,
+        state__in=ImportJob.OPEN_STATES,
+        updated_at__lt=deadline,
+    ).update(
+        state=ImportJob.STATE_FAILED,
+        error_message=STALE_FAILURE_MESSAGE,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    if stale:
+        increment_metric('import_job', amount=stale, source=source, result='stale')
+
+
+def _save_counters(job_id: int, result: SteamImportResult) -> None:
+    ImportJob.objects.filter(pk=job_id).update(
+        **{counter: getattr(result, counter) for counter in COUNTER_FIELDS},
+        updated_at=timezone.now(),
+    )
+
+
+def _finish(
+    job_id: int,
+    state: str,
+    *,
+    result: SteamImportResult | None = None,
+    error_message: str = '',
+) -> None:
+    now = timezone.now()
+    counters = {counter: getattr(result, counter) for counter in COUNTER_FIELDS} if result else {}
+    ImportJob.objects.filter(pk=job_id).update(
+        state=state,
+        error_message=error_message,
+        finished_at=now,
+        updated_at=now,
+        **counters,
+    )
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='import-jobs')
+        return _executor
+
+
+def _dispatch(job_id: int) -> None:
+    if settings.IMPORT_JOBS_ASYNC:
+        _get_executor().submit(_run_in_worker, job_id)
+    else:
+        run_import_job(job_id)
+
+
+def _run_in_worker(job_id: int) -> None:
+    try:
+        run_import_job(job_id)
+    finally:
+        # A thread não passa pelo ciclo de requisição que fecharia a conexão.
+        connections.close_all()
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import random
+import sys
+from array import array
+from collections.abc import Iterable
+
+from apps.pomodoro.models import ActivityQueue, ActivityQueueOrder
+
+
+ID_TYPECODE = 'q'
+
+
+def pack_activity_ids(activity_ids: Iterable[int]) -> bytes:
+    """Empacota os ids em little-endian, independente da plataforma."""
+    values = array(ID_TYPECODE, activity_ids)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_activity_ids(data: bytes | memoryview) -> array:
+    values = array(ID_TYPECODE)
+    values.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def lazy_order(queue: ActivityQueue) -> ActivityQueueOrder | None:
+    return ActivityQueueOrder.objects.filter(queue_id=queue.pk, remaining_count__gt=0).first()
+
+
+def save_remaining(order: ActivityQueueOrder, remaining: array) -> None:
+    order.activity_ids = pack_activity_ids(remaining)
+    order.remaining_count = len(remaining)
+    order.save(update_fields=['activity_ids', 'remaining_count'])
+
+
+def take_window(order: ActivityQueueOrder, size: int) -> list[int]:
+    """Retira do início do restante os próximos ``size`` ids."""
+    remaining = unpack_activity_ids(order.activity_ids)
+    window = remaining[:size].tolist()
+    save_remaining(order, remaining[size:])
+    return window
+
+
+def insert_deferred(order: ActivityQueueOrder, activity_id: int, *, rng=random) -> bool:
+    """Sorteia a posição de uma atividade nova no restante; falso se já estiver nele."""
+    remaining = unpack_activity_ids(order.activity_ids)
+    if activity_id in remaining:
+        return False
+    remaining.insert(rng.randint(0, len(remaining)), activity_id)
+    save_remaining(order, remaining)
+    return True
+
+
+def remove_deferred(order: ActivityQueueOrder, activity_ids: Iterable[int]) -> list[int]:
+    """Remove ids do restante e devolve os que estavam nele."""
+    wanted = set(activity_ids)
+    remaining = unpack_activity_ids(order.activity_ids)
+    removed = [activity_id for activity_id in remaining if activity_id in wanted]
+    if removed:
+        save_remaining(
+            order,
+            array(ID_TYPECODE, (value for value in remaining if value not in wanted)),
+        )
+    return removed
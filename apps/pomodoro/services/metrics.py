@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter
+
+
+# Limites, em ms, dos baldes cumulativos de ``observe``.
+LATENCY_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = threading.Lock()
+_counters: Counter[tuple[str, tuple[tuple[str, str], ...]]] = Counter()
+
+
+def _key(name: str, labels: dict[str, object]) -> tuple[str, tuple[tuple[str, str], ...]]:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def increment(name: str, amount: int = 1, **labels: object) -> None:
+    """Contador em memória do processo; cada worker do Gunicorn mantém o seu."""
+    with _lock:
+        _counters[_key(name, labels)] += amount
+
+
+def observe(name: str, seconds: float, **labels: object) -> None:
+    """Histograma de latência: ``<name>_count``, ``<name>_sum_ms`` e ``<name>_bucket`` por ``le``."""
+    elapsed_ms = seconds * 1000
+    with _lock:
+        _counters[_key(f'{name}_count', labels)] += 1
+        _counters[_key(f'{name}_sum_ms', labels)] += round(elapsed_ms)
+        for bound in (*LATENCY_BUCKETS_MS, '+Inf'):
+            if bound == '+Inf' or elapsed_ms <= bound:
+                _counters[_key(f'{name}_bucket', {**labels, 'le': bound})] += 1
+
+
+def get_count(name: str, **labels: object) -> int:
+    with _lock:
+        return _counters[_key(name, labels)]
+
+
+def snapshot() -> dict[str, int]:
+    with _lock:
+        items = list(_counters.items())
+    result = {}
+    for (name, labels), value in sorted(items):
+        suffix = ','.join(f'{label}={value_}' for label, value_ in labels)
+        result[f'{name}{{{suffix}}}' if suffix else name] = value
+    return result
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.pomodoro.models import (
+    Activity,
+    ActivityPreferenceEvent,
+    ActivityPreferenceWeight,
+    ActivityQueue,
+    ArchivedRecord,
+    Group,
+)
+
+
+FAVORITE_WEIGHT = 4
+# Score decaído mínimo para que a atividade continue contando como favorita;
+# sem decaimento um único favorite_completed basta para sempre.
+FAVORITE_MIN_SCORE = 0.5
+
+
+def half_life_seconds() -> float | None:
+    days = getattr(settings, 'PREFERENCE_WEIGHT_HALF_LIFE_DAYS', None)
+    return days * 86400 if days else None
+
+
+def decay_factor(since: datetime, now: datetime) -> float:
+    half_life = half_life_seconds()
+    if half_life is None:
+        return 1.0
+    elapsed = max((now - since).total_seconds(), 0.0)
+    return 0.5 ** (elapsed / half_life)
+
+
+def _score_field(event_type: str) -> str | None:
+    if event_type == ActivityPreferenceEvent.EVENT_FAVORITE_COMPLETED:
+        return 'favorite_score'
+    if event_type == ActivityPreferenceEvent.EVENT_SKIPPED:
+        return 'skip_score'
+    return None
+
+
+def record_preference_event(event: ActivityPreferenceEvent, queue: ActivityQueue) -> None:
+    """Aplica o evento recém-criado ao agregado da mesma transação."""
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError('record_preference_event exige uma transacao ativa.')
+    now = timezone.now()
+    weight, _created = ActivityPreferenceWeight.objects.select_for_update().get_or_create(
+        scope_key=queue.scope_key,
+        group_id=queue.group_id,
+        activity_id=event.activity_id,
+        defaults={'decayed_at': now},
+    )
+    factor = decay_factor(weight.decayed_at, now)
+    weight.favorite_score *= factor
+    weight.skip_score *= factor
+    field = _score_field(event.event_type)
+    if field:
+        setattr(weight, field, getattr(weight, field) + event.weight_delta)
+    weight.event_count += 1
+    weight.decayed_at = now
+    weight.save(update_fields=['favorite_score', 'skip_score', 'event_count', 'decayed_at'])
+
+
+def favorite_weights(scope_key: str, group: Group) -> dict[int, int]:
+    now = timezone.now()
+    rows = ActivityPreferenceWeight.objects.filter(
+        scope_key=scope_key,
+        group=group,
+        favorite_score__gt=0,
+    ).values_list('activity_id', 'favorite_score', 'decayed_at')
+    return {
+        activity_id: FAVORITE_WEIGHT
+        for activity_id, score, decayed_at in rows
+        if score * decay_factor(decayed_at, now) >= FAVORITE_MIN_SCORE
+    }
+
+
+def _archived_events(batch_size: int):
+    """Eventos já arquivados, cujas filas não existem mais."""
+    activity_ids = set(Activity.objects.values_list('id', flat=True))
+    group_ids = set(Group.objects.values_list('id', flat=True))
+    records = ArchivedRecord.objects.filter(
+        model_label=ActivityPreferenceEvent._meta.label_lower,
+    ).order_by('object_id').values_list('payload', flat=True)
+    for payload in records.iterator(chunk_size=batch_size):
+        if payload['activity'] not in activity_ids or payload['group_id'] not in group_ids:
+            continue
+        yield (
+            payload['scope_key'],
+            payload['group_id'],
+            payload['activity'],
+            payload['event_type'],
+            payload['weight_delta'],
+            parse_datetime(payload['created_at']),
+        )
+
+
+@dataclass
+class BackfillSummary:
+    events: int = 0
+    weights: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {'events': self.events, 'weights': self.weights}
+
+
+def rebuild_preference_weights(*, batch_size: int = 2000, dry_run: bool = False) -> BackfillSummary:
+    """Recalcula todo o agregado a partir dos eventos, inclusive os arquivados.
+
+    Cada evento entra com o decaimento acumulado desde ``created_at``, de
+    modo que o resultado equivale a ter aplicado os eventos um a um.
+    """
+    summary = BackfillSummary()
+    now = timezone.now()
+    totals: dict[tuple[str, int, int], ActivityPreferenceWeight] = {}
+    events = ActivityPreferenceEvent.objects.order_by('id').values_list(
+        'queue__scope_key',
+        'queue__group_id',
+        'activity_id',
+        'event_type',
+        'weight_delta',
+        'created_at',
+    )
+    with transaction.atomic():
+        for scope_key, group_id, activity_id, event_type, delta, created_at in chain(
+            events.iterator(chunk_size=batch_size),
+            _archived_events(batch_size),
+        ):
+            summary.events += 1
+            key = (scope_key, group_id, activity_id)
+            weight = totals.get(key)
+            if weight is None:
+                weight = totals[key] = ActivityPreferenceWeight(
+                    scope_key=scope_key,
+                    group_id=group_id,
+                    activity_id=activity_id,
+                    decayed_at=now,
+                )
+            field = _score_field(event_type)
+            if field:
+                setattr(
+                    weight,
+                    field,
+                    getattr(weight, field) + delta * decay_factor(created_at, now),
+                )
+            weight.event_count += 1
+        summary.weights = len(totals)
+        ActivityPreferenceWeight.objects.all().delete()
+        ActivityPreferenceWeight.objects.bulk_create(totals.values(), batch_size=batch_size)
+        if dry_run:
+            transaction.set_rollback(True)
+    return summary
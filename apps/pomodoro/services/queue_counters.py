@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from apps.pomodoro.models import ActivityQueue, ActivityQueueItem, ActivityQueueOrder
+from apps.pomodoro.services import metrics
+
+
+logger = logging.getLogger(__name__)
+
+CONSUMED_STATES = [ActivityQueueItem.STATE_COMPLETED, ActivityQueueItem.STATE_SKIPPED]
+COUNTER_FIELDS = ('pool_size', 'consumed_count', 'expired_count')
+
+
+def adjust_queue_counters(
+    queue: ActivityQueue,
+    *,
+    pool_size: int = 0,
+    consumed: int = 0,
+    expired: int = 0,
+) -> None:
+    """Aplica deltas aos contadores com um UPDATE atômico.
+
+    Quem chama já detém o bloqueio da fila; a instância em memória recebe os
+    mesmos deltas para que a resposta reflita o novo estado.
+    """
+    deltas = {'pool_size': pool_size, 'consumed_count': consumed, 'expired_count': expired}
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    ActivityQueue.objects.filter(pk=queue.pk).update(
+        **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+    for name, delta in deltas.items():
+        setattr(queue, name, getattr(queue, name) + delta)
+
+
+def counted_items(queue_ids=None):
+    """Contadores reais de todas as filas em uma única passada GROUP BY queue_id.
+
+    Atividades ainda não materializadas de filas grandes entram em pool_size.
+    """
+    items = ActivityQueueItem.objects.order_by()
+    orders = ActivityQueueOrder.objects.filter(remaining_count__gt=0).order_by()
+    if queue_ids is not None:
+        items = items.filter(queue_id__in=queue_ids)
+        orders = orders.filter(queue_id__in=queue_ids)
+    rows = items.values('queue_id').annotate(
+        pool_size=Count('id'),
+        consumed_count=Count('id', filter=Q(state__in=CONSUMED_STATES)),
+        expired_count=Count('id', filter=Q(state=ActivityQueueItem.STATE_EXPIRED)),
+    )
+    counters = {
+        row['queue_id']: tuple(row[name] for name in COUNTER_FIELDS)
+        for row in rows
+    }
+    for queue_id, remaining in orders.values_list('queue_id', 'remaining_count'):
+        pool_size, consumed, expired = counters.get(queue_id, (0, 0, 0))
+        counters[queue_id] = (pool_size + remaining, consumed, expired)
+    return counters
+
+
+def _stored_counters(queue_ids=None):
+    queues = ActivityQueue.objects.order_by()
+    if queue_ids is not None:
+        queues = queues.filter(pk__in=queue_ids)
+    return {row[0]: tuple(row[1:]) for row in queues.values_list('pk', *COUNTER_FIELDS)}
+
+
+def _drift(stored, actual):
+    return {
+        queue_id: (counters, actual.get(queue_id, (0, 0, 0)))
+        for queue_id, counters in stored.items()
+        if counters != actual.get(queue_id, (0, 0, 0))
+    }
+
+
+def repair_queue_counters(queue_ids) -> int:
+    """Recalcula os contadores das filas informadas sob bloqueio."""
+    queue_ids = sorted(queue_ids)
+    if not queue_ids:
+        return 0
+    with transaction.atomic():
+        queues = list(
+            ActivityQueue.objects.select_for_update(of=('self',))
+            .filter(pk__in=queue_ids)
+            .order_by('pk')
+        )
+        actual = counted_items(queue_ids)
+        drifted = []
+        for queue in queues:
+            counters = actual.get(queue.pk, (0, 0, 0))
+            if tuple(getattr(queue, name) for name in COUNTER_FIELDS) == counters:
+                continue
+            for name, value in zip(COUNTER_FIELDS, counters):
+                setattr(queue, name, value)
+            drifted.append(queue)
+        ActivityQueue.objects.bulk_update(drifted, COUNTER_FIELDS)
+    if drifted:
+        metrics.increment('queue_counter_repairs', amount=len(drifted))
+    return len(drifted)
+
+
+def refresh_counters_if_drifted(queue: ActivityQueue) -> bool:
+    """Corrige uma fila cujos contadores contradizem os itens; devolve se corrigiu."""
+    stored = _stored_counters([queue.pk]).get(queue.pk)
+    actual = counted_items([queue.pk]).get(queue.pk, (0, 0, 0))
+    if stored == actual:
+        return False
+    logger.warning(
+        'Contadores da fila divergiram dos itens',
+        extra={'queue_id': queue.pk, 'stored': stored, 'actual': actual},
+    )
+    metrics.increment('queue_counter_drift')
+    ActivityQueue.objects.filter(pk=queue.pk).update(**dict(zip(COUNTER_FIELDS, actual)))
+    for name, value in zip(COUNTER_FIELDS, actual):
+        setattr(queue, name, value)
+    return True
+
+
+@dataclass
+class CounterVerification:
+    queues: int = 0
+    drifted: dict[int, tuple] = field(default_factory=dict)
+    repaired: int = 0
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            'queues': self.queues,
+            'drifted': len(self.drifted),
+            'repaired': self.repaired,
+            'samples': [
+                {
+                    'queue_id': queue_id,
+                    'stored': dict(zip(COUNTER_FIELDS, stored)),
+                    'actual': dict(zip(COUNTER_FIELDS, actual)),
+                }
+                for queue_id, (stored, actual) in sorted(self.drifted.items())[:20]
+            ],
+        }
+
+
+def verify_queue_counters(*, repair: bool = False) -> CounterVerification:
+    """Compara os contadores gravados com uma única contagem agrupada dos itens."""
+    stored = _stored_counters()
+    verification = CounterVerification(
+        queues=len(stored),
+        drifted=_drift(stored, counted_items()),
+    )
+    if verification.drifted:
+        metrics.increment('queue_counter_drift', amount=len(verification.drifted))
+    if repair:
+        verification.repaired = repair_queue_counters(verification.drifted)
+    return verification
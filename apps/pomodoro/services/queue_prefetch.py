@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from apps.pomodoro.models import ActivityQueue
+from apps.pomodoro.services.metrics import increment as increment_metric
+
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def prefetch_due(queue: ActivityQueue) -> bool:
+    """Indica se a fila já consumiu a fração configurada da pool."""
+    threshold = settings.QUEUE_PREFETCH_THRESHOLD
+    if threshold is None or queue.state != ActivityQueue.STATE_ACTIVE or not queue.pool_size:
+        return False
+    return queue.consumed_count + queue.expired_count >= threshold * queue.pool_size
+
+
+def schedule_prefetch(queue: ActivityQueue) -> None:
+    """Agenda a montagem da próxima pool para depois do commit da transação atual."""
+    if not prefetch_due(queue):
+        return
+    scope_key, group_id = queue.scope_key, queue.group_id
+    transaction.on_commit(lambda: _dispatch(scope_key, group_id))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='queue-prefetch')
+        return _executor
+
+
+def _dispatch(scope_key: str, group_id: int) -> None:
+    if settings.QUEUE_PREFETCH_ASYNC:
+        _get_executor().submit(_run_in_worker, scope_key, group_id)
+    else:
+        _run(scope_key, group_id)
+
+
+def _run_in_worker(scope_key: str, group_id: int) -> None:
+    try:
+        _run(scope_key, group_id)
+    finally:
+        # A thread não passa pelo ciclo de requisição que fecharia a conexão.
+        connections.close_all()
+
+
+def _run(scope_key: str, group_id: int) -> None:
+    from apps.pomodoro.services.activity_queue import stage_next_queue
+
+    try:
+        stage_next_queue(scope_key=scope_key, group_id=group_id)
+    except Exception:
+        # A pré-montagem é só uma otimização: sem ela a fila é criada na requisição.
+        logger.exception(
+            'Falha ao pre-montar a proxima fila',
+            extra={'scope_key': scope_key, 'group_id': group_id},
+        )
+        increment_metric('queue_prefetch', result='error')
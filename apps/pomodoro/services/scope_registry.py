@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.pomodoro.models import Group, ScopeRegistry
+
+
+def _touch_seconds() -> int:
+    return int(getattr(settings, 'SCOPE_REGISTRY_TOUCH_SECONDS', 300) or 0)
+
+
+def record_scope_seen(scope_key: str, *, group: Group | None = None) -> None:
+    """Registra o escopo e atualiza ``last_seen_at`` e, se informado, o grupo padrão.
+
+    Cada par (escopo, grupo) escreve no máximo uma vez por
+    SCOPE_REGISTRY_TOUCH_SECONDS neste processo; com 0, toda chamada escreve.
+    """
+    if not scope_key:
+        return
+    ttl = _touch_seconds()
+    if ttl:
+        marker = f'pomodoro:scope-seen:{scope_key}:{group.pk if group else ""}'
+        if not cache.add(marker, True, ttl):
+            return
+
+    now = timezone.now()
+    changes = {'last_seen_at': now}
+    if group is not None:
+        changes['default_group'] = group
+    if not ScopeRegistry.objects.filter(pk=scope_key).update(**changes):
+        ScopeRegistry.objects.get_or_create(
+            scope_key=scope_key,
+            defaults={'first_seen_at': now, 'last_seen_at': now, 'default_group': group},
+        )
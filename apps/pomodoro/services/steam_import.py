@@ -1,28 +1,52 @@
 from __future__ import annotations
 
+import codecs
 import json
-import socket
+import re
+import time
+from collections.abc import Callable, Iterator
 from dataclasses import dataclass
 from json import JSONDecodeError
-from urllib.error import HTTPError, URLError
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
 
 from django.conf import settings
-from django.db import transaction
 
-from apps.pomodoro.models import Activity, Category
-from apps.pomodoro.services.activity_queue_reconciliation import (
-    activity_snapshot,
-    reconcile_activity,
+from apps.pomodoro.models import Category
+from apps.pomodoro.services.external_import import (
+    DEFAULT_BATCH_SIZE,
+    ExternalImportError,
+    ExternalItem,
+    ImportResult,
+    ImportTimings,
+    item_fingerprint,
+    load_category,
+    positive_integer,
+    run_import,
+    validated_name,
+)
+from apps.pomodoro.services.http_client import (
+    HttpCircuitOpenError,
+    HttpStatusError,
+    HttpTimeoutError,
+    HttpUnavailableError,
+    get_client,
 )
 
 
 STEAM_API_URL = 'https://api.steampowered.com/IPlayerService/GetOwnedGames/v1/'
 STEAM_EXTERNAL_SOURCE = 'steam'
+STEAM_REQUEST_HEADERS = {'Accept': 'application/json', 'User-Agent': 'PomodoroTask/SteamImporter'}
+READ_CHUNK_SIZE = 64 * 1024
+
+_GAMES_ARRAY = re.compile(r'"games"\s*:\s*\[')
+_RESPONSE_PREFIX = re.compile(r'\s*\{\s*"response"\s*:\s*\{')
+_WHITESPACE = re.compile(r'\s*')
 
+# A importação da Steam devolve o resultado comum do motor de importação.
+SteamImportResult = ImportResult
 
-class SteamImportError(Exception):
+
+class SteamImportError(ExternalImportError):
     """Erro seguro para apresentação na interface administrativa."""
 
 
@@ -35,23 +59,8 @@ class SteamImportConfig:
     timeout: int
 
 
-@dataclass(frozen=True)
-class SteamImportResult:
-    total: int
-    created: int
-    updated: int
-    skipped: int
-    errors: int
-
-
 def _positive_integer(value: object, *, setting_name: str) -> int:
-    try:
-        parsed = int(value)
-    except (TypeError, ValueError) as exc:
-        raise SteamImportError(f'A configuração {setting_name} deve ser um inteiro positivo.') from exc
-    if parsed <= 0:
-        raise SteamImportError(f'A configuração {setting_name} deve ser um inteiro positivo.')
-    return parsed
+    return positive_integer(value, setting_name=setting_name, error_class=SteamImportError)
 
 
 def get_steam_import_config() -> SteamImportConfig:
@@ -81,7 +90,7 @@ def get_steam_import_config() -> SteamImportConfig:
     )
 
 
-def fetch_owned_games(*, api_key: str, steam_id: str, timeout: int) -> list[dict[str, object]]:
+def _owned_games_url(*, api_key: str, steam_id: str) -> str:
     query = urlencode(
         {
             'key': api_key,
@@ -93,32 +102,91 @@ def fetch_owned_games(*, api_key: str, steam_id: str, timeout: int) -> list[dict
             'format': 'json',
         }
     )
-    request = Request(
-        f'{STEAM_API_URL}?{query}',
-        headers={'Accept': 'application/json', 'User-Agent': 'PomodoroTask/SteamImporter'},
-    )
+    api_url = getattr(settings, 'STEAM_API_URL', STEAM_API_URL)
+    return f'{api_url}?{query}'
 
+
+def stream_owned_games(
+    *,
+    api_key: str,
+    steam_id: str,
+    timeout: int,
+    digest=None,
+    timings: ImportTimings | None = None,
+) -> Iterator[dict[str, object]]:
+    """Produz os jogos à medida que a resposta da Steam chega.
+
+    ``digest``, um objeto de ``hashlib``, recebe os bytes brutos lidos;
+    ``timings.fetch`` soma a espera pela resposta e pelos blocos do corpo.
+    """
+    url = _owned_games_url(api_key=api_key, steam_id=steam_id)
     try:
-        with urlopen(request, timeout=timeout) as response:
-            status = getattr(response, 'status', response.getcode())
-            payload = response.read()
-    except HTTPError as exc:
-        if exc.code in (401, 403):
+        started = time.perf_counter()
+        with get_client(STEAM_EXTERNAL_SOURCE).stream(
+            url,
+            headers=STEAM_REQUEST_HEADERS,
+            timeout=timeout,
+        ) as response:
+            if timings is not None:
+                timings.fetch += time.perf_counter() - started
+            yield from iter_owned_games(response, digest=digest, timings=timings)
+    except HttpStatusError as exc:
+        if exc.status in (401, 403):
             raise SteamImportError('A Steam recusou as credenciais configuradas.') from None
-        raise SteamImportError(f'A Steam respondeu com HTTP {exc.code}.') from None
-    except (TimeoutError, socket.timeout):
+        raise SteamImportError(f'A Steam respondeu com HTTP {exc.status}.') from None
+    except HttpTimeoutError:
         raise SteamImportError('A consulta à Steam excedeu o tempo limite.') from None
-    except (URLError, OSError):
+    except HttpCircuitOpenError:
+        raise SteamImportError(
+            'A Steam falhou nas últimas consultas; aguarde alguns instantes antes de tentar de novo.'
+        ) from None
+    except HttpUnavailableError:
         raise SteamImportError('A Steam está indisponível no momento.') from None
 
-    if status in (401, 403):
-        raise SteamImportError('A Steam recusou as credenciais configuradas.')
-    if not 200 <= status < 300:
-        raise SteamImportError(f'A Steam respondeu com HTTP {status}.')
 
+def fetch_owned_games(*, api_key: str, steam_id: str, timeout: int) -> list[dict[str, object]]:
+    return list(stream_owned_games(api_key=api_key, steam_id=steam_id, timeout=timeout))
+
+
+class _TextStream:
+    """Buffer de texto alimentado em blocos por um stream binário UTF-8."""
+
+    def __init__(self, stream, chunk_size: int, digest=None, timings: ImportTimings | None = None):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.digest = digest
+        self.timings = timings
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        if self.timings is None:
+            chunk = self.stream.read(self.chunk_size)
+        else:
+            with self.timings.measure('fetch'):
+                chunk = self.stream.read(self.chunk_size)
+        if chunk and self.digest is not None:
+            self.digest.update(chunk)
+        try:
+            self.text += self.decoder.decode(chunk or b'', final=not chunk)
+        except UnicodeDecodeError as exc:
+            raise SteamImportError('A Steam retornou uma resposta JSON inválida.') from exc
+        self.eof = not chunk
+        return not self.eof
+
+    def drain(self) -> str:
+        while self.fill():
+            pass
+        return self.text
+
+
+def _parse_full_payload(text: str) -> list[dict[str, object]]:
     try:
-        data = json.loads(payload.decode('utf-8'))
-    except (JSONDecodeError, UnicodeDecodeError) as exc:
+        data = json.loads(text)
+    except JSONDecodeError as exc:
         raise SteamImportError('A Steam retornou uma resposta JSON inválida.') from exc
 
     if not isinstance(data, dict) or not isinstance(data.get('response'), dict):
@@ -134,6 +202,75 @@ def fetch_owned_games(*, api_key: str, steam_id: str, timeout: int) -> list[dict
     return games
 
 
+def iter_owned_games(
+    stream,
+    *,
+    chunk_size: int = READ_CHUNK_SIZE,
+    digest=None,
+    timings: ImportTimings | None = None,
+) -> Iterator[dict[str, object]]:
+    """Decodifica os jogos um a um, sem manter a resposta inteira em memória.
+
+    O cabeçalho até ``"games": [`` é pequeno; cada jogo é lido com
+    ``raw_decode`` assim que o buffer o contém por completo. Respostas sem a
+    lista de jogos são validadas por inteiro, como antes.
+    """
+    buffer = _TextStream(stream, chunk_size, digest, timings)
+    match = None
+    while match is None:
+        match = _GAMES_ARRAY.search(buffer.text)
+        if match is None and not buffer.fill():
+            yield from _parse_full_payload(buffer.text)
+            return
+    if not _RESPONSE_PREFIX.match(buffer.text, 0, match.start()):
+        raise SteamImportError('A Steam retornou uma resposta em formato inesperado.')
+
+    decoder = json.JSONDecoder()
+    position = match.end()
+    expect_item = True
+    while True:
+        position = _WHITESPACE.match(buffer.text, position).end()
+        if position >= len(buffer.text):
+            # Descarta o que já foi lido antes de acrescentar o próximo bloco.
+            buffer.text = buffer.text[position:]
+            position = 0
+            if not buffer.fill():
+                raise SteamImportError('A Steam retornou uma resposta JSON inválida.')
+            continue
+        char = buffer.text[position]
+        if char == ']':
+            break
+        if not expect_item:
+            if char != ',':
+                raise SteamImportError('A Steam retornou uma resposta JSON inválida.')
+            position += 1
+            expect_item = True
+            continue
+        try:
+            game, end = decoder.raw_decode(buffer.text, position)
+        except JSONDecodeError:
+            game, end = None, None
+        # Um valor que termina no fim do buffer pode ter sido truncado.
+        if end is None or (end == len(buffer.text) and not buffer.eof):
+            buffer.text = buffer.text[position:]
+            position = 0
+            if not buffer.fill():
+                raise SteamImportError('A Steam retornou uma resposta JSON inválida.')
+            continue
+        if not isinstance(game, dict):
+            raise SteamImportError('A Steam retornou itens de jogos inválidos.')
+        yield game
+        expect_item = False
+        position = end
+
+    # O restante do objeto é curto; basta confirmar que fecha um JSON válido.
+    tail = buffer.drain()[position + 1:]
+    try:
+        json.loads('{"response": {"games": []' + tail)
+    except JSONDecodeError as exc:
+        raise SteamImportError('A Steam retornou uma resposta JSON inválida.') from exc
+
+
 def _normalized_game(game: dict[str, object]) -> tuple[str, str]:
     appid = game.get('appid')
     if isinstance(appid, bool):
@@ -144,102 +281,81 @@ def _normalized_game(game: dict[str, object]) -> tuple[str, str]:
         raise ValueError('appid inválido') from exc
     if parsed_appid <= 0:
         raise ValueError('appid inválido')
-
-    raw_name = game.get('name')
-    if not isinstance(raw_name, str) or not raw_name.strip():
-        raise ValueError('nome inválido')
-    name = raw_name.strip()
-    if len(name) > Activity._meta.get_field('name').max_length:
-        raise ValueError('nome excede o limite do model')
-    return str(parsed_appid), name
+    return str(parsed_appid), validated_name(game.get('name'))
 
 
-@transaction.atomic
-def _persist_game(
-    *,
-    appid: str,
-    name: str,
-    category: Category,
-    default_duration: int,
-) -> str:
-    description = (
+def _steam_description(appid: str) -> str:
+    return (
         'Jogo importado automaticamente da biblioteca Steam. '
         f'Steam AppID: {appid}.'
     )
-    activity = (
-        Activity.objects.select_for_update()
-        .filter(external_source=STEAM_EXTERNAL_SOURCE, external_id=appid)
-        .first()
-    )
 
-    if activity is None:
-        activity = Activity.objects.create(
-            name=name,
-            description=description,
-            category=category,
-            duration=default_duration,
-            active=True,
-            premium=False,
-            executions_today=0,
-            priority=1,
-            external_source=STEAM_EXTERNAL_SOURCE,
+
+class SteamSource:
+    """Biblioteca da conta Steam configurada, lida de GetOwnedGames."""
+
+    name = STEAM_EXTERNAL_SOURCE
+
+    def __init__(self, config: SteamImportConfig, category: Category):
+        self.config = config
+        self.category = category
+        self.default_duration = config.default_duration
+
+    def iter_records(self, digest, timings: ImportTimings | None = None) -> Iterator[dict[str, object]]:
+        return stream_owned_games(
+            api_key=self.config.api_key,
+            steam_id=self.config.steam_id,
+            timeout=self.config.timeout,
+            digest=digest,
+            timings=timings,
+        )
+
+    def normalize(self, record: dict[str, object]) -> ExternalItem:
+        appid, name = _normalized_game(record)
+        return ExternalItem(
             external_id=appid,
+            name=name,
+            description=_steam_description(appid),
+            # O tempo de jogo entra na impressão, embora não seja gravado.
+            fingerprint=item_fingerprint(appid, name, record.get('playtime_forever')),
         )
-        reconcile_activity(activity)
-        return 'created'
-
-    previous = activity_snapshot(activity)
-    changed_fields = []
-    controlled_values = {
-        'name': name,
-        'description': description,
-        'category_id': category.id,
-    }
-    for field_name, expected_value in controlled_values.items():
-        if getattr(activity, field_name) != expected_value:
-            setattr(activity, field_name, expected_value)
-            changed_fields.append(field_name)
-
-    if not changed_fields:
-        return 'skipped'
-
-    activity.save(update_fields=changed_fields)
-    if 'category_id' in changed_fields:
-        reconcile_activity(activity, previous=previous)
-    return 'updated'
-
-
-def import_steam_games() -> SteamImportResult:
-    config = get_steam_import_config()
-    try:
-        category = Category.objects.get(pk=config.category_id)
-    except Category.DoesNotExist as exc:
-        raise SteamImportError(
-            f'A categoria de ID {config.category_id} não existe. '
-            'Cadastre ou configure uma categoria válida antes de importar.'
-        ) from exc
-
-    games = fetch_owned_games(
-        api_key=config.api_key,
-        steam_id=config.steam_id,
-        timeout=config.timeout,
+
+
+def _batch_size() -> int:
+    return _positive_integer(
+        getattr(settings, 'STEAM_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        setting_name='STEAM_IMPORT_BATCH_SIZE',
     )
-    counters = {'created': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
 
-    for game in games:
-        try:
-            appid, name = _normalized_game(game)
-            outcome = _persist_game(
-                appid=appid,
-                name=name,
-                category=category,
-                default_duration=config.default_duration,
-            )
-        except Exception:
-            # Cada item possui transação própria; falhas não deixam atividade
-            # persistida sem a reconciliação correspondente e não abortam o lote.
-            counters['errors'] += 1
-            continue
-        counters[outcome] += 1
 
-    return SteamImportResult(total=len(games), **counters)
+def steam_source() -> SteamSource:
+    """Valida a configuração e a categoria antes de qualquer consulta à Steam."""
+    config = get_steam_import_config()
+    category = load_category(config.category_id, error_class=SteamImportError)
+    return SteamSource(config, category)
+
+
+def import_steam_games(
+    *,
+    progress: Callable[[SteamImportResult], None] | None = None,
+    only_changed: bool = False,
+    dry_run: bool = False,
+    batch_size: int | None = None,
+    limit: int | None = None,
+    timings: ImportTimings | None = None,
+) -> SteamImportResult:
+    """Importa a biblioteca Steam pelo motor comum de importação.
+
+    Veja ``run_import`` para os lotes, o cache de impressões e os modos
+    ``only_changed``, ``dry_run`` e ``limit``. Sem ``batch_size``, vale
+    ``STEAM_IMPORT_BATCH_SIZE``.
+    """
+    return run_import(
+        steam_source(),
+        batch_size=batch_size or _batch_size(),
+        progress=progress,
+        only_changed=only_changed,
+        dry_run=dry_run,
+        limit=limit,
+        timings=timings,
+    )
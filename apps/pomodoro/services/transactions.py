@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import logging
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from apps.pomodoro.services import metrics
+
+
+logger = logging.getLogger(__name__)
+
+SQLSTATE_QUERY_CANCELED = '57014'
+SQLSTATE_LOCK_NOT_AVAILABLE = '55P03'
+SQLSTATE_SERIALIZATION_FAILURE = '40001'
+SQLSTATE_DEADLOCK_DETECTED = '40P01'
+RETRYABLE_SQLSTATES = {SQLSTATE_SERIALIZATION_FAILURE, SQLSTATE_DEADLOCK_DETECTED}
+
+# Ordem global de bloqueio usada por todos os serviços. Cada transação adquire
+# linhas seguindo esta sequência (e, dentro de um mesmo model, em ordem de id),
+# de forma que duas transações nunca esperem uma pela outra em ciclo.
+LOCK_ORDER = (
+    'pomodoro.ActivityQueue',
+    'pomodoro.ActivityQueueItem',
+    'pomodoro.Category',
+    'pomodoro.Group',
+    'pomodoro.Schedule',
+    'pomodoro.History',
+    'pomodoro.ActivityPreferenceWeight',
+)
+
+DEFAULT_TRANSACTION_TIMEOUTS = {
+    'statement_timeout_ms': 5000,
+    'lock_timeout_ms': 2000,
+}
+DEFAULT_TRANSACTION_RETRY = {
+    'attempts': 3,
+    'base_delay_ms': 20,
+    'max_delay_ms': 200,
+}
+
+_current_operation: ContextVar[str | None] = ContextVar('service_operation', default=None)
+
+
+class RetryableServiceError(Exception):
+    """Falha transitória de banco que o cliente pode repetir com segurança."""
+
+    def __init__(self, code: str, detail: str, *, operation: str, retry_after: int):
+        self.code = code
+        self.detail = detail
+        self.operation = operation
+        self.retry_after = retry_after
+        super().__init__(detail)
+
+    @property
+    def payload(self) -> dict[str, object]:
+        return {
+            'operation': self.operation,
+            'retry_after_seconds': self.retry_after,
+            'recoverable': True,
+        }
+
+
+class ServiceTimeout(RetryableServiceError):
+    """Transação de serviço abortada por statement_timeout ou lock_timeout."""
+
+
+class ServiceRetryExhausted(RetryableServiceError):
+    """Deadlock ou falha de serialização persistiu após todas as tentativas."""
+
+
+def sqlstate(exc: BaseException) -> str | None:
+    # psycopg 3 expõe sqlstate; psycopg2 expõe pgcode.
+    cause = exc.__cause__
+    return getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+
+
+def operation_timeouts(operation: str) -> dict[str, int]:
+    configured = getattr(settings, 'SERVICE_TRANSACTION_TIMEOUTS', {})
+    return {
+        **DEFAULT_TRANSACTION_TIMEOUTS,
+        **configured.get('default', {}),
+        **configured.get(operation, {}),
+    }
+
+
+def apply_transaction_timeouts(operation: str) -> None:
+    """Aplica SET LOCAL às configurações de timeout da transação corrente."""
+    if connection.vendor != 'postgresql':
+        return
+    timeouts = operation_timeouts(operation)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('statement_timeout', %s, true), "
+            "set_config('lock_timeout', %s, true)",
+            [
+                f"{int(timeouts['statement_timeout_ms'])}ms",
+                f"{int(timeouts['lock_timeout_ms'])}ms",
+            ],
+        )
+
+
+def retry_policy() -> dict[str, int]:
+    return {
+        **DEFAULT_TRANSACTION_RETRY,
+        **getattr(settings, 'SERVICE_TRANSACTION_RETRY', {}),
+    }
+
+
+def backoff_delay(attempt: int, *, rng=random) -> float:
+    """Full jitter: espera aleatória até o teto exponencial da tentativa."""
+    policy = retry_policy()
+    ceiling = min(policy['max_delay_ms'], policy['base_delay_ms'] * 2 ** (attempt - 1))
+    return rng.uniform(0, ceiling) / 1000
+
+
+def _retry_after() -> int:
+    return int(getattr(settings, 'SERVICE_TIMEOUT_RETRY_AFTER_SECONDS', 2))
+
+
+def _timeout_from_error(exc: OperationalError, operation: str) -> ServiceTimeout | None:
+    state = sqlstate(exc)
+    retry_after = _retry_after()
+    if state == SQLSTATE_LOCK_NOT_AVAILABLE:
+        return ServiceTimeout(
+            'lock_timeout',
+            'O recurso esta bloqueado por outra operacao; tente novamente.',
+            operation=operation,
+            retry_after=retry_after,
+        )
+    if state == SQLSTATE_QUERY_CANCELED:
+        return ServiceTimeout(
+            'statement_timeout',
+            'A operacao excedeu o tempo limite no banco; tente novamente.',
+            operation=operation,
+            retry_after=retry_after,
+        )
+    return None
+
+
+def service_transaction(operation: str):
+    """Executa a função em ``transaction.atomic`` com timeouts e novas tentativas.
+
+    Os timeouts são aplicados apenas pela operação mais externa; chamadas
+    aninhadas herdam os limites da transação que já está em andamento.
+    Deadlocks e falhas de serialização só são repetidos quando a operação é
+    dona da transação: dentro de um ``atomic`` externo o erro é propagado para
+    quem pode refazer a transação inteira.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            outermost = _current_operation.get() is None
+            owns_transaction = not connection.in_atomic_block
+            attempts = retry_policy()['attempts'] if owns_transaction else 1
+            token = _current_operation.set(_current_operation.get() or operation)
+            try:
+                for attempt in range(1, attempts + 1):
+                    try:
+                        with transaction.atomic():
+                            if outermost:
+                                apply_transaction_timeouts(operation)
+                            return func(*args, **kwargs)
+                    except OperationalError as exc:
+                        state = sqlstate(exc)
+                        if state not in RETRYABLE_SQLSTATES:
+                            _raise_timeout(exc, operation)
+                            raise
+                        if not owns_transaction:
+                            raise
+                        if attempt == attempts:
+                            metrics.increment(
+                                'service_transaction_retries_exhausted',
+                                operation=operation,
+                                sqlstate=state,
+                            )
+                            logger.warning(
+                                'Transacao de servico esgotou as novas tentativas: '
+                                'operation=%s sqlstate=%s attempts=%s',
+                                operation,
+                                state,
+                                attempts,
+                                extra={'operation': operation, 'sqlstate': state},
+                            )
+                            raise ServiceRetryExhausted(
+                                'transaction_conflict',
+                                'A operacao conflitou com outra transacao; tente novamente.',
+                                operation=operation,
+                                retry_after=_retry_after(),
+                            ) from exc
+                        metrics.increment(
+                            'service_transaction_retries',
+                            operation=operation,
+                            sqlstate=state,
+                        )
+                        time.sleep(backoff_delay(attempt))
+            finally:
+                _current_operation.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def _raise_timeout(exc: OperationalError, operation: str) -> None:
+    timeout = _timeout_from_error(exc, operation)
+    if timeout is None:
+        return
+    metrics.increment('service_transaction_timeouts', operation=operation, code=timeout.code)
+    state = sqlstate(exc)
+    logger.warning(
+        'Transacao de servico abortada por timeout: operation=%s code=%s sqlstate=%s',
+        operation,
+        timeout.code,
+        state,
+        extra={'operation': operation, 'code': timeout.code, 'sqlstate': state},
+    )
+    raise timeout from exc
+
+
+def lock_in_order(queryset):
+    """Bloqueia somente as linhas do próprio model, em ordem crescente de id.
+
+    ``of=('self',)`` evita que ``select_related`` estenda o FOR UPDATE às
+    tabelas relacionadas, o que quebraria a ordem global de ``LOCK_ORDER``.
+    """
+    return queryset.select_for_update(of=('self',)).order_by('pk')
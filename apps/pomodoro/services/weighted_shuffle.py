@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import random
+from array import array
+from collections.abc import Sequence
+from itertools import repeat
+from math import log
+from operator import sub, truediv
+from typing import Protocol
+
+
+class UniformSource(Protocol):
+    def random(self) -> float: ...
+
+
+def efraimidis_spirakis_keys(
+    weights: Sequence[float],
+    *,
+    rng: UniformSource = random,
+) -> array:
+    """Gera as chaves de amostragem ponderada sem reposição em lote.
+
+    Usa ``log(u) / w`` em vez de ``u ** (1 / w)``: a ordem é a mesma, mas o
+    logaritmo não sofre underflow com pesos altos. Ordenar as chaves em ordem
+    decrescente produz a permutação ponderada. ``u`` vem de ``1 - random()``
+    para ficar em ``(0, 1]`` e nunca chamar ``log(0)``.
+    """
+    count = len(weights)
+    draws = array('d', [rng.random() for _ in range(count)])
+    uniforms = map(sub, repeat(1.0, count), draws)
+    return array('d', map(truediv, map(log, uniforms), weights))
+
+
+def weighted_permutation(
+    weights: Sequence[float],
+    *,
+    rng: UniformSource = random,
+) -> list[int]:
+    """Índices de ``weights`` na ordem de uma amostra ponderada completa."""
+    keys = efraimidis_spirakis_keys(weights, rng=rng)
+    return sorted(range(len(keys)), key=keys.__getitem__, reverse=True)
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_api_key.models import APIKey
+
+from apps.pomodoro.models import ActiveExecution, Activity, Category, Group, Schedule
+from apps.pomodoro.services.activity_execution import build_scope_key
+
+
+class ActiveExecutionPointerTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _, cls.api_key = APIKey.objects.create_key(name='active-execution')
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Api-Key {self.api_key}')
+        self.scope_key = build_scope_key(self.client.get('/api/activities/active/').wsgi_request)
+        self.group = Group.objects.create(name='Estudos', max_daily_minutes=300)
+        self.category = Category.objects.create(
+            name='Leitura',
+            group=self.group,
+            max_daily_executions=10,
+        )
+        Activity.objects.create(name='Primeira', category=self.category, duration=30)
+        Activity.objects.create(name='Segunda', category=self.category, duration=30)
+
+    def start_next(self):
+        item = self.client.get(f'/api/activities/next/?group_id={self.group.id}').data
+        response = self.client.post(
+            f"/api/activities/{item['id']}/start/",
+            {'queue_item_id': item['queue_item_id']},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['schedule_id']
+
+    def active_without_schedule_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/activities/active/')
+        schedule_queries = [query for query in captured if 'pomodoro_schedule' in query['sql']]
+        return response, schedule_queries
+
+    def test_start_and_complete_move_the_pointer(self):
+        schedule_id = self.start_next()
+
+        pointer = ActiveExecution.objects.get(pk=self.scope_key)
+        schedule = Schedule.objects.get(pk=schedule_id)
+        self.assertEqual(pointer.schedule_id, schedule_id)
+        self.assertEqual(pointer.expected_end_at, schedule.expected_end_at)
+        self.assertEqual(pointer.version, 1)
+
+        self.client.post('/api/activities/complete/', {'schedule_id': schedule_id}, format='json')
+        pointer.refresh_from_db()
+        self.assertIsNone(pointer.schedule_id)
+        self.assertIsNone(pointer.expected_end_at)
+        self.assertEqual(pointer.version, 2)
+
+        self.start_next()
+        pointer.refresh_from_db()
+        self.assertEqual(pointer.version, 3)
+
+    def test_idle_scope_answers_without_touching_schedule(self):
+        response, schedule_queries = self.active_without_schedule_queries()
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(schedule_queries, [])
+
+        schedule_id = self.start_next()
+        self.client.post('/api/activities/complete/', {'schedule_id': schedule_id}, format='json')
+
+        response, schedule_queries = self.active_without_schedule_queries()
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(schedule_queries, [])
+
+    def test_running_scope_reads_schedule_by_primary_key(self):
+        schedule_id = self.start_next()
+
+        response, schedule_queries = self.active_without_schedule_queries()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], schedule_id)
+        self.assertTrue(schedule_queries)
+        for query in schedule_queries:
+            self.assertIn('"pomodoro_schedule"."id" =', query['sql'])
+
+    def test_overdue_execution_is_completed_and_clears_the_pointer(self):
+        schedule_id = self.start_next()
+        Schedule.objects.filter(pk=schedule_id).update(
+            expected_end_at=timezone.now() - timedelta(minutes=1),
+        )
+
+        response = self.client.get('/api/activities/active/')
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Schedule.objects.get(pk=schedule_id).state, Schedule.STATE_COMPLETED)
+        self.assertIsNone(ActiveExecution.objects.get(pk=self.scope_key).schedule_id)
@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.test import TransactionTestCase, modify_settings, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_api_key.models import APIKey
+
+from apps.pomodoro.models import ActiveExecution, Activity, Category, Group, Schedule
+from apps.pomodoro.services import active_wait, metrics
+from apps.pomodoro.services.activity_execution import complete_schedule
+from apps.pomodoro.views import ActivityViewSet
+from config.wsgi import application
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@modify_settings(ALLOWED_HOSTS={'append': '127.0.0.1'})
+class ActiveLongPollTests(TransactionTestCase):
+    """Espera longa servida por ``config.wsgi:application`` em um servidor com threads."""
+
+    serialized_rollback = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietHandler, allow_reuse_address=False)
+        cls.server.set_app(application)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        metrics.reset()
+        # A thread de consulta não pode ler o banco durante o flush do teste.
+        self.addCleanup(active_wait.stop_watcher)
+        _, self.api_key = APIKey.objects.create_key(name='long-poll')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Api-Key {self.api_key}')
+        group = Group.objects.create(name='Estudos', max_daily_minutes=300)
+        category = Category.objects.create(name='Leitura', group=group, max_daily_executions=10)
+        Activity.objects.create(name='Primeira', category=category, duration=30)
+        item = client.get(f'/api/activities/next/?group_id={group.id}').data
+        started = client.post(
+            f"/api/activities/{item['id']}/start/",
+            {'queue_item_id': item['queue_item_id']},
+            format='json',
+        )
+        self.schedule = Schedule.objects.get(pk=started.data['schedule_id'])
+
+    def get_active(self, *, authorized=True, **params):
+        host, port = self.server.server_address
+        url = f'http://{host}:{port}/api/activities/active/?{urlencode(params)}'
+        headers = {'Authorization': f'Api-Key {self.api_key}'} if authorized else {}
+        started = time.monotonic()
+        try:
+            with urlopen(Request(url, headers=headers), timeout=10) as response:
+                code, response_headers, body = response.status, response.headers, response.read()
+        except HTTPError as error:
+            code, response_headers, body = error.code, error.headers, error.read()
+        self.last_headers = response_headers
+        return code, response_headers.get('ETag'), json.loads(body) if body else None, time.monotonic() - started
+
+    def test_wait_returns_as_soon_as_the_execution_completes(self):
+        # O SQLite em memória compartilhada bloqueia a leitura da thread de
+        # consulta enquanto a conclusão escreve; no PostgreSQL ela não espera.
+        database_lock = threading.Lock()
+        scope_versions = active_wait._scope_versions
+
+        def serialized_scope_versions(scope_keys):
+            with database_lock:
+                return scope_versions(scope_keys)
+
+        result = {}
+        waiter = threading.Thread(
+            target=lambda: result.update(response=self.get_active(wait=5, since_version=1)),
+        )
+        with patch.object(active_wait, '_scope_versions', serialized_scope_versions):
+            waiter.start()
+            time.sleep(0.2)
+            with database_lock:
+                complete_schedule(self.schedule)
+            waiter.join(timeout=10)
+
+        code, etag, _body, elapsed = result['response']
+        self.assertEqual(code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(etag, '"2"')
+        self.assertLess(elapsed, 2)
+        self.assertEqual(metrics.get_count('active_long_poll', outcome='changed'), 1)
+
+    def test_unchanged_scope_answers_with_current_state_after_wait(self):
+        code, etag, body, elapsed = self.get_active(wait=0.2, since_version=1)
+
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertEqual(body['id'], self.schedule.id)
+        self.assertEqual(etag, '"1"')
+        self.assertGreaterEqual(elapsed, 0.2)
+        self.assertEqual(metrics.get_count('active_long_poll', outcome='timeout'), 1)
+
+    def test_stale_since_version_answers_immediately(self):
+        code, _etag, _body, elapsed = self.get_active(wait=5, since_version=0)
+
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertLess(elapsed, 1)
+        self.assertEqual(metrics.get_count('active_long_poll', outcome='stale'), 1)
+
+    def test_wait_ends_when_the_execution_is_due(self):
+        due = timezone.now() + timedelta(seconds=0.2)
+        Schedule.objects.filter(pk=self.schedule.pk).update(expected_end_at=due)
+        ActiveExecution.objects.filter(schedule=self.schedule).update(expected_end_at=due)
+
+        code, etag, _body, elapsed = self.get_active(wait=5, since_version=1)
+
+        self.assertEqual(code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(etag, '"2"')
+        self.assertLess(elapsed, 2)
+        self.assertEqual(metrics.get_count('active_long_poll', outcome='expired'), 1)
+
+    @override_settings(ACTIVE_LONG_POLL_MAX_WAITERS=0, ACTIVE_LONG_POLL_RETRY_AFTER_SECONDS=7)
+    def test_waits_beyond_the_thread_budget_are_told_to_retry_later(self):
+        code, _etag, body, elapsed = self.get_active(wait=5, since_version=1)
+
+        self.assertEqual(code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(body['code'], 'long_poll_busy')
+        self.assertEqual(self.last_headers['Retry-After'], '7')
+        self.assertLess(elapsed, 1)
+        self.assertEqual(metrics.get_count('active_long_poll', outcome='busy'), 1)
+
+    def test_requests_without_api_key_are_not_held(self):
+        code, _etag, _body, elapsed = self.get_active(authorized=False, wait=5)
+
+        self.assertEqual(code, status.HTTP_403_FORBIDDEN)
+        self.assertLess(elapsed, 1)
+
+    def test_invalid_params_are_rejected(self):
+        code, _etag, body, _elapsed = self.get_active(wait='nan')
+
+        self.assertEqual(code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(body['code'], 'invalid_long_poll')
+
+    def test_requests_without_wait_use_the_plain_drf_action(self):
+        view = resolve('/api/activities/active/').func
+        self.assertIs(view.cls, ActivityViewSet)
+        self.assertEqual(view.actions['get'], 'active')
+
+        code, etag, _body, elapsed = self.get_active()
+
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertEqual(etag, '"1"')
+        self.assertLess(elapsed, 1)
+        self.assertEqual(metrics.get_count('active_long_poll', outcome='timeout'), 0)
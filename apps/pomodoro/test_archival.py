@@ -0,0 +1,148 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.pomodoro.models import (
+    Activity,
+    ActivityPreferenceEvent,
+    ActivityPreferenceWeight,
+    ActivityQueue,
+    ActivityQueueItem,
+    ArchivedRecord,
+    Category,
+    Group,
+    History,
+    HistoryDailySummary,
+    Schedule,
+)
+from apps.pomodoro.services.archival import archive_old_records
+from apps.pomodoro.services.preference_weights import rebuild_preference_weights
+
+
+class ArchivalTests(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name='Arquivo')
+        category = Category.objects.create(name='Antigas', group=self.group)
+        self.activity = Activity.objects.create(name='Antiga', category=category, duration=25)
+        self.old = timezone.now() - timedelta(days=200)
+
+    def queue(self, *, closed_at, state=ActivityQueue.STATE_CLOSED, source=None):
+        queue = ActivityQueue.objects.create(
+            group=self.group,
+            scope_key='scope',
+            state=state,
+            closed_at=closed_at,
+            source_queue=source,
+            mode=ActivityQueue.MODE_SKIPPED_REVIEW if source else ActivityQueue.MODE_NORMAL,
+        )
+        item = ActivityQueueItem.objects.create(
+            queue=queue,
+            activity=self.activity,
+            position=1,
+            state=ActivityQueueItem.STATE_COMPLETED,
+        )
+        return queue, item
+
+    def execution(self, *, when, queue_item=None, completed=True):
+        schedule = Schedule.objects.create(
+            activity=self.activity,
+            queue_item=queue_item,
+            scheduled_date=timezone.localdate(when),
+            start_time=timezone.localtime(when).time().replace(tzinfo=None),
+            state=Schedule.STATE_COMPLETED if completed else Schedule.STATE_RUNNING,
+            completed=completed,
+        )
+        History.objects.create(
+            activity=self.activity,
+            schedule=schedule,
+            start_time=when,
+            end_time=when if completed else None,
+            duration=25 if completed else None,
+        )
+        return schedule
+
+    def test_archives_old_closed_queues_with_dependents_and_keeps_aggregates(self):
+        queue, item = self.queue(closed_at=self.old)
+        review, _review_item = self.queue(closed_at=self.old, source=queue)
+        self.execution(when=self.old, queue_item=item)
+        self.execution(when=self.old)
+        ActivityPreferenceEvent.objects.create(
+            activity=self.activity,
+            queue=queue,
+            queue_item=item,
+            event_type=ActivityPreferenceEvent.EVENT_FAVORITE_COMPLETED,
+        )
+        recent, _ = self.queue(closed_at=timezone.now())
+        active, _ = self.queue(closed_at=None, state=ActivityQueue.STATE_ACTIVE)
+
+        summary = archive_old_records(days=90, batch_size=1)
+
+        self.assertEqual(
+            set(ActivityQueue.objects.values_list('pk', flat=True)),
+            {recent.pk, active.pk},
+        )
+        self.assertFalse(Schedule.objects.exists())
+        self.assertFalse(History.objects.exists())
+        self.assertEqual(summary.rows['pomodoro.activityqueue'], 2)
+        self.assertEqual(summary.rows['pomodoro.history'], 2)
+        self.assertEqual(ArchivedRecord.objects.count(), summary.total_rows)
+        self.assertTrue(
+            ArchivedRecord.objects.filter(model_label='pomodoro.activityqueue', object_id=review.pk)
+            .exists()
+        )
+        daily = HistoryDailySummary.objects.get(activity=self.activity)
+        self.assertEqual(
+            (daily.date, daily.executions, daily.completed, daily.total_minutes),
+            (timezone.localdate(self.old), 2, 2, 50),
+        )
+        self.assertGreater(summary.as_dict()['rows_per_second'], 0)
+
+        rebuild_preference_weights()
+        weight = ActivityPreferenceWeight.objects.get(activity=self.activity)
+        self.assertEqual((weight.scope_key, weight.favorite_score), ('scope', 1))
+
+    def test_open_executions_and_recent_rows_are_kept(self):
+        queue, item = self.queue(closed_at=self.old)
+        self.execution(when=self.old, queue_item=item, completed=False)
+        legacy = self.execution(when=timezone.now())
+
+        archive_old_records(days=90)
+
+        self.assertTrue(ActivityQueue.objects.filter(pk=queue.pk).exists())
+        self.assertTrue(Schedule.objects.filter(pk=legacy.pk).exists())
+        self.assertFalse(ArchivedRecord.objects.exists())
+
+    def test_command_is_resumable_and_supports_dry_run(self):
+        for _ in range(3):
+            self.queue(closed_at=self.old)
+
+        dry_run = StringIO()
+        call_command('archive_old_records', '--dry-run', stdout=dry_run)
+        self.assertEqual(ActivityQueue.objects.count(), 3)
+        self.assertEqual(json.loads(dry_run.getvalue())['rows']['pomodoro.activityqueue'], 3)
+
+        first = StringIO()
+        call_command('archive_old_records', '--batch-size=1', '--max-batches=2', stdout=first)
+        self.assertEqual(ActivityQueue.objects.count(), 1)
+
+        second = StringIO()
+        call_command('archive_old_records', stdout=second)
+        report = json.loads(second.getvalue())
+        self.assertEqual(ActivityQueue.objects.count(), 0)
+        self.assertEqual(report['rows']['pomodoro.activityqueue'], 1)
+        self.assertIn('rows_per_second', report)
+
+    def test_retention_horizon_must_be_at_least_one_day(self):
+        schedule = self.execution(when=timezone.now())
+
+        with self.assertRaises(CommandError):
+            call_command('archive_old_records', '--days=0', stdout=StringIO())
+        with self.assertRaises(ValueError):
+            archive_old_records(days=0)
+
+        self.assertTrue(History.objects.filter(schedule=schedule).exists())
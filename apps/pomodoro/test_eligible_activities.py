@@ -0,0 +1,160 @@
+import random
+from datetime import timedelta
+
+from django.db.models import Count, F, Q
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.pomodoro.models import Activity, Category, Group, History, Schedule
+from apps.pomodoro.services.activity_queue import (
+    eligible_activities,
+    eligible_activity_rows,
+    group_remaining_minutes,
+    normalize_group,
+)
+
+
+def reference_eligible_ids(*, selected_group, include_done_today=False):
+    """Implementação anterior (DISTINCT sobre joins), mantida como oráculo."""
+    group = normalize_group(selected_group)
+    today = timezone.localdate()
+    queryset = Activity.objects.filter(active=True, category__isnull=False)
+    if not include_done_today:
+        queryset = queryset.exclude(
+            id__in=History.objects.filter(end_time__date=today).values('activity_id')
+        )
+    if not group.is_default:
+        queryset = queryset.filter(
+            Q(category__group=group)
+            | Q(premium=True, premium_from__lte=today, premium_until__gte=today)
+        )
+    exhausted = Category.objects.annotate(
+        started=Count(
+            'activities__histories',
+            filter=Q(activities__histories__start_time__date=today),
+        )
+    ).filter(started__gte=F('max_daily_executions'))
+    queryset = queryset.exclude(category_id__in=exhausted.values('id'))
+    remaining = group_remaining_minutes(group)
+    if remaining is not None:
+        queryset = queryset.filter(duration__lte=remaining)
+    queryset = queryset.exclude(
+        Q(premium=True, premium_from__lte=today, premium_until__gte=today)
+        & Q(schedules__state__in=[Schedule.STATE_PREPARING, Schedule.STATE_RUNNING])
+    )
+    return set(queryset.distinct().values_list('id', flat=True))
+
+
+class EligibleActivitiesEquivalenceTests(TestCase):
+    def build_fixture(self, rng):
+        today = timezone.localdate()
+        now = timezone.now()
+        groups = [
+            Group.objects.create(
+                name=f'Grupo {index}',
+                max_daily_minutes=rng.choice([0, 0, 30, 90, 240]),
+            )
+            for index in range(3)
+        ]
+        categories = [
+            Category.objects.create(
+                name=f'Categoria {index}',
+                group=rng.choice(groups),
+                max_daily_executions=rng.randint(0, 4),
+            )
+            for index in range(6)
+        ]
+        activities = []
+        for index in range(40):
+            premium = rng.random() < 0.3
+            start = today + timedelta(days=rng.randint(-3, 1))
+            activities.append(Activity.objects.create(
+                name=f'Atividade {index}',
+                category=rng.choice(categories),
+                duration=rng.choice([10, 25, 45, 60, 120]),
+                active=rng.random() < 0.85,
+                premium=premium,
+                premium_from=start if premium else None,
+                premium_until=start + timedelta(days=rng.randint(0, 3)) if premium else None,
+            ))
+        for index in range(rng.randint(5, 30)):
+            activity = rng.choice(activities)
+            day_offset = rng.choice([0, 0, 0, -1])
+            started_at = now + timedelta(days=day_offset)
+            open_execution = rng.random() < 0.15
+            schedule = Schedule.objects.create(
+                activity=activity,
+                scheduled_date=timezone.localdate(started_at),
+                start_time=timezone.localtime(started_at).time().replace(tzinfo=None),
+                scope_key=f'scope-{index}' if open_execution else '',
+                state=Schedule.STATE_RUNNING if open_execution else Schedule.STATE_COMPLETED,
+                completed=not open_execution,
+            )
+            History.objects.bulk_create([History(
+                activity=activity,
+                schedule=schedule,
+                start_time=started_at,
+                end_time=None if open_execution else started_at,
+                duration=None if open_execution else activity.duration,
+            )])
+        return groups
+
+    def test_matches_reference_on_randomized_fixtures(self):
+        for seed in range(12):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                groups = self.build_fixture(rng)
+                for group in [None, *groups]:
+                    for include_done_today in (False, True):
+                        expected = reference_eligible_ids(
+                            selected_group=group,
+                            include_done_today=include_done_today,
+                        )
+                        actual = set(eligible_activities(
+                            selected_group=group,
+                            include_done_today=include_done_today,
+                        ).values_list('id', flat=True))
+                        self.assertEqual(actual, expected)
+                    if group is not None:
+                        rows = eligible_activity_rows(selected_group=group)
+                        self.assertEqual(
+                            {row.id for row in rows},
+                            reference_eligible_ids(selected_group=group),
+                        )
+                History.objects.all().delete()
+                Schedule.objects.all().delete()
+                Activity.objects.all().delete()
+                Category.objects.exclude(pk=1).delete()
+                Group.objects.filter(name__startswith='Grupo ').delete()
+
+    def test_rows_expose_duration_and_premium_state(self):
+        today = timezone.localdate()
+        group = Group.objects.create(name='Linhas')
+        category = Category.objects.create(name='Linhas', group=group)
+        premium = Activity.objects.create(
+            name='Premium',
+            category=category,
+            duration=15,
+            premium=True,
+            premium_from=today,
+            premium_until=today,
+        )
+        plain = Activity.objects.create(name='Comum', category=category, duration=30)
+
+        # Expiração de premiums, categorias esgotadas e a consulta principal;
+        # sem limite diário o grupo não consulta minutos restantes.
+        with self.assertNumQueries(3):
+            rows = eligible_activity_rows(selected_group=group)
+
+        self.assertEqual(
+            {(row.id, row.duration, row.is_premium_active) for row in rows},
+            {(premium.id, 15, True), (plain.id, 30, False)},
+        )
+
+    def test_category_without_daily_executions_is_never_eligible(self):
+        group = Group.objects.create(name='Bloqueado')
+        category = Category.objects.create(name='Sem limite', group=group, max_daily_executions=0)
+        Activity.objects.create(name='Bloqueada', category=category, duration=15)
+
+        self.assertFalse(eligible_activities(selected_group=group).exists())
+        self.assertEqual(eligible_activity_rows(selected_group=group), [])
@@ -0,0 +1,103 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_api_key.models import APIKey
+
+from apps.pomodoro.models import Activity, Category, Group, Schedule
+from apps.pomodoro.services import metrics
+
+
+@override_settings(EXECUTION_RESPONSE_CACHE_SECONDS=30)
+class ExecutionResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _, cls.api_key = APIKey.objects.create_key(name='execution-cache')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        metrics.reset()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Api-Key {self.api_key}')
+        self.group = Group.objects.create(name='Estudos', max_daily_minutes=300)
+        self.category = Category.objects.create(
+            name='Leitura',
+            group=self.group,
+            max_daily_executions=10,
+        )
+        Activity.objects.create(name='Primeira', category=self.category, duration=30)
+        item = self.client.get(f'/api/activities/next/?group_id={self.group.id}').data
+        started = self.client.post(
+            f"/api/activities/{item['id']}/start/",
+            {'queue_item_id': item['queue_item_id']},
+            format='json',
+        )
+        self.schedule_id = started.data['schedule_id']
+
+    def test_repeated_polls_are_served_from_cache(self):
+        first = self.client.get('/api/activities/active/')
+
+        with CaptureQueriesContext(connection) as captured:
+            second = self.client.get('/api/activities/active/')
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(
+            second.data['group_remaining_daily_minutes'],
+            first.data['group_remaining_daily_minutes'],
+        )
+        self.assertFalse([query for query in captured if '"pomodoro_activity"' in query['sql']])
+        self.assertEqual(metrics.get_count('execution_cache', result='hit'), 1)
+
+    def test_server_time_fields_are_recomputed_on_hits(self):
+        first = self.client.get(f'/api/activities/status/{self.schedule_id}/')
+        later = timezone.now() + timedelta(minutes=10)
+
+        with patch('apps.pomodoro.services.execution_cache.timezone.now', return_value=later):
+            second = self.client.get(f'/api/activities/status/{self.schedule_id}/')
+
+        self.assertEqual(metrics.get_count('execution_cache', result='hit'), 1)
+        self.assertEqual(second.data['server_now'], later)
+        self.assertAlmostEqual(
+            second.data['remaining_seconds'],
+            first.data['remaining_seconds'] - 600,
+            delta=2,
+        )
+        self.assertEqual(second.data['schedule_id'], self.schedule_id)
+
+    def test_completion_bumps_version_and_misses_the_cache(self):
+        self.client.get(f'/api/activity-executions/{self.schedule_id}/')
+
+        self.client.post('/api/activities/complete/', {'schedule_id': self.schedule_id}, format='json')
+        response = self.client.get(f'/api/activity-executions/{self.schedule_id}/')
+
+        self.assertEqual(response.data['state'], Schedule.STATE_COMPLETED)
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(metrics.get_count('execution_cache', result='hit'), 0)
+        self.assertEqual(self.client.get('/api/activities/active/').status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_overdue_execution_bypasses_the_cache(self):
+        self.client.get('/api/activities/active/')
+        Schedule.objects.filter(pk=self.schedule_id).update(
+            expected_end_at=timezone.now() - timedelta(minutes=1),
+        )
+
+        response = self.client.get('/api/activities/active/')
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Schedule.objects.get(pk=self.schedule_id).state, Schedule.STATE_COMPLETED)
+
+    def test_other_scopes_never_see_cached_responses(self):
+        self.client.get(f'/api/activity-executions/{self.schedule_id}/')
+        _, other_key = APIKey.objects.create_key(name='outro-escopo')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Api-Key {other_key}')
+
+        response = self.client.get(f'/api/activity-executions/{self.schedule_id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
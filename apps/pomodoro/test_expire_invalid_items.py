@@ -0,0 +1,92 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.pomodoro.models import (
+    Activity,
+    ActivityQueue,
+    ActivityQueueItem,
+    Category,
+    Group,
+    Schedule,
+)
+from apps.pomodoro.services.activity_queue import _expire_invalid_items
+
+
+class ExpireInvalidItemsTests(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name='Transicoes')
+        self.category = Category.objects.create(
+            name='Transicoes',
+            group=self.group,
+            max_daily_executions=50,
+        )
+
+    def build_queue(self, size):
+        queue = ActivityQueue.objects.create(
+            group=self.group,
+            scope_key=f'scope-{size}',
+            pool_size=size,
+        )
+        items = []
+        for position in range(1, size + 1):
+            activity = Activity.objects.create(
+                name=f'Item {size}-{position}',
+                category=self.category,
+                active=position % 3 != 0,
+            )
+            items.append(ActivityQueueItem.objects.create(
+                queue=queue,
+                activity=activity,
+                position=position,
+                state=ActivityQueueItem.STATE_PRESENTED if position == 1 else ActivityQueueItem.STATE_PENDING,
+            ))
+        now = timezone.now()
+        for item, state in zip(items[:2], [Schedule.STATE_RUNNING, Schedule.STATE_COMPLETED]):
+            Schedule.objects.create(
+                activity=item.activity,
+                queue_item=item,
+                scope_key=f'{queue.scope_key}-{item.position}',
+                scheduled_date=timezone.localdate(),
+                start_time=timezone.localtime(now).time().replace(tzinfo=None),
+                state=state,
+                starts_at=now,
+                completed_at=now if state == Schedule.STATE_COMPLETED else None,
+            )
+        return queue
+
+    def writes(self, queue):
+        with CaptureQueriesContext(connection) as captured:
+            _expire_invalid_items(queue)
+        return [query['sql'] for query in captured if query['sql'].startswith('UPDATE')]
+
+    def test_write_statements_do_not_grow_with_queue_size(self):
+        small = self.writes(self.build_queue(6))
+        large = self.writes(self.build_queue(30))
+
+        self.assertEqual(len(small), len(large))
+        self.assertLessEqual(len(large), 4)
+
+    def test_transitions_and_counters_are_applied(self):
+        queue = self.build_queue(6)
+
+        _expire_invalid_items(queue)
+
+        states = dict(queue.items.values_list('position', 'state'))
+        self.assertEqual(states[1], ActivityQueueItem.STATE_STARTED)
+        self.assertEqual(states[2], ActivityQueueItem.STATE_COMPLETED)
+        self.assertEqual(states[3], ActivityQueueItem.STATE_EXPIRED)
+        self.assertEqual(states[4], ActivityQueueItem.STATE_PENDING)
+        self.assertIsNotNone(queue.items.get(position=1).started_at)
+        queue.refresh_from_db()
+        self.assertEqual(
+            (queue.pool_size, queue.consumed_count, queue.expired_count, queue.version),
+            (6, 1, 2, 2),
+        )
+
+    def test_synced_queue_is_not_rewritten(self):
+        queue = self.build_queue(6)
+        _expire_invalid_items(queue)
+
+        self.assertEqual(self.writes(queue), [])
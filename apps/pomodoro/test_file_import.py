@@ -0,0 +1,112 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from apps.pomodoro.models import Activity, ActivityQueueItem, Category, Group
+from apps.pomodoro.services.activity_queue import present_next_item
+from apps.pomodoro.services.external_import import ImportResult
+from apps.pomodoro.services.file_import import FileImportError, import_activities_file
+
+
+class FileImportTests(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name='Leituras')
+        self.category = Category.objects.create(name='Livros', group=self.group, max_daily_executions=10)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        return path
+
+    def run_import(self, path, **kwargs):
+        return import_activities_file(
+            path,
+            source_name='livros',
+            category_id=self.category.id,
+            default_duration=30,
+            batch_size=2,
+            **kwargs,
+        )
+
+    def test_csv_rows_become_activities_in_batches(self):
+        path = self.write(
+            'livros.csv',
+            'external_id,name,description\n'
+            'b1,Dom Casmurro,"Machado, 1899"\n'
+            'b2,"Grande Sertão: Veredas",\n'
+            'b3,,sem nome\n'
+            'b1,Duplicado,\n',
+        )
+
+        result = self.run_import(path)
+
+        self.assertEqual(result, ImportResult(4, 2, 0, 1, 1))
+        first = Activity.objects.get(external_source='livros', external_id='b1')
+        self.assertEqual((first.name, first.description, first.duration), ('Dom Casmurro', 'Machado, 1899', 30))
+        self.assertEqual(
+            Activity.objects.get(external_id='b2').description,
+            'Atividade importada de livros. ID externo: b2.',
+        )
+
+    def test_json_import_updates_and_reconciles_queues(self):
+        Activity.objects.create(name='Existente', category=self.category)
+        queue = present_next_item(scope_key='livros', selected_group=self.group).item.queue
+        path = self.write('livros.json', json.dumps({'items': [{'external_id': 7, 'name': 'Ensaio'}]}))
+
+        created = self.run_import(path)
+        path.write_text(json.dumps([{'external_id': '7', 'name': 'Ensaio sobre a cegueira'}]))
+        updated = self.run_import(path, only_changed=True)
+
+        self.assertEqual((created.created, updated.updated), (1, 1))
+        activity = Activity.objects.get(external_source='livros', external_id='7')
+        self.assertEqual(activity.name, 'Ensaio sobre a cegueira')
+        self.assertTrue(ActivityQueueItem.objects.filter(queue=queue, activity=activity).exists())
+
+    def test_sources_do_not_share_identity(self):
+        Activity.objects.create(name='Jogo', category=self.category, external_source='steam', external_id='7')
+        path = self.write('livros.json', '[{"external_id": "7", "name": "Livro 7"}]')
+
+        result = self.run_import(path)
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Activity.objects.get(external_source='steam').name, 'Jogo')
+
+    def test_invalid_files_and_sources_are_rejected(self):
+        cases = {
+            ('livros.csv', 'id,titulo\n1,x\n', 'livros'): 'colunas external_id e name',
+            ('livros.json', '{"items": 3}', 'livros'): 'lista de itens',
+            ('livros.json', '{', 'livros'): 'JSON válido',
+            ('livros.txt', '', 'livros'): 'CSV ou JSON',
+            ('livros.csv', 'external_id,name\n', 'steam'): 'importador próprio',
+            ('livros.csv', 'external_id,name\n', 'Com Espaço'): 'A origem deve ter',
+        }
+        for (name, content, source_name), message in cases.items():
+            path = self.write(name, content)
+            with self.subTest(name=name, source=source_name), self.assertRaisesMessage(FileImportError, message):
+                import_activities_file(
+                    path,
+                    source_name=source_name,
+                    category_id=self.category.id,
+                    default_duration=30,
+                )
+
+    def test_command_reports_result_and_errors(self):
+        path = self.write('livros.csv', 'external_id,name\nb1,Livro\n')
+        out = StringIO()
+
+        call_command(
+            'import_activities_file', str(path), '--source', 'livros',
+            '--category', str(self.category.id), stdout=out,
+        )
+
+        self.assertEqual(json.loads(out.getvalue())['created'], 1)
+        with self.assertRaisesMessage(CommandError, 'categoria de ID 999'):
+            call_command('import_activities_file', str(path), '--source', 'livros', '--category', '999')
@@ -0,0 +1,130 @@
+import socket
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.pomodoro.fake_steam_server import FakeSteamServer
+from apps.pomodoro.services import metrics
+from apps.pomodoro.services.http_client import (
+    CircuitBreaker,
+    HttpCircuitOpenError,
+    HttpClient,
+    HttpStatusError,
+    HttpTimeoutError,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class HttpClientTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.server = FakeSteamServer(b'{"ok": true}', chunk_size=4)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.sleeps = []
+        self.clock = FakeClock()
+        self.client = HttpClient('fake', sleep=self.sleeps.append, clock=self.clock)
+        self.addCleanup(self.client.close)
+
+    def get(self, timeout=2):
+        with self.client.stream(self.server.url, timeout=timeout) as response:
+            return response.read()
+
+    def test_connections_are_kept_alive_between_calls(self):
+        self.assertEqual(self.get(), b'{"ok": true}')
+        self.assertEqual(self.get(), b'{"ok": true}')
+
+        ports = {request['client_port'] for request in self.server.requests}
+        self.assertEqual(len(ports), 1)
+        self.assertEqual(metrics.get_count('http_client_requests', service='fake', outcome='ok'), 2)
+        self.assertEqual(metrics.get_count('http_client_latency_count', service='fake'), 2)
+        self.assertEqual(metrics.get_count('http_client_latency_bucket', service='fake', le='+Inf'), 2)
+
+    def test_partially_read_response_does_not_return_to_pool(self):
+        with self.client.stream(self.server.url, timeout=2) as response:
+            response.read(2)
+        self.get()
+
+        ports = {request['client_port'] for request in self.server.requests}
+        self.assertEqual(len(ports), 2)
+
+    def test_server_errors_are_retried_with_jitter(self):
+        self.server.responses.extend([503, 502])
+
+        self.assertEqual(self.get(), b'{"ok": true}')
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(all(0 <= delay <= 0.005 for delay in self.sleeps))
+        self.assertEqual(metrics.get_count('http_client_requests', service='fake', outcome='503'), 1)
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.STATE_CLOSED)
+
+    @override_settings(OUTBOUND_HTTP_CLIENTS={'fake': {'max_delay_ms': 3000}})
+    def test_retry_after_is_honoured_up_to_the_ceiling(self):
+        self.server.responses.extend([(429, {'Retry-After': '2'}), (429, {'Retry-After': '60'})])
+
+        self.get()
+
+        self.assertGreaterEqual(self.sleeps[0], 2)
+        self.assertEqual(self.sleeps[1], 3)
+
+    def test_client_errors_are_raised_without_retry(self):
+        self.server.responses.append(404)
+
+        with self.assertRaises(HttpStatusError) as raised:
+            self.get()
+
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_timeouts_are_retried_then_raised(self):
+        self.server.delay = 0.2
+
+        with self.assertRaises(HttpTimeoutError):
+            self.get(timeout=0.05)
+
+        self.assertEqual(metrics.get_count('http_client_requests', service='fake', outcome='timeout'), 3)
+
+    def test_dropped_keep_alive_connection_is_replaced_transparently(self):
+        self.get()
+        pooled = next(iter(self.client._pools.values()))._idle[0][0]
+        pooled.sock.shutdown(socket.SHUT_RDWR)
+
+        self.assertEqual(self.get(), b'{"ok": true}')
+
+        self.assertEqual(self.sleeps, [])
+        self.assertEqual(metrics.get_count('http_client_requests', service='fake', outcome='ok'), 2)
+
+    @override_settings(OUTBOUND_HTTP_CLIENTS={'fake': {'attempts': 1, 'failure_threshold': 2}})
+    def test_circuit_opens_after_repeated_failures_and_recovers(self):
+        self.server.responses.extend([503, 503])
+        for _attempt in range(2):
+            with self.assertRaises(HttpStatusError):
+                self.get()
+
+        with self.assertRaises(HttpCircuitOpenError):
+            self.get()
+        self.assertEqual(len(self.server.requests), 2)
+
+        self.clock.now += 31
+        self.server.responses.append(500)
+        with self.assertRaises(HttpStatusError):
+            self.get()
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.STATE_OPEN)
+        with self.assertRaises(HttpCircuitOpenError):
+            self.get()
+
+        self.clock.now += 31
+        self.assertEqual(self.get(), b'{"ok": true}')
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.STATE_CLOSED)
+        self.assertEqual(metrics.get_count('http_circuit', service='fake', state='open'), 2)
+        self.assertEqual(
+            metrics.get_count('http_client_requests', service='fake', outcome='circuit_open'),
+            2,
+        )
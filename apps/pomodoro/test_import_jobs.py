@@ -0,0 +1,123 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.pomodoro.models import Category, Group, ImportJob
+from apps.pomodoro.services import metrics
+from apps.pomodoro.services.import_jobs import run_import_job, start_steam_import
+from apps.pomodoro.services.steam_import import SteamImportResult
+
+
+@override_settings(STEAM_API_KEY='test-steam-key', STEAM_IMPORT_BATCH_SIZE=2)
+class ImportJobTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        group = Group.objects.create(name='Jogos')
+        self.category = Category.objects.create(name='Steam', group=group, max_daily_executions=10)
+
+    def start(self):
+        with override_settings(STEAM_ACTIVITY_CATEGORY_ID=self.category.id):
+            with self.captureOnCommitCallbacks(execute=True):
+                return start_steam_import()
+
+    @patch('apps.pomodoro.services.steam_import.stream_owned_games')
+    def test_counters_are_persisted_after_each_batch(self, fetch):
+        snapshots = []
+
+        def games():
+            for appid in range(1, 6):
+                job = ImportJob.objects.get()
+                snapshots.append((job.state, job.total, job.created))
+                yield {'appid': appid, 'name': f'Jogo {appid}'}
+
+        fetch.return_value = games()
+
+        job, created = self.start()
+
+        job.refresh_from_db()
+        self.assertTrue(created)
+        self.assertEqual(
+            snapshots,
+            [('running', 0, 0), ('running', 0, 0), ('running', 2, 2), ('running', 2, 2), ('running', 4, 4)],
+        )
+        self.assertEqual((job.state, job.total, job.created, job.errors), ('succeeded', 5, 5, 0))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(metrics.get_count('import_job', source='steam', result='succeeded'), 1)
+
+    def test_open_job_is_reused_instead_of_queuing_another(self):
+        running = ImportJob.objects.create(state=ImportJob.STATE_RUNNING)
+
+        with patch('apps.pomodoro.services.import_jobs.run_import_job') as run:
+            job, created = self.start()
+
+        self.assertFalse(created)
+        self.assertEqual(job, running)
+        run.assert_not_called()
+
+    @override_settings(IMPORT_JOB_STALE_SECONDS=60)
+    @patch('apps.pomodoro.services.import_jobs.import_steam_games')
+    def test_stale_job_is_failed_and_replaced(self, import_games):
+        import_games.return_value = SteamImportResult(0, 0, 0, 0, 0)
+        stale = ImportJob.objects.create(state=ImportJob.STATE_RUNNING)
+        ImportJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+
+        job, created = self.start()
+
+        stale.refresh_from_db()
+        self.assertTrue(created)
+        self.assertNotEqual(job, stale)
+        self.assertEqual(stale.state, ImportJob.STATE_FAILED)
+        self.assertEqual(stale.error_message, 'A importação foi interrompida antes de terminar.')
+        import_games.assert_called_once()
+
+    @patch('apps.pomodoro.services.import_jobs.import_steam_games', side_effect=RuntimeError('db down'))
+    def test_unexpected_failure_keeps_a_generic_message(self, _import_games):
+        with self.assertLogs('apps.pomodoro.services.import_jobs', level='ERROR'):
+            job, _created = self.start()
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, ImportJob.STATE_FAILED)
+        self.assertEqual(job.error_message, 'Não foi possível concluir a importação da Steam.')
+
+    @patch('apps.pomodoro.services.import_jobs.import_steam_games')
+    def test_job_already_claimed_is_not_run_twice(self, import_games):
+        job = ImportJob.objects.create(state=ImportJob.STATE_RUNNING)
+
+        run_import_job(job.id)
+
+        import_games.assert_not_called()
+
+
+class ImportJobStatusViewTests(TestCase):
+    def setUp(self):
+        self.job = ImportJob.objects.create(state=ImportJob.STATE_RUNNING, total=40, created=12)
+        self.url = reverse('admin:pomodoro_activity_import_steam_status', args=[self.job.id])
+
+    def test_status_reports_progress_to_admin(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser(username='admin', password='test-password')
+        )
+
+        response = self.client.get(self.url)
+        changelist = self.client.get(reverse('admin:pomodoro_activity_changelist'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.json()[key] for key in ('state', 'finished', 'total', 'created')},
+            {'state': 'running', 'finished': False, 'total': 40, 'created': 12},
+        )
+        self.assertContains(changelist, f'data-status-url="{self.url}"')
+        self.assertContains(changelist, 'data-finished="false"')
+
+    def test_status_requires_import_permissions(self):
+        self.client.force_login(
+            get_user_model().objects.create_user(username='staff', password='test-password', is_staff=True)
+        )
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.pomodoro.models import (
+    Activity,
+    ActivityQueue,
+    ActivityQueueItem,
+    ActivityQueueOrder,
+    Category,
+    Group,
+)
+from apps.pomodoro.services.activity_queue import present_next_item, skip_item
+from apps.pomodoro.services.activity_queue_reconciliation import reconcile_activity
+from apps.pomodoro.services.lazy_queue import pack_activity_ids, unpack_activity_ids
+from apps.pomodoro.services.queue_counters import verify_queue_counters
+
+
+SCOPE_KEY = 'lazy'
+
+
+@override_settings(QUEUE_LAZY_MIN_POOL=5, QUEUE_MATERIALIZE_WINDOW=3, QUEUE_PREFETCH_THRESHOLD=None)
+class LazyQueueTests(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name='Catalogo grande')
+        self.category = Category.objects.create(
+            name='Catalogo grande',
+            group=self.group,
+            max_daily_executions=50,
+        )
+        self.activities = [
+            Activity.objects.create(name=f'Grande {index}', category=self.category, duration=10)
+            for index in range(12)
+        ]
+
+    def present(self):
+        return present_next_item(scope_key=SCOPE_KEY, selected_group=self.group)
+
+    def test_only_first_window_is_inserted(self):
+        queue = self.present().item.queue
+
+        order = ActivityQueueOrder.objects.get(queue=queue)
+        self.assertEqual(queue.items.count(), 3)
+        self.assertEqual(order.remaining_count, 9)
+        self.assertEqual(queue.pool_size, 12)
+        self.assertFalse(
+            set(unpack_activity_ids(order.activity_ids))
+            & set(queue.items.values_list('activity_id', flat=True))
+        )
+        self.assertEqual(verify_queue_counters().drifted, {})
+
+    def test_windows_materialize_until_pool_is_exhausted(self):
+        item = self.present().item
+        queue = item.queue
+        presented = []
+        while item.queue_id == queue.id:
+            presented.append(item.activity_id)
+            skip_item(queue_item_id=item.id, scope_key=SCOPE_KEY)
+            item = self.present().item
+
+        queue.refresh_from_db()
+        self.assertEqual(sorted(presented), sorted(activity.id for activity in self.activities))
+        self.assertEqual(queue.state, ActivityQueue.STATE_CLOSED)
+        self.assertEqual(queue.items.count(), 12)
+        self.assertEqual(ActivityQueueOrder.objects.get(queue=queue).remaining_count, 0)
+        self.assertEqual(item.queue.mode, ActivityQueue.MODE_SKIPPED_REVIEW)
+
+    def test_new_activity_joins_the_compact_remainder(self):
+        queue = self.present().item.queue
+        activity = Activity.objects.create(name='Nova', category=self.category, duration=10)
+
+        reconcile_activity(activity)
+
+        queue.refresh_from_db()
+        order = ActivityQueueOrder.objects.get(queue=queue)
+        self.assertFalse(queue.items.filter(activity=activity).exists())
+        self.assertIn(activity.id, unpack_activity_ids(order.activity_ids))
+        self.assertEqual((queue.pool_size, order.remaining_count), (13, 10))
+
+    def test_premium_in_remainder_is_pulled_to_the_front(self):
+        queue = self.present().item.queue
+        order = ActivityQueueOrder.objects.get(queue=queue)
+        deferred_id = unpack_activity_ids(order.activity_ids)[-1]
+        today = timezone.localdate()
+        Activity.objects.filter(pk=deferred_id).update(
+            premium=True,
+            premium_from=today - timedelta(days=1),
+            premium_until=today + timedelta(days=1),
+            updated_at=timezone.now(),
+        )
+        presented = queue.items.get(state=ActivityQueueItem.STATE_PRESENTED)
+        skip_item(queue_item_id=presented.id, scope_key=SCOPE_KEY)
+
+        result = self.present()
+
+        order.refresh_from_db()
+        queue.refresh_from_db()
+        self.assertEqual(result.item.activity_id, deferred_id)
+        self.assertNotIn(deferred_id, unpack_activity_ids(order.activity_ids))
+        self.assertEqual(queue.pool_size, 12)
+        self.assertEqual(verify_queue_counters().drifted, {})
+
+    @override_settings(QUEUE_LAZY_MIN_POOL=None)
+    def test_small_pools_or_disabled_setting_insert_everything(self):
+        queue = self.present().item.queue
+
+        self.assertEqual(queue.items.count(), 12)
+        self.assertFalse(ActivityQueueOrder.objects.exists())
+
+
+class PackedIdsTests(TestCase):
+    def test_round_trip_preserves_order(self):
+        ids = [9, 1, 2**40, 7]
+
+        self.assertEqual(unpack_activity_ids(pack_activity_ids(ids)).tolist(), ids)
+        self.assertEqual(len(pack_activity_ids(ids)), 32)
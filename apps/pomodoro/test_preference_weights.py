@@ -0,0 +1,110 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_api_key.models import APIKey
+
+from apps.pomodoro.models import (
+    Activity,
+    ActivityPreferenceEvent,
+    ActivityPreferenceWeight,
+    Category,
+    Group,
+    Schedule,
+)
+from apps.pomodoro.services.activity_execution import complete_schedule
+from apps.pomodoro.services.preference_weights import favorite_weights
+
+
+class PreferenceWeightTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _, cls.api_key = APIKey.objects.create_key(name='preference-weights')
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Api-Key {self.api_key}')
+        self.group = Group.objects.create(name='Jogos', max_daily_minutes=300)
+        category = Category.objects.create(
+            name='RPG',
+            group=self.group,
+            max_daily_executions=10,
+        )
+        for index in range(3):
+            Activity.objects.create(name=f'Jogo {index}', category=category, duration=30)
+
+    def next(self):
+        return self.client.get(f'/api/activities/next/?group_id={self.group.id}').data
+
+    def skip(self, item):
+        return self.client.post(f"/api/activity-queue/items/{item['queue_item_id']}/skip/")
+
+    def complete(self, item):
+        self.client.post(
+            f"/api/activities/{item['id']}/start/",
+            {'queue_item_id': item['queue_item_id']},
+            format='json',
+        )
+        complete_schedule(Schedule.objects.get(queue_item_id=item['queue_item_id']))
+
+    def weight(self, activity_id):
+        return ActivityPreferenceWeight.objects.get(activity_id=activity_id)
+
+    def test_skip_and_completion_update_aggregate_once(self):
+        skipped = self.next()
+        self.skip(skipped)
+        self.skip(skipped)
+        completed = self.next()
+        self.complete(completed)
+
+        skip_weight = self.weight(skipped['id'])
+        favorite = self.weight(completed['id'])
+        self.assertEqual((skip_weight.skip_score, skip_weight.event_count), (1, 1))
+        self.assertEqual((favorite.favorite_score, favorite.event_count), (1, 1))
+        scope_key = favorite.scope_key
+        self.assertEqual(favorite_weights(scope_key, self.group), {completed['id']: 4})
+
+    @override_settings(PREFERENCE_WEIGHT_HALF_LIFE_DAYS=10)
+    def test_favorites_decay_with_half_life(self):
+        completed = self.next()
+        self.complete(completed)
+        weight = self.weight(completed['id'])
+
+        weight.decayed_at = timezone.now() - timedelta(days=9)
+        weight.save(update_fields=['decayed_at'])
+        self.assertIn(completed['id'], favorite_weights(weight.scope_key, self.group))
+
+        weight.decayed_at = timezone.now() - timedelta(days=11)
+        weight.save(update_fields=['decayed_at'])
+        self.assertEqual(favorite_weights(weight.scope_key, self.group), {})
+
+    def test_backfill_rebuilds_weights_from_events(self):
+        skipped = self.next()
+        self.skip(skipped)
+        completed = self.next()
+        self.complete(completed)
+        expected = sorted(ActivityPreferenceWeight.objects.values_list(
+            'scope_key', 'group_id', 'activity_id', 'favorite_score', 'skip_score', 'event_count',
+        ))
+        ActivityPreferenceWeight.objects.all().delete()
+
+        dry_run = StringIO()
+        call_command('backfill_preference_weights', '--dry-run', stdout=dry_run)
+        self.assertFalse(ActivityPreferenceWeight.objects.exists())
+
+        stdout = StringIO()
+        call_command('backfill_preference_weights', '--batch-size=1', stdout=stdout)
+
+        self.assertEqual(
+            json.loads(stdout.getvalue()),
+            {'dry_run': False, 'events': ActivityPreferenceEvent.objects.count(), 'weights': 2},
+        )
+        self.assertEqual(
+            sorted(ActivityPreferenceWeight.objects.values_list(
+                'scope_key', 'group_id', 'activity_id', 'favorite_score', 'skip_score', 'event_count',
+            )),
+            expected,
+        )
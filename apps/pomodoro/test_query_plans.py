@@ -0,0 +1,125 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection, transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.pomodoro.models import (
+    Activity,
+    ActivityQueue,
+    ActivityQueueItem,
+    Category,
+    Group,
+    Schedule,
+)
+from apps.pomodoro.services.activity_execution import (
+    open_schedules_for_scope,
+    overdue_schedules_for_scope,
+)
+from apps.pomodoro.services.activity_queue import open_schedules_for_activity, pending_items
+
+
+def service_queries(*, scope_key, activity_id, queue_id):
+    """Querysets montados pelos próprios serviços e o índice parcial que devem usar."""
+    return {
+        'open_schedule_for_scope': (
+            open_schedules_for_scope(scope_key).select_for_update()[:1],
+            'schedule_open_scope_idx',
+        ),
+        'overdue_schedules_for_scope': (
+            overdue_schedules_for_scope(scope_key, timezone.now()),
+            'schedule_open_scope_idx',
+        ),
+        'open_schedules_for_activity': (
+            open_schedules_for_activity(activity_id),
+            'schedule_open_activity_idx',
+        ),
+        'first_pending_item': (
+            pending_items(queue_id)[:1],
+            'queue_item_pending_pos_idx',
+        ),
+    }
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Planos de execucao exigem PostgreSQL.')
+class HotQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        group = Group.objects.create(name='Planos')
+        category = Category.objects.create(name='Planos', group=group)
+        cls.activities = Activity.objects.bulk_create([
+            Activity(name=f'Plano {index}', category=category) for index in range(50)
+        ])
+        cls.queue = ActivityQueue.objects.create(group=group, scope_key='plan-scope')
+        ActivityQueueItem.objects.bulk_create([
+            ActivityQueueItem(
+                queue=cls.queue,
+                activity=activity,
+                position=position,
+                state=(
+                    ActivityQueueItem.STATE_PENDING
+                    if position > 40
+                    else ActivityQueueItem.STATE_COMPLETED
+                ),
+            )
+            for position, activity in enumerate(cls.activities, start=1)
+        ])
+        # Filas encerradas engordam os índices completos; os parciais seguem
+        # só com os itens pendentes e o planejador tem de preferi-los.
+        closed_queues = ActivityQueue.objects.bulk_create([
+            ActivityQueue(
+                group=group,
+                scope_key=f'closed-{index}',
+                state=ActivityQueue.STATE_CLOSED,
+            )
+            for index in range(40)
+        ])
+        ActivityQueueItem.objects.bulk_create([
+            ActivityQueueItem(
+                queue=queue,
+                activity=activity,
+                position=position,
+                state=ActivityQueueItem.STATE_COMPLETED,
+            )
+            for queue in closed_queues
+            for position, activity in enumerate(cls.activities, start=1)
+        ])
+        now = timezone.now()
+        Schedule.objects.bulk_create([
+            Schedule(
+                activity=cls.activities[index % 50],
+                scheduled_date=timezone.localdate(),
+                start_time=timezone.localtime(now).time().replace(tzinfo=None),
+                scope_key=f'scope-{index}',
+                state=Schedule.STATE_RUNNING if index == 0 else Schedule.STATE_COMPLETED,
+                expected_end_at=now - timedelta(minutes=index),
+            )
+            for index in range(2000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE pomodoro_schedule')
+            cursor.execute('ANALYZE pomodoro_activityqueueitem')
+
+    def plan(self, queryset):
+        # Tabelas de teste são pequenas: sem desligar seqscan o planejador
+        # prefere varrê-las. Com seqscan desligado qualquer índice serviria,
+        # por isso o teste confere o nome do índice esperado.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def test_service_queries_use_their_partial_indexes(self):
+        queries = service_queries(
+            scope_key='scope-0',
+            activity_id=self.activities[0].id,
+            queue_id=self.queue.id,
+        )
+        for name, (queryset, index) in queries.items():
+            with self.subTest(query=name):
+                plan = self.plan(queryset)
+                self.assertRegex(
+                    plan,
+                    rf'(Index Scan|Index Only Scan) using {index}\b|Bitmap Index Scan on {index}\b',
+                )
+                self.assertNotIn('Seq Scan', plan)
@@ -0,0 +1,227 @@
+"""Snapshots das consultas SQL executadas pelos pontos de entrada dos serviços.
+
+Cada cenário registra as impressões digitais normalizadas das consultas e
+quantas vezes cada uma rodou. O teste falha quando surge uma consulta nova ou
+quando alguma passa a rodar mais vezes. Depois de uma mudança intencional,
+regrave os snapshots com::
+
+    UPDATE_QUERY_SNAPSHOTS=1 poetry run python manage.py test apps.pomodoro.test_query_snapshots
+"""
+import hashlib
+import json
+import os
+import random
+import re
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.pomodoro.models import Activity, ActivityQueue, Category, Group, Schedule
+from apps.pomodoro.services.activity_execution import (
+    complete_schedule,
+    get_active_schedule,
+    start_activity,
+)
+from apps.pomodoro.services.activity_queue import present_next_item, skip_item
+from apps.pomodoro.services.activity_queue_reconciliation import reconcile_premium_queue
+
+
+SNAPSHOT_DIR = Path(__file__).resolve().parent / 'query_snapshots'
+SCOPE_KEY = 'snapshot-scope'
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SAVEPOINT = re.compile(r'(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT) "?[\w]+"?')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql: str) -> str:
+    sql = _SAVEPOINT.sub(r'\1 ?', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(?+)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql: str) -> str:
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:12]
+
+
+def query_profile(captured) -> dict[str, object]:
+    counts = Counter()
+    samples = {}
+    for query in captured:
+        key = fingerprint(query['sql'])
+        counts[key] += 1
+        samples.setdefault(key, normalize_sql(query['sql'])[:160])
+    return {
+        'count': sum(counts.values()),
+        'fingerprints': {
+            key: {'count': counts[key], 'sql': samples[key]} for key in sorted(counts)
+        },
+    }
+
+
+class ServiceQuerySnapshotTests(TestCase):
+    snapshot_path = SNAPSHOT_DIR / f'{connection.vendor}.json'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.snapshots = {}
+        if cls.snapshot_path.exists():
+            cls.snapshots = json.loads(cls.snapshot_path.read_text())
+        cls.recorded = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if os.environ.get('UPDATE_QUERY_SNAPSHOTS') and cls.recorded:
+            SNAPSHOT_DIR.mkdir(exist_ok=True)
+            merged = {**cls.snapshots, **cls.recorded}
+            cls.snapshot_path.write_text(
+                json.dumps(dict(sorted(merged.items())), indent=2, sort_keys=True) + '\n'
+            )
+        super().tearDownClass()
+
+    def setUp(self):
+        random.seed(35)
+        self.group = Group.objects.create(name='Snapshots', max_daily_minutes=600)
+        self.category = Category.objects.create(
+            name='Snapshots',
+            group=self.group,
+            max_daily_executions=10,
+        )
+        for index in range(5):
+            Activity.objects.create(
+                name=f'Snapshot {index}',
+                category=self.category,
+                duration=20,
+            )
+
+    def assertQueriesMatchSnapshot(self, name, func):
+        with CaptureQueriesContext(connection) as captured:
+            result = func()
+        profile = query_profile(captured.captured_queries)
+        self.recorded[name] = profile
+        if os.environ.get('UPDATE_QUERY_SNAPSHOTS'):
+            return result
+        expected = self.snapshots.get(name)
+        if expected is None:
+            self.skipTest(
+                f'Sem snapshot de {name} para {connection.vendor}; '
+                'rode com UPDATE_QUERY_SNAPSHOTS=1.'
+            )
+        new = sorted(set(profile['fingerprints']) - set(expected['fingerprints']))
+        grown = {
+            key: (expected['fingerprints'][key]['count'], data['count'])
+            for key, data in profile['fingerprints'].items()
+            if key in expected['fingerprints']
+            and data['count'] > expected['fingerprints'][key]['count']
+        }
+        self.assertFalse(
+            new or grown or profile['count'] > expected['count'],
+            f'{name}: {expected["count"]} -> {profile["count"]} consultas; '
+            f'novas: {[profile["fingerprints"][key]["sql"] for key in new]}; '
+            f'aumentaram: {grown}',
+        )
+        return result
+
+    def present(self):
+        return present_next_item(scope_key=SCOPE_KEY, selected_group=self.group)
+
+    def started_item(self):
+        item = self.present().item
+        start_activity(activity=item.activity, queue_item=item, scope_key=SCOPE_KEY)
+        return item
+
+    def test_present_next_item_cold(self):
+        result = self.assertQueriesMatchSnapshot('present_next_item_cold', self.present)
+        self.assertIsNotNone(result.item)
+
+    def test_present_next_item_warm(self):
+        self.present()
+        self.assertQueriesMatchSnapshot('present_next_item_warm', self.present)
+
+    def test_start_activity(self):
+        item = self.present().item
+        schedule, created = self.assertQueriesMatchSnapshot(
+            'start_activity',
+            lambda: start_activity(
+                activity=item.activity,
+                queue_item=item,
+                scope_key=SCOPE_KEY,
+            ),
+        )
+        self.assertTrue(created)
+
+    def test_complete_schedule(self):
+        item = self.started_item()
+        schedule = Schedule.objects.get(queue_item=item)
+        schedule = self.assertQueriesMatchSnapshot(
+            'complete_schedule',
+            lambda: complete_schedule(schedule),
+        )
+        self.assertEqual(schedule.state, Schedule.STATE_COMPLETED)
+
+    def test_get_active_schedule_idle(self):
+        schedule = self.started_item().schedule
+        complete_schedule(schedule)
+
+        result = self.assertQueriesMatchSnapshot(
+            'get_active_schedule_idle',
+            lambda: get_active_schedule(SCOPE_KEY),
+        )
+        self.assertIsNone(result)
+
+    def test_get_active_schedule_running(self):
+        item = self.started_item()
+
+        result = self.assertQueriesMatchSnapshot(
+            'get_active_schedule_running',
+            lambda: get_active_schedule(SCOPE_KEY),
+        )
+        self.assertEqual(result.queue_item_id, item.id)
+
+    def test_skip_item(self):
+        item = self.present().item
+        self.assertQueriesMatchSnapshot(
+            'skip_item',
+            lambda: skip_item(queue_item_id=item.id, scope_key=SCOPE_KEY),
+        )
+
+    def test_reconcile_premium_queue(self):
+        self.present()
+        queue = ActivityQueue.objects.get(scope_key=SCOPE_KEY, group=self.group)
+        today = timezone.localdate()
+        Activity.objects.create(
+            name='Snapshot premium',
+            category=self.category,
+            duration=20,
+            premium=True,
+            premium_from=today - timedelta(days=1),
+            premium_until=today + timedelta(days=1),
+        )
+
+        def reconcile():
+            with transaction.atomic():
+                return reconcile_premium_queue(queue, rng=random)
+
+        self.assertQueriesMatchSnapshot('reconcile_premium_queue', reconcile)
+
+
+class QueryNormalizationTests(TestCase):
+    def test_literals_and_in_lists_are_normalized(self):
+        first = 'SELECT * FROM t WHERE id IN (1, 2, 3) AND name = \'a\'\n  AND "x" = 10'
+        second = "SELECT * FROM t WHERE id IN (4) AND name = 'b' AND \"x\" = 7"
+
+        self.assertEqual(fingerprint(first), fingerprint(second))
+        self.assertEqual(
+            normalize_sql('SAVEPOINT "s1_x2"'),
+            normalize_sql('SAVEPOINT "s9_x4"'),
+        )
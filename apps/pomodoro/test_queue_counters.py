@@ -0,0 +1,118 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.pomodoro.models import Activity, ActivityQueue, ActivityQueueItem, Category, Group, Schedule
+from apps.pomodoro.services import metrics
+from apps.pomodoro.services.activity_execution import complete_schedule, start_activity
+from apps.pomodoro.services.activity_queue import present_next_item, skip_item
+from apps.pomodoro.services.queue_counters import COUNTER_FIELDS, counted_items
+
+
+SCOPE_KEY = 'counters'
+
+
+class QueueCounterTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.group = Group.objects.create(name='Contadores')
+        self.category = Category.objects.create(
+            name='Contadores',
+            group=self.group,
+            max_daily_executions=20,
+        )
+        self.activities = [
+            Activity.objects.create(name=f'Contador {index}', category=self.category, duration=10)
+            for index in range(4)
+        ]
+
+    def present(self):
+        return present_next_item(scope_key=SCOPE_KEY, selected_group=self.group)
+
+    def assertCountersMatchItems(self, queue):
+        queue.refresh_from_db()
+        stored = tuple(getattr(queue, name) for name in COUNTER_FIELDS)
+        self.assertEqual(stored, counted_items([queue.pk])[queue.pk])
+
+    def test_counters_follow_skip_complete_and_expire(self):
+        item = self.present().item
+        queue = item.queue
+        skip_item(queue_item_id=item.id, scope_key=SCOPE_KEY)
+        self.assertCountersMatchItems(queue)
+
+        item = self.present().item
+        schedule, _created = start_activity(
+            activity=item.activity,
+            queue_item=item,
+            scope_key=SCOPE_KEY,
+        )
+        complete_schedule(schedule)
+        complete_schedule(Schedule.objects.get(pk=schedule.pk))
+        self.assertCountersMatchItems(queue)
+
+        pending = queue.items.filter(state=ActivityQueueItem.STATE_PENDING).first()
+        Activity.objects.filter(pk=pending.activity_id).update(active=False)
+        self.present()
+
+        queue.refresh_from_db()
+        self.assertEqual(
+            (queue.pool_size, queue.consumed_count, queue.expired_count, queue.available_count),
+            (4, 2, 1, 1),
+        )
+        self.assertCountersMatchItems(queue)
+
+    def test_queue_closes_when_counters_claim_items_that_do_not_exist(self):
+        item = self.present().item
+        queue = item.queue
+        for _index in range(4):
+            skip_item(queue_item_id=item.id, scope_key=SCOPE_KEY)
+            item = self.present().item
+            if item.queue_id != queue.id:
+                break
+        queue.refresh_from_db()
+        self.assertEqual(queue.state, ActivityQueue.STATE_CLOSED)
+
+        review = item.queue
+        review.items.exclude(pk=item.pk).update(state=ActivityQueueItem.STATE_COMPLETED)
+        item.state = ActivityQueueItem.STATE_COMPLETED
+        item.save(update_fields=['state'])
+
+        with self.assertLogs('apps.pomodoro.services.queue_counters', 'WARNING'):
+            self.present()
+
+        review.refresh_from_db()
+        self.assertEqual(review.state, ActivityQueue.STATE_CLOSED)
+        self.assertEqual(review.consumed_count, review.pool_size)
+        self.assertEqual(metrics.get_count('queue_counter_drift'), 1)
+
+    def test_command_reports_and_repairs_drift(self):
+        queue = self.present().item.queue
+        ActivityQueue.objects.filter(pk=queue.pk).update(consumed_count=3, expired_count=1)
+
+        report = StringIO()
+        call_command('verify_queue_counters', stdout=report)
+        result = json.loads(report.getvalue())
+        self.assertEqual((result['drifted'], result['repaired']), (1, 0))
+        self.assertEqual(result['samples'][0]['stored']['consumed_count'], 3)
+        self.assertEqual(result['samples'][0]['actual']['consumed_count'], 0)
+
+        repaired = StringIO()
+        call_command('verify_queue_counters', '--repair', stdout=repaired)
+        self.assertEqual(json.loads(repaired.getvalue())['repaired'], 1)
+        self.assertCountersMatchItems(queue)
+
+        clean = StringIO()
+        call_command('verify_queue_counters', stdout=clean)
+        self.assertEqual(json.loads(clean.getvalue())['drifted'], 0)
+
+    def test_queue_without_items_counts_as_zero(self):
+        queue = ActivityQueue.objects.create(group=self.group, scope_key='vazia', pool_size=2)
+
+        report = StringIO()
+        call_command('verify_queue_counters', '--repair', stdout=report)
+
+        queue.refresh_from_db()
+        self.assertEqual(json.loads(report.getvalue())['repaired'], 1)
+        self.assertEqual(queue.pool_size, 0)
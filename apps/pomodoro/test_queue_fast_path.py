@@ -0,0 +1,151 @@
+from unittest.mock import patch
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_api_key.models import APIKey
+
+from apps.pomodoro.models import (
+    Activity,
+    ActivityQueue,
+    Category,
+    Group,
+    History,
+    Schedule,
+)
+from apps.pomodoro.services import metrics
+from apps.pomodoro.services.activity_execution import complete_schedule
+from apps.pomodoro.services.activity_queue import (
+    get_or_create_active_queue,
+    reconciliation_token,
+)
+
+
+class NextFastPathTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _, cls.api_key = APIKey.objects.create_key(name='fast-path')
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Api-Key {self.api_key}')
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.group = Group.objects.create(name='Leitura', max_daily_minutes=300)
+        self.category = Category.objects.create(
+            name='Livros',
+            group=self.group,
+            max_daily_executions=10,
+        )
+        self.first = Activity.objects.create(name='Primeira', category=self.category, duration=30)
+        self.second = Activity.objects.create(name='Segunda', category=self.category, duration=30)
+
+    def next(self):
+        return self.client.get(f'/api/activities/next/?group_id={self.group.id}')
+
+    def next_without_locks(self):
+        with patch(
+            'apps.pomodoro.services.activity_queue.get_or_create_active_queue',
+            wraps=get_or_create_active_queue,
+        ) as locked_path:
+            response = self.next()
+        return response, locked_path.called
+
+    def test_repeated_next_reuses_presented_item_without_reconciliation(self):
+        first = self.next()
+        queue = ActivityQueue.objects.get(group=self.group)
+        self.assertTrue(queue.fast_path_token)
+
+        second, used_locked_path = self.next_without_locks()
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertFalse(used_locked_path)
+        self.assertEqual(second.data['queue_item_id'], first.data['queue_item_id'])
+        self.assertEqual(second.data['group_remaining_daily_minutes'], 300)
+        self.assertEqual(metrics.get_count('queue_next_fast_path', result='hit'), 1)
+
+    def test_activity_change_falls_back_to_full_reconciliation(self):
+        first = self.next()
+        presented = Activity.objects.get(pk=first.data['id'])
+        presented.active = False
+        presented.save()
+
+        second, used_locked_path = self.next_without_locks()
+
+        self.assertTrue(used_locked_path)
+        self.assertNotEqual(second.data['queue_item_id'], first.data['queue_item_id'])
+
+    def record_history(self, activity, *, scope_key):
+        now = timezone.now()
+        schedule = Schedule.objects.create(
+            activity=activity,
+            scheduled_date=timezone.localdate(),
+            start_time=timezone.localtime(now).time().replace(tzinfo=None),
+            scope_key=scope_key,
+            state=Schedule.STATE_COMPLETED,
+            completed=True,
+        )
+        History.objects.create(activity=activity, schedule=schedule, start_time=now, end_time=now)
+
+    def test_execution_in_another_scope_that_exhausts_the_category_is_not_served(self):
+        self.category.max_daily_executions = 1
+        self.category.save()
+        first = self.next()
+
+        _, other_key = APIKey.objects.create_key(name='outro-escopo')
+        other_client = APIClient()
+        other_client.credentials(HTTP_AUTHORIZATION=f'Api-Key {other_key}')
+        other_item = other_client.get(f'/api/activities/next/?group_id={self.group.id}').data
+        started = other_client.post(
+            f"/api/activities/{other_item['id']}/start/",
+            {'queue_item_id': other_item['queue_item_id']},
+            format='json',
+        )
+        complete_schedule(Schedule.objects.get(pk=started.data['schedule_id']))
+
+        second, used_locked_path = self.next_without_locks()
+
+        self.assertTrue(used_locked_path)
+        self.assertNotEqual(second.data.get('queue_item_id'), first.data['queue_item_id'])
+        self.assertIsNone(second.data.get('id'))
+
+    def test_history_in_own_scope_falls_back_to_full_reconciliation(self):
+        first = self.next()
+        queue = ActivityQueue.objects.get(group=self.group)
+        presented = Activity.objects.get(pk=first.data['id'])
+        other = self.second if presented == self.first else self.first
+
+        self.record_history(other, scope_key=queue.scope_key)
+        _response, used_locked_path = self.next_without_locks()
+
+        self.assertTrue(used_locked_path)
+
+    def test_category_limit_change_falls_back_to_full_reconciliation(self):
+        self.next()
+        self.category.max_daily_executions = 1
+        self.category.save()
+
+        _response, used_locked_path = self.next_without_locks()
+
+        self.assertTrue(used_locked_path)
+
+    def test_counter_only_activity_saves_keep_the_fast_path(self):
+        self.next()
+        self.first.executions_today += 1
+        self.first.save(update_fields=['executions_today'])
+
+        _response, used_locked_path = self.next_without_locks()
+
+        self.assertFalse(used_locked_path)
+
+    def test_token_is_a_single_generation_read(self):
+        with self.assertNumQueries(1):
+            reconciliation_token()
+
+    def test_skipped_item_is_never_served_by_fast_path(self):
+        first = self.next()
+        self.client.post(f"/api/activity-queue/items/{first.data['queue_item_id']}/skip/")
+
+        second, used_locked_path = self.next_without_locks()
+
+        self.assertTrue(used_locked_path)
+        self.assertNotEqual(second.data['queue_item_id'], first.data['queue_item_id'])
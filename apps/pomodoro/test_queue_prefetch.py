@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.pomodoro.models import Activity, ActivityQueue, ActivityQueueItem, Category, Group
+from apps.pomodoro.services import metrics
+from apps.pomodoro.services.activity_queue import present_next_item, skip_item, stage_next_queue
+
+
+SCOPE_KEY = 'prefetch'
+
+
+@override_settings(QUEUE_PREFETCH_THRESHOLD=0.5)
+class QueuePrefetchTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.group = Group.objects.create(name='Pre-montagem')
+        self.category = Category.objects.create(
+            name='Pre-montagem',
+            group=self.group,
+            max_daily_executions=20,
+        )
+        self.activities = [
+            Activity.objects.create(name=f'Pre {index}', category=self.category, duration=10)
+            for index in range(4)
+        ]
+
+    def present(self):
+        return present_next_item(scope_key=SCOPE_KEY, selected_group=self.group)
+
+    def staged(self):
+        return ActivityQueue.objects.filter(
+            scope_key=SCOPE_KEY,
+            group=self.group,
+            state=ActivityQueue.STATE_STAGED,
+        ).first()
+
+    def skip(self, item):
+        with self.captureOnCommitCallbacks(execute=True):
+            skip_item(queue_item_id=item.id, scope_key=SCOPE_KEY)
+
+    def test_crossing_threshold_stages_next_pool_once(self):
+        self.skip(self.present().item)
+        self.assertIsNone(self.staged())
+
+        self.skip(self.present().item)
+        staged = self.staged()
+        self.assertIsNotNone(staged)
+        self.assertEqual((staged.pool_number, staged.pool_size), (0, 4))
+        self.assertEqual(staged.items.count(), 4)
+
+        self.skip(self.present().item)
+        self.assertEqual(
+            ActivityQueue.objects.filter(state=ActivityQueue.STATE_STAGED).count(),
+            1,
+        )
+        self.assertEqual(metrics.get_count('queue_prefetch', result='exists'), 1)
+
+    @override_settings(QUEUE_PREFETCH_THRESHOLD=None)
+    def test_empty_threshold_disables_prefetch(self):
+        for _index in range(3):
+            self.skip(self.present().item)
+
+        self.assertIsNone(self.staged())
+
+    def test_exhaustion_promotes_staged_pool_and_expires_stale_items(self):
+        active = self.present().item.queue
+        staged = stage_next_queue(scope_key=SCOPE_KEY, group_id=self.group.id)
+        Activity.objects.filter(pk=self.activities[0].pk).update(active=False)
+        ActivityQueue.objects.filter(pk=active.pk).update(
+            state=ActivityQueue.STATE_CLOSED,
+            closed_at=timezone.now(),
+        )
+
+        result = self.present()
+
+        staged.refresh_from_db()
+        self.assertEqual(result.item.queue_id, staged.id)
+        self.assertEqual(staged.state, ActivityQueue.STATE_ACTIVE)
+        self.assertEqual(staged.pool_number, active.pool_number + 1)
+        self.assertEqual(staged.expired_count, 1)
+        self.assertEqual(
+            staged.items.get(activity=self.activities[0]).state,
+            ActivityQueueItem.STATE_EXPIRED,
+        )
+        self.assertEqual(ActivityQueue.objects.count(), 2)
+        self.assertEqual(metrics.get_count('queue_prefetch', result='promoted'), 1)
+
+    def test_pool_staged_on_previous_day_is_discarded(self):
+        active = self.present().item.queue
+        staged = stage_next_queue(scope_key=SCOPE_KEY, group_id=self.group.id)
+        ActivityQueue.objects.filter(pk=staged.pk).update(
+            created_at=timezone.now() - timedelta(days=1),
+        )
+        ActivityQueue.objects.filter(pk=active.pk).update(state=ActivityQueue.STATE_CLOSED)
+
+        result = self.present()
+
+        staged.refresh_from_db()
+        self.assertEqual(staged.state, ActivityQueue.STATE_CANCELLED)
+        self.assertNotIn(result.item.queue_id, [active.id, staged.id])
+
+    def test_staging_without_active_queue_is_a_no_op(self):
+        self.assertIsNone(stage_next_queue(scope_key=SCOPE_KEY, group_id=self.group.id))
+        self.assertFalse(ActivityQueue.objects.exists())
@@ -0,0 +1,90 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_api_key.models import APIKey
+
+from apps.pomodoro.models import Activity, ActivityQueue, Category, Group
+
+
+class QueueVersionTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _, cls.api_key = APIKey.objects.create_key(name='queue-version')
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Api-Key {self.api_key}')
+        self.group = Group.objects.create(name='Estudos', max_daily_minutes=300)
+        self.category = Category.objects.create(
+            name='Leitura',
+            group=self.group,
+            max_daily_executions=10,
+        )
+        Activity.objects.create(name='Primeira', category=self.category, duration=30)
+        Activity.objects.create(name='Segunda', category=self.category, duration=30)
+
+    def next(self):
+        return self.client.get(f'/api/activities/next/?group_id={self.group.id}')
+
+    def start(self, item, version):
+        return self.client.post(
+            f"/api/activities/{item['id']}/start/",
+            {'queue_item_id': item['queue_item_id']},
+            format='json',
+            HTTP_IF_MATCH=f'"{version}"',
+        )
+
+    def queue_version(self):
+        return ActivityQueue.objects.get(group=self.group).version
+
+    def test_next_exposes_version_in_body_and_etag(self):
+        response = self.next()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['queue_version'], self.queue_version())
+        self.assertEqual(response['ETag'], f'"{response.data["queue_version"]}"')
+
+    def test_skip_and_start_increment_version(self):
+        first = self.next().data
+        skipped = self.client.post(
+            f"/api/activity-queue/items/{first['queue_item_id']}/skip/",
+            HTTP_IF_MATCH=f'W/"{first["queue_version"]}"',
+        )
+        self.assertEqual(skipped.status_code, status.HTTP_200_OK)
+        self.assertGreater(self.queue_version(), first['queue_version'])
+
+        second = self.next().data
+        started = self.start(second, second['queue_version'])
+
+        self.assertEqual(started.status_code, status.HTTP_201_CREATED)
+        self.assertGreater(self.queue_version(), second['queue_version'])
+
+    def test_stale_if_match_is_rejected_with_current_version(self):
+        first = self.next().data
+        self.client.post(f"/api/activity-queue/items/{first['queue_item_id']}/skip/")
+        second = self.next().data
+
+        response = self.start(second, first['queue_version'])
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['code'], 'queue_version_mismatch')
+        self.assertEqual(response.data['queue_version'], self.queue_version())
+        self.assertTrue(response.data['recoverable'])
+
+    def test_repeated_start_with_previous_version_is_idempotent(self):
+        item = self.next().data
+        first = self.start(item, item['queue_version'])
+        retry = self.start(item, item['queue_version'])
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data['execution_id'], first.data['execution_id'])
+
+    def test_invalid_if_match_is_rejected(self):
+        item = self.next().data
+
+        response = self.client.post(
+            f"/api/activity-queue/items/{item['queue_item_id']}/skip/",
+            HTTP_IF_MATCH='"abc"',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['code'], 'invalid_if_match')
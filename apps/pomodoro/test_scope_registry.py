@@ -0,0 +1,84 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APITestCase
+from rest_framework_api_key.models import APIKey
+
+from apps.pomodoro.models import Activity, Category, Group, ScopeRegistry
+from apps.pomodoro.services import activity_execution
+from apps.pomodoro.services.activity_execution import build_scope_key
+
+
+class ScopeRegistryTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _, cls.api_key = APIKey.objects.create_key(name='scope-registry')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Api-Key {self.api_key}')
+        self.group = Group.objects.create(name='Estudos', max_daily_minutes=300)
+        category = Category.objects.create(name='Leitura', group=self.group, max_daily_executions=10)
+        Activity.objects.create(name='Primeira', category=category, duration=30)
+
+    def test_scope_is_hashed_once_per_request(self):
+        request = RequestFactory().get('/api/activities/active/', HTTP_AUTHORIZATION='Api-Key abc')
+        real_sha256 = activity_execution.hashlib.sha256
+
+        with patch.object(activity_execution.hashlib, 'sha256', side_effect=real_sha256) as sha256:
+            first = build_scope_key(request)
+            second = build_scope_key(Request(request))
+
+        self.assertEqual(first, second)
+        self.assertEqual(sha256.call_count, 1)
+
+    def test_deriving_the_scope_does_not_write_the_registry(self):
+        request = RequestFactory().get('/api/activities/active/', HTTP_AUTHORIZATION='Api-Key abc')
+
+        build_scope_key(request)
+
+        self.assertFalse(ScopeRegistry.objects.exists())
+
+    def test_each_request_records_the_scope_once(self):
+        scope_key = build_scope_key(
+            RequestFactory().get('/', HTTP_AUTHORIZATION=f'Api-Key {self.api_key}')
+        )
+
+        with patch('apps.pomodoro.views.record_scope_seen') as record:
+            self.client.get(f'/api/activities/next/?group_id={self.group.id}')
+
+        record.assert_called_once_with(scope_key, group=self.group)
+
+    def test_first_request_registers_scope_and_next_records_group(self):
+        self.client.get('/api/activities/active/')
+        registry = ScopeRegistry.objects.get()
+        self.assertEqual(registry.first_seen_at, registry.last_seen_at)
+        self.assertIsNone(registry.default_group)
+
+        self.client.get(f'/api/activities/next/?group_id={self.group.id}')
+
+        registry.refresh_from_db()
+        self.assertEqual(registry.default_group, self.group)
+
+    def test_last_seen_is_touched_at_most_once_per_interval(self):
+        self.client.get('/api/activities/active/')
+        registry = ScopeRegistry.objects.get()
+        earlier = timezone.now() - timedelta(hours=1)
+        ScopeRegistry.objects.update(first_seen_at=earlier, last_seen_at=earlier)
+
+        self.client.get('/api/activities/active/')
+        registry.refresh_from_db()
+        self.assertEqual(registry.last_seen_at, earlier)
+
+        with override_settings(SCOPE_REGISTRY_TOUCH_SECONDS=0):
+            response = self.client.get('/api/activities/active/')
+        registry.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertGreater(registry.last_seen_at, earlier)
+        self.assertEqual(registry.first_seen_at, earlier)
@@ -1,15 +1,18 @@
 import json
-import socket
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
 from django.contrib.messages import get_messages
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from apps.pomodoro.models import Activity, Category, Group
+from apps.pomodoro.fake_steam_server import FakeSteamServer
+from apps.pomodoro.models import Activity, Category, Group, ImportJob
+from apps.pomodoro.services import external_import
+from apps.pomodoro.services.http_client import reset_clients
 from apps.pomodoro.services.steam_import import (
     SteamImportError,
     SteamImportResult,
@@ -18,24 +21,6 @@ from apps.pomodoro.services.steam_import import (
 )
 
 
-class FakeHTTPResponse:
-    def __init__(self, payload, *, status=200):
-        self.payload = payload
-        self.status = status
-
-    def read(self):
-        return self.payload
-
-    def getcode(self):
-        return self.status
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, _exc_type, _exc_value, _traceback):
-        return False
-
-
 @override_settings(
     STEAM_API_KEY='test-steam-key',
     STEAM_ID64='76561198065747727',
@@ -53,8 +38,8 @@ class SteamImportServiceTests(TestCase):
             max_daily_executions=100,
         )
 
-    @patch('apps.pomodoro.services.steam_import.reconcile_activity')
-    @patch('apps.pomodoro.services.steam_import.fetch_owned_games')
+    @patch('apps.pomodoro.services.external_import.reconcile_activities')
+    @patch('apps.pomodoro.services.steam_import.stream_owned_games')
     def test_imports_new_games_with_expected_mapping_and_reconciliation(self, fetch, reconcile):
         fetch.return_value = [
             {'appid': 10, 'name': 'Counter-Strike'},
@@ -80,10 +65,14 @@ class SteamImportServiceTests(TestCase):
             first.description,
             'Jogo importado automaticamente da biblioteca Steam. Steam AppID: 10.',
         )
-        self.assertEqual(reconcile.call_count, 2)
+        reconcile.assert_called_once()
+        self.assertEqual(
+            sorted(activity.external_id for activity in reconcile.call_args.args[0]),
+            ['10', '20'],
+        )
 
-    @patch('apps.pomodoro.services.steam_import.reconcile_activity')
-    @patch('apps.pomodoro.services.steam_import.fetch_owned_games')
+    @patch('apps.pomodoro.services.external_import.reconcile_activities')
+    @patch('apps.pomodoro.services.steam_import.stream_owned_games')
     def test_second_import_is_idempotent(self, fetch, reconcile):
         fetch.return_value = [{'appid': 10, 'name': 'Counter-Strike'}]
 
@@ -95,8 +84,8 @@ class SteamImportServiceTests(TestCase):
         self.assertEqual(Activity.objects.filter(external_source='steam', external_id='10').count(), 1)
         self.assertEqual(reconcile.call_count, 1)
 
-    @patch('apps.pomodoro.services.steam_import.reconcile_activity')
-    @patch('apps.pomodoro.services.steam_import.fetch_owned_games')
+    @patch('apps.pomodoro.services.external_import.reconcile_activity')
+    @patch('apps.pomodoro.services.steam_import.stream_owned_games')
     def test_sync_updates_controlled_fields_and_preserves_manual_fields(self, fetch, reconcile):
         fetch.return_value = [{'appid': 10, 'name': 'Nome antigo'}]
         import_steam_games()
@@ -127,7 +116,7 @@ class SteamImportServiceTests(TestCase):
         self.assertEqual(reconcile.call_args.kwargs['previous']['category_id'], other_category.id)
 
     @override_settings(STEAM_ACTIVITY_CATEGORY_ID='999')
-    @patch('apps.pomodoro.services.steam_import.fetch_owned_games')
+    @patch('apps.pomodoro.services.steam_import.stream_owned_games')
     def test_missing_category_aborts_before_http_request(self, fetch):
         with self.assertRaisesRegex(SteamImportError, 'categoria de ID 999 não existe'):
             import_steam_games()
@@ -140,7 +129,7 @@ class SteamImportServiceTests(TestCase):
         with self.assertRaisesRegex(SteamImportError, 'STEAM_API_KEY'):
             import_steam_games()
 
-    @patch('apps.pomodoro.services.steam_import.fetch_owned_games')
+    @patch('apps.pomodoro.services.steam_import.stream_owned_games')
     def test_invalid_items_are_counted_as_errors(self, fetch):
         fetch.return_value = [
             {'name': 'Sem AppID'},
@@ -154,15 +143,51 @@ class SteamImportServiceTests(TestCase):
         self.assertEqual(result, SteamImportResult(4, 0, 0, 0, 4))
         self.assertFalse(Activity.objects.exists())
 
-    @patch('apps.pomodoro.services.steam_import.reconcile_activity', side_effect=RuntimeError)
-    @patch('apps.pomodoro.services.steam_import.fetch_owned_games')
-    def test_reconciliation_failure_rolls_back_only_failed_game(self, fetch, _reconcile):
-        fetch.return_value = [{'appid': 10, 'name': 'Counter-Strike'}]
+    @patch('apps.pomodoro.services.external_import.reconcile_activities', side_effect=RuntimeError)
+    @patch('apps.pomodoro.services.steam_import.stream_owned_games')
+    def test_reconciliation_failure_rolls_back_only_failed_game(self, fetch, _reconcile_batch):
+        fetch.return_value = [
+            {'appid': 10, 'name': 'Counter-Strike'},
+            {'appid': 20, 'name': 'Team Fortress Classic'},
+        ]
+        real_reconcile = external_import.reconcile_activity
 
-        result = import_steam_games()
+        def fail_for_first_game(activity, **kwargs):
+            if activity.external_id == '10':
+                raise RuntimeError
+            return real_reconcile(activity, **kwargs)
+
+        with patch.object(external_import, 'reconcile_activity', side_effect=fail_for_first_game):
+            result = import_steam_games()
 
-        self.assertEqual(result.errors, 1)
+        self.assertEqual(result, SteamImportResult(2, 1, 0, 0, 1))
         self.assertFalse(Activity.objects.filter(external_id='10').exists())
+        self.assertTrue(Activity.objects.filter(external_id='20').exists())
+
+    @override_settings(STEAM_IMPORT_BATCH_SIZE=2)
+    @patch('apps.pomodoro.services.steam_import.stream_owned_games')
+    def test_games_are_written_in_batches_against_one_prefetch(self, fetch):
+        Activity.objects.create(
+            name='Jogo 1',
+            description='Jogo importado automaticamente da biblioteca Steam. Steam AppID: 1.',
+            category=self.category,
+            external_source='steam',
+            external_id='1',
+        )
+        fetch.return_value = [{'appid': appid, 'name': f'Jogo {appid}'} for appid in range(1, 8)]
+        fetch.return_value.append({'appid': 3, 'name': 'Duplicado no payload'})
+
+        with CaptureQueriesContext(connection) as queries:
+            result = import_steam_games()
+
+        self.assertEqual(result, SteamImportResult(8, 6, 0, 2, 0))
+        steam_reads = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and '"external_source" = ' in query['sql']
+        ]
+        self.assertEqual(len(steam_reads), 1)
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT INTO "pomodoro_activity"')]
+        self.assertEqual(len(inserts), 3)
 
     def test_external_identity_constraint_prevents_duplicates(self):
         Activity.objects.create(
@@ -182,47 +207,63 @@ class SteamImportServiceTests(TestCase):
 
 
 class SteamHTTPClientTests(TestCase):
-    @patch('apps.pomodoro.services.steam_import.urlopen')
-    def test_fetches_games_with_all_expected_parameters(self, urlopen):
-        urlopen.return_value = FakeHTTPResponse(
+    def setUp(self):
+        reset_clients()
+        self.addCleanup(reset_clients)
+        self.server = FakeSteamServer(
             json.dumps({'response': {'games': [{'appid': 10, 'name': 'CS'}]}}).encode()
         )
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        settings_override = override_settings(STEAM_API_URL=self.server.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
 
+    def test_fetches_games_with_all_expected_parameters(self):
         games = fetch_owned_games(api_key='safe-test-key', steam_id='123', timeout=4)
 
         self.assertEqual(games, [{'appid': 10, 'name': 'CS'}])
-        request = urlopen.call_args.args[0]
-        self.assertIn('include_appinfo=true', request.full_url)
-        self.assertIn('include_played_free_games=true', request.full_url)
-        self.assertIn('include_free_sub=true', request.full_url)
-        self.assertIn('skip_unvetted_apps=false', request.full_url)
-        self.assertIn('format=json', request.full_url)
-        self.assertEqual(urlopen.call_args.kwargs['timeout'], 4)
-
-    @patch('apps.pomodoro.services.steam_import.urlopen')
-    def test_http_error_is_sanitized(self, urlopen):
-        urlopen.return_value = FakeHTTPResponse(b'{}', status=503)
+        request = self.server.requests[0]
+        for parameter in (
+            'include_appinfo=true',
+            'include_played_free_games=true',
+            'include_free_sub=true',
+            'skip_unvetted_apps=false',
+            'format=json',
+        ):
+            self.assertIn(parameter, request['path'])
+        self.assertEqual(request['User-Agent'], 'PomodoroTask/SteamImporter')
+
+    def test_http_error_is_sanitized(self):
+        self.server.responses.extend([503, 503, 503])
 
         with self.assertRaisesRegex(SteamImportError, 'HTTP 503') as raised:
             fetch_owned_games(api_key='secret-that-must-not-leak', steam_id='123', timeout=4)
 
         self.assertNotIn('secret-that-must-not-leak', str(raised.exception))
 
-    @patch('apps.pomodoro.services.steam_import.urlopen', side_effect=socket.timeout)
-    def test_timeout_is_sanitized(self, _urlopen):
+    def test_rejected_credentials_are_not_retried(self):
+        self.server.responses.append(403)
+
+        with self.assertRaisesRegex(SteamImportError, 'recusou as credenciais'):
+            fetch_owned_games(api_key='test-key', steam_id='123', timeout=4)
+
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_timeout_is_sanitized(self):
+        self.server.delay = 0.2
+
         with self.assertRaisesRegex(SteamImportError, 'tempo limite'):
-            fetch_owned_games(api_key='secret-that-must-not-leak', steam_id='123', timeout=4)
+            fetch_owned_games(api_key='secret-that-must-not-leak', steam_id='123', timeout=0.05)
 
-    @patch('apps.pomodoro.services.steam_import.urlopen')
-    def test_invalid_json_is_rejected(self, urlopen):
-        urlopen.return_value = FakeHTTPResponse(b'not-json')
+    def test_invalid_json_is_rejected(self):
+        self.server.payload = b'not-json'
 
         with self.assertRaisesRegex(SteamImportError, 'JSON inválida'):
             fetch_owned_games(api_key='test-key', steam_id='123', timeout=4)
 
-    @patch('apps.pomodoro.services.steam_import.urlopen')
-    def test_valid_response_without_games_returns_empty_list(self, urlopen):
-        urlopen.return_value = FakeHTTPResponse(b'{"response": {"game_count": 0}}')
+    def test_valid_response_without_games_returns_empty_list(self):
+        self.server.payload = b'{"response": {"game_count": 0}}'
 
         games = fetch_owned_games(api_key='test-key', steam_id='123', timeout=4)
 
@@ -245,7 +286,7 @@ class SteamImportAdminTests(TestCase):
             password='test-password',
         )
 
-    @patch('apps.pomodoro.admin.import_steam_games')
+    @patch('apps.pomodoro.admin.start_steam_import')
     def test_endpoint_rejects_get_without_executing_import(self, import_games):
         self.client.force_login(self.superuser)
 
@@ -264,22 +305,26 @@ class SteamImportAdminTests(TestCase):
         self.assertContains(response, 'method="post"')
         self.assertContains(response, 'csrfmiddlewaretoken')
 
-    @patch('apps.pomodoro.admin.import_steam_games')
+    @patch('apps.pomodoro.services.import_jobs.import_steam_games')
     def test_endpoint_accepts_post_for_authorized_admin(self, import_games):
         import_games.return_value = SteamImportResult(227, 220, 5, 2, 0)
         self.client.force_login(self.superuser)
 
-        response = self.client.post(self.url, follow=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, follow=True)
 
         self.assertRedirects(response, self.changelist_url)
-        import_games.assert_called_once_with()
-        messages = [str(message) for message in get_messages(response.wsgi_request)]
-        self.assertIn(
-            'Steam: 227 jogos encontrados; 220 criados; 5 atualizados; 2 ignorados; 0 erros.',
-            messages,
+        import_games.assert_called_once()
+        job = ImportJob.objects.get()
+        self.assertEqual(job.requested_by, self.superuser)
+        self.assertEqual(
+            (job.state, job.total, job.created, job.updated, job.skipped, job.errors),
+            (ImportJob.STATE_SUCCEEDED, 227, 220, 5, 2, 0),
         )
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertIn(f'Importação da Steam #{job.id} iniciada; o progresso aparece abaixo.', messages)
 
-    @patch('apps.pomodoro.admin.import_steam_games')
+    @patch('apps.pomodoro.admin.start_steam_import')
     def test_endpoint_requires_csrf_token(self, import_games):
         csrf_client = Client(enforce_csrf_checks=True)
         csrf_client.force_login(self.superuser)
@@ -289,7 +334,7 @@ class SteamImportAdminTests(TestCase):
         self.assertEqual(response.status_code, 403)
         import_games.assert_not_called()
 
-    @patch('apps.pomodoro.admin.import_steam_games')
+    @patch('apps.pomodoro.admin.start_steam_import')
     def test_endpoint_rejects_admin_without_change_permission(self, import_games):
         user = get_user_model().objects.create_user(
             username='limited-admin',
@@ -304,13 +349,18 @@ class SteamImportAdminTests(TestCase):
         self.assertEqual(response.status_code, 403)
         import_games.assert_not_called()
 
-    @patch('apps.pomodoro.admin.import_steam_games')
+    @patch('apps.pomodoro.services.import_jobs.import_steam_games')
     def test_admin_error_message_does_not_expose_api_key(self, import_games):
         import_games.side_effect = SteamImportError('A Steam recusou as credenciais configuradas.')
         self.client.force_login(self.superuser)
 
-        response = self.client.post(self.url, follow=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url)
+        job = ImportJob.objects.get()
+        status = self.client.get(reverse('admin:pomodoro_activity_import_steam_status', args=[job.id]))
+        changelist = self.client.get(self.changelist_url)
 
-        content = response.content.decode()
-        self.assertNotIn('test-steam-key', content)
-        self.assertContains(response, 'A Steam recusou as credenciais configuradas.')
+        for response in (status, changelist):
+            self.assertNotIn('test-steam-key', response.content.decode())
+            self.assertContains(response, 'A Steam recusou as credenciais configuradas.')
+        self.assertEqual(status.json()['state'], ImportJob.STATE_FAILED)
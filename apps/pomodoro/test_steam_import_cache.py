@@ -0,0 +1,166 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.pomodoro.fake_steam_server import FakeSteamServer, owned_games_payload
+from apps.pomodoro.models import Activity, Category, Group, ImportFingerprint, ImportSourceState
+from apps.pomodoro.services import external_import, metrics
+from apps.pomodoro.services.http_client import reset_clients
+from apps.pomodoro.services.steam_import import SteamImportResult, import_steam_games
+
+
+class SteamImportCacheTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        reset_clients()
+        self.addCleanup(reset_clients)
+        group = Group.objects.create(name='Jogos')
+        self.category = Category.objects.create(name='Steam', group=group, max_daily_executions=10)
+        self.server = FakeSteamServer(owned_games_payload(6), chunk_size=64)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        settings_override = override_settings(
+            STEAM_API_URL=self.server.url,
+            STEAM_API_KEY='secret',
+            STEAM_ACTIVITY_CATEGORY_ID=self.category.id,
+            STEAM_IMPORT_BATCH_SIZE=4,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def set_games(self, games):
+        self.server.payload = json.dumps({'response': {'game_count': len(games), 'games': games}}).encode()
+
+    def test_full_import_records_hash_and_fingerprints(self):
+        import_steam_games()
+
+        state = ImportSourceState.objects.get(source='steam')
+        self.assertEqual(len(state.payload_hash), 64)
+        self.assertEqual(state.item_count, 6)
+        self.assertEqual(ImportFingerprint.objects.filter(source='steam').count(), 6)
+        self.assertEqual(metrics.get_count('import_cache', source='steam', result='miss'), 1)
+
+    def test_unchanged_payload_skips_the_database_phase(self):
+        import_steam_games()
+
+        with CaptureQueriesContext(connection) as queries:
+            result = import_steam_games(only_changed=True)
+
+        self.assertEqual(result, SteamImportResult(6, 0, 0, 6, 0))
+        self.assertFalse([query for query in queries if 'pomodoro_activity' in query['sql']])
+        self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
+        self.assertEqual(metrics.get_count('import_cache', source='steam', result='hit'), 1)
+
+    def test_only_changed_diffs_just_the_changed_games(self):
+        import_steam_games()
+        games = json.loads(owned_games_payload(6))['response']['games']
+        games[0]['name'] = 'Jogo 1 Remasterizado'
+        games[1]['playtime_forever'] += 30
+        games.append({'appid': 99, 'name': 'Novo', 'playtime_forever': 0})
+        self.set_games(games)
+        # Edição local de um jogo que não mudou na Steam: o modo incremental não a desfaz.
+        Activity.objects.filter(external_id='3').update(name='Renomeado localmente')
+
+        result = import_steam_games(only_changed=True)
+
+        self.assertEqual(result, SteamImportResult(7, 1, 1, 5, 0))
+        self.assertEqual(Activity.objects.get(external_id='1').name, 'Jogo 1 Remasterizado')
+        self.assertEqual(Activity.objects.get(external_id='3').name, 'Renomeado localmente')
+        self.assertEqual(ImportFingerprint.objects.filter(source='steam').count(), 7)
+
+        full = import_steam_games()
+
+        self.assertEqual(full.updated, 1)
+        self.assertEqual(Activity.objects.get(external_id='3').name, 'Jogo 3')
+
+    def test_only_changed_recreates_activities_deleted_locally(self):
+        import_steam_games()
+        Activity.objects.filter(external_id__in=['2', '5']).delete()
+
+        self.assertEqual(ImportFingerprint.objects.filter(source='steam').count(), 4)
+
+        result = import_steam_games(only_changed=True)
+
+        self.assertEqual(result, SteamImportResult(6, 2, 0, 4, 0))
+        self.assertEqual(Activity.objects.filter(external_id__in=['2', '5']).count(), 2)
+        self.assertEqual(ImportFingerprint.objects.filter(source='steam').count(), 6)
+
+    def test_removed_games_drop_their_fingerprints(self):
+        import_steam_games()
+        self.server.payload = owned_games_payload(2)
+
+        import_steam_games(only_changed=True)
+
+        self.assertEqual(
+            sorted(ImportFingerprint.objects.values_list('external_id', flat=True)),
+            ['1', '2'],
+        )
+
+    def test_failed_games_are_retried_by_the_next_incremental_run(self):
+        real_reconcile = external_import.reconcile_activity
+
+        def fail_for_second_game(activity, **kwargs):
+            if activity.external_id == '2':
+                raise RuntimeError
+            return real_reconcile(activity, **kwargs)
+
+        with patch.object(external_import, 'reconcile_activities', side_effect=RuntimeError), \
+                patch.object(external_import, 'reconcile_activity', side_effect=fail_for_second_game):
+            first = import_steam_games(only_changed=True)
+        retry = import_steam_games(only_changed=True)
+
+        self.assertEqual((first.created, first.errors), (5, 1))
+        self.assertEqual(retry, SteamImportResult(6, 1, 0, 5, 0))
+        self.assertTrue(Activity.objects.filter(external_id='2').exists())
+
+    def test_command_supports_only_changed(self):
+        out = StringIO()
+        call_command('import_steam_games', stdout=out)
+        call_command('import_steam_games', '--only-changed', stdout=out)
+
+        first, second = (json.loads(line) for line in out.getvalue().splitlines())
+        self.assertEqual(first['created'], 6)
+        self.assertEqual((second['skipped'], second['created']), (6, 0))
+
+    def test_dry_run_reports_changes_and_rolls_them_back(self):
+        import_steam_games()
+        self.server.payload = owned_games_payload(9)
+        state = ImportSourceState.objects.get(source='steam')
+
+        result = import_steam_games(dry_run=True, batch_size=2)
+
+        self.assertEqual(result, SteamImportResult(9, 3, 0, 6, 0))
+        self.assertEqual(Activity.objects.filter(external_source='steam').count(), 6)
+        self.assertEqual(ImportSourceState.objects.get(source='steam').payload_hash, state.payload_hash)
+        self.assertEqual(metrics.get_count('import_cache', source='steam', result='skipped'), 1)
+
+    def test_limit_stops_reading_without_touching_the_cache(self):
+        result = import_steam_games(limit=4)
+
+        self.assertEqual(result, SteamImportResult(4, 4, 0, 0, 0))
+        self.assertFalse(ImportSourceState.objects.exists())
+        self.assertEqual(import_steam_games(), SteamImportResult(6, 2, 0, 4, 0))
+
+    def test_command_reports_phase_timings(self):
+        out = StringIO()
+        call_command('import_steam_games', '--dry-run', '--batch-size=2', '--limit=5', stdout=out)
+
+        payload = json.loads(out.getvalue())
+        self.assertEqual(
+            {key: payload[key] for key in ('dry_run', 'total', 'created')},
+            {'dry_run': True, 'total': 5, 'created': 5},
+        )
+        self.assertEqual(set(payload['timings']), {'fetch', 'parse', 'diff', 'write', 'reconcile'})
+        self.assertTrue(all(seconds >= 0 for seconds in payload['timings'].values()))
+        self.assertGreater(payload['timings']['fetch'], 0)
+        self.assertFalse(Activity.objects.exists())
+
+    def test_command_rejects_non_positive_sizes(self):
+        for argument in ('--batch-size=0', '--limit=-1'):
+            with self.subTest(argument=argument), self.assertRaises(CommandError):
+                call_command('import_steam_games', argument)
@@ -0,0 +1,98 @@
+import io
+import json
+
+from django.test import TestCase, override_settings
+
+from apps.pomodoro.fake_steam_server import FakeSteamServer, owned_games_payload
+from apps.pomodoro.models import Activity, Category, Group
+from apps.pomodoro.services.http_client import reset_clients
+from apps.pomodoro.services.steam_import import (
+    SteamImportError,
+    SteamImportResult,
+    import_steam_games,
+    iter_owned_games,
+)
+
+
+def parse(payload, chunk_size=7):
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return list(iter_owned_games(io.BytesIO(payload), chunk_size=chunk_size))
+
+
+class IterOwnedGamesTests(TestCase):
+    def test_games_are_decoded_across_chunk_boundaries(self):
+        games = [
+            {'appid': 1, 'name': 'Açaí [edição] {especial}'},
+            {'appid': 2, 'name': 'Jogo "2"', 'tags': [1, [2, {'x': ']'}]]},
+        ]
+        payload = json.dumps({'response': {'game_count': 2, 'games': games, 'extra': {'a': []}}})
+
+        for chunk_size in (1, 3, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(parse(payload, chunk_size), games)
+
+    def test_missing_or_null_games_yield_nothing(self):
+        self.assertEqual(parse('{"response": {}}'), [])
+        self.assertEqual(parse('{"response": {"game_count": 0, "games": null}}'), [])
+
+    def test_invalid_payloads_raise_safe_errors(self):
+        cases = {
+            '{"response": {"games": [{"appid": 1}, {"appid": }]}}': 'JSON inválida',
+            '{"response": {"games": [{"appid": 1} {"appid": 2}]}}': 'JSON inválida',
+            '{"response": {"games": [{"appid": 1}]}': 'JSON inválida',
+            '{"response": {"games": [{"appid": 1}': 'JSON inválida',
+            '{"response": {"games": [1]}}': 'itens de jogos inválidos',
+            '{"response": {"games": {}}}': 'lista de jogos inválida',
+            '[]': 'formato inesperado',
+        }
+        for payload, message in cases.items():
+            with self.subTest(payload=payload), self.assertRaisesMessage(SteamImportError, message):
+                parse(payload)
+
+    def test_games_before_a_late_error_are_already_yielded(self):
+        games = iter_owned_games(
+            io.BytesIO(b'{"response": {"games": [{"appid": 1}, {"appid": 2}, oops]}}'),
+            chunk_size=4,
+        )
+
+        self.assertEqual(next(games), {'appid': 1})
+        self.assertEqual(next(games), {'appid': 2})
+        with self.assertRaises(SteamImportError):
+            next(games)
+
+
+class StreamedImportTests(TestCase):
+    def setUp(self):
+        reset_clients()
+        self.addCleanup(reset_clients)
+        group = Group.objects.create(name='Jogos')
+        self.category = Category.objects.create(name='Steam', group=group, max_daily_executions=10)
+
+    def test_import_reads_chunked_response_from_server(self):
+        with FakeSteamServer(owned_games_payload(25), chunk_size=50) as server, override_settings(
+            STEAM_API_URL=server.url,
+            STEAM_API_KEY='secret',
+            STEAM_ID64='76561198065747727',
+            STEAM_ACTIVITY_CATEGORY_ID=self.category.id,
+            STEAM_IMPORT_BATCH_SIZE=4,
+        ):
+            result = import_steam_games()
+            again = import_steam_games()
+
+        self.assertEqual(result, SteamImportResult(25, 25, 0, 0, 0))
+        self.assertEqual(again, SteamImportResult(25, 0, 0, 25, 0))
+        self.assertEqual(Activity.objects.filter(external_source='steam').count(), 25)
+        self.assertIn('key=secret', server.requests[0]['path'])
+
+    def test_server_error_keeps_safe_message(self):
+        with FakeSteamServer(owned_games_payload(1)) as server, override_settings(
+            STEAM_API_URL=server.url,
+            STEAM_API_KEY='secret',
+            STEAM_ACTIVITY_CATEGORY_ID=self.category.id,
+        ):
+            server.responses.extend([503, 503, 503])
+            with self.assertRaisesMessage(SteamImportError, 'HTTP 503'):
+                import_steam_games()
+
+        self.assertFalse(Activity.objects.exists())
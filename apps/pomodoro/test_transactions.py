@@ -0,0 +1,292 @@
+import threading
+from unittest import skipUnless
+from unittest.mock import MagicMock, patch
+
+from django.db import OperationalError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_api_key.models import APIKey
+
+from apps.pomodoro.models import Group
+from apps.pomodoro.services import metrics
+from apps.pomodoro.services.transactions import (
+    ServiceRetryExhausted,
+    ServiceTimeout,
+    apply_transaction_timeouts,
+    backoff_delay,
+    operation_timeouts,
+    service_transaction,
+)
+
+
+class FakePgError(Exception):
+    def __init__(self, sqlstate):
+        self.sqlstate = sqlstate
+        super().__init__(sqlstate)
+
+
+def database_error(sqlstate):
+    error = OperationalError('canceling statement')
+    error.__cause__ = FakePgError(sqlstate)
+    return error
+
+
+class ServiceTransactionTimeoutTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    @override_settings(
+        SERVICE_TRANSACTION_TIMEOUTS={
+            'default': {'statement_timeout_ms': 4000},
+            'reconcile_activity': {'lock_timeout_ms': 9000},
+        }
+    )
+    def test_operation_timeouts_override_defaults(self):
+        self.assertEqual(
+            operation_timeouts('reconcile_activity'),
+            {'statement_timeout_ms': 4000, 'lock_timeout_ms': 9000},
+        )
+        self.assertEqual(
+            operation_timeouts('start_activity'),
+            {'statement_timeout_ms': 4000, 'lock_timeout_ms': 2000},
+        )
+
+    def test_applies_local_timeouts_only_on_postgresql(self):
+        fake_connection = MagicMock(vendor='postgresql')
+        cursor = fake_connection.cursor.return_value.__enter__.return_value
+        with patch('apps.pomodoro.services.transactions.connection', fake_connection):
+            apply_transaction_timeouts('start_activity')
+
+        sql, params = cursor.execute.call_args.args
+        self.assertIn("set_config('lock_timeout', %s, true)", sql)
+        self.assertEqual(params, ['5000ms', '2000ms'])
+
+        with patch('apps.pomodoro.services.transactions.connection') as sqlite_connection:
+            sqlite_connection.vendor = 'sqlite'
+            apply_transaction_timeouts('start_activity')
+        sqlite_connection.cursor.assert_not_called()
+
+    @override_settings(SERVICE_TIMEOUT_RETRY_AFTER_SECONDS=3)
+    def test_maps_lock_and_statement_timeouts_and_counts_them(self):
+        @service_transaction('start_activity')
+        def locked():
+            raise database_error('55P03')
+
+        @service_transaction('present_next_item')
+        def slow():
+            raise database_error('57014')
+
+        with self.assertLogs('apps.pomodoro.services.transactions', level='WARNING') as logs:
+            with self.assertRaises(ServiceTimeout) as lock_ctx:
+                locked()
+            with self.assertRaises(ServiceTimeout) as statement_ctx:
+                slow()
+
+        self.assertIn('operation=start_activity code=lock_timeout sqlstate=55P03', logs.output[0])
+        self.assertIn('operation=present_next_item code=statement_timeout sqlstate=57014', logs.output[1])
+        self.assertEqual(logs.records[0].sqlstate, '55P03')
+
+        self.assertEqual(lock_ctx.exception.code, 'lock_timeout')
+        self.assertEqual(lock_ctx.exception.retry_after, 3)
+        self.assertEqual(statement_ctx.exception.code, 'statement_timeout')
+        self.assertEqual(
+            metrics.get_count(
+                'service_transaction_timeouts',
+                operation='start_activity',
+                code='lock_timeout',
+            ),
+            1,
+        )
+
+    def test_other_operational_errors_are_not_masked(self):
+        @service_transaction('skip_item')
+        def broken():
+            raise database_error('08006')
+
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_only_outermost_operation_applies_timeouts(self):
+        @service_transaction('present_next_item')
+        def inner():
+            return 'ok'
+
+        @service_transaction('start_activity')
+        def outer():
+            return inner()
+
+        with patch('apps.pomodoro.services.transactions.apply_transaction_timeouts') as apply:
+            self.assertEqual(outer(), 'ok')
+        apply.assert_called_once_with('start_activity')
+
+
+class ServiceTimeoutApiTests(APITestCase):
+    def setUp(self):
+        _, api_key = APIKey.objects.create_key(name='timeout-key')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Api-Key {api_key}')
+
+    def timeout(self, code):
+        return ServiceTimeout(code, 'timeout', operation='present_next_item', retry_after=2)
+
+    def test_lock_timeout_returns_retryable_conflict(self):
+        with patch('apps.pomodoro.views.present_next_item', side_effect=self.timeout('lock_timeout')):
+            response = self.client.get('/api/activities/next/')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(response.data['code'], 'lock_timeout')
+        self.assertTrue(response.data['recoverable'])
+
+    def test_statement_timeout_returns_service_unavailable(self):
+        with patch('apps.pomodoro.views.skip_item', side_effect=self.timeout('statement_timeout')):
+            response = self.client.post('/api/activity-queue/items/1/skip/')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(response.data['operation'], 'present_next_item')
+
+
+@patch('apps.pomodoro.services.transactions.time.sleep')
+class ServiceTransactionRetryTests(TransactionTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_retries_deadlocks_until_success(self, sleep):
+        calls = []
+
+        @service_transaction('start_activity')
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise database_error('40P01')
+            return 'done'
+
+        self.assertEqual(flaky(), 'done')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(
+            metrics.get_count(
+                'service_transaction_retries',
+                operation='start_activity',
+                sqlstate='40P01',
+            ),
+            2,
+        )
+
+    @override_settings(SERVICE_TRANSACTION_RETRY={'attempts': 2})
+    def test_exhausted_retries_become_retryable_conflict(self, _sleep):
+        @service_transaction('skip_item')
+        def always_conflicts():
+            raise database_error('40001')
+
+        with self.assertLogs('apps.pomodoro.services.transactions', level='WARNING') as logs:
+            with self.assertRaises(ServiceRetryExhausted) as ctx:
+                always_conflicts()
+
+        self.assertIn('operation=skip_item sqlstate=40001 attempts=2', logs.output[0])
+
+        self.assertEqual(ctx.exception.code, 'transaction_conflict')
+        self.assertEqual(
+            metrics.get_count(
+                'service_transaction_retries_exhausted',
+                operation='skip_item',
+                sqlstate='40001',
+            ),
+            1,
+        )
+
+    def test_does_not_retry_inside_a_transaction_it_does_not_own(self, sleep):
+        calls = []
+
+        @service_transaction('reconcile_activity')
+        def deadlocked():
+            calls.append(1)
+            raise database_error('40P01')
+
+        with self.assertRaises(OperationalError), transaction.atomic():
+            deadlocked()
+
+        self.assertEqual(len(calls), 1)
+        sleep.assert_not_called()
+
+    def test_backoff_uses_full_jitter_under_exponential_ceiling(self, _sleep):
+        rng = MagicMock()
+        rng.uniform.side_effect = lambda low, high: high
+
+        self.assertEqual(backoff_delay(1, rng=rng), 0.02)
+        self.assertEqual(backoff_delay(3, rng=rng), 0.08)
+        self.assertEqual(backoff_delay(10, rng=rng), 0.2)
+
+    def test_concurrent_callers_retry_independently(self, _sleep):
+        local = threading.local()
+        results = []
+
+        @service_transaction('present_next_item')
+        def first_attempt_deadlocks():
+            local.attempts = getattr(local, 'attempts', 0) + 1
+            if local.attempts == 1:
+                raise database_error('40P01')
+            return local.attempts
+
+        def worker():
+            try:
+                results.append(first_attempt_deadlocks())
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [2] * 6)
+        self.assertEqual(
+            metrics.get_count(
+                'service_transaction_retries',
+                operation='present_next_item',
+                sqlstate='40P01',
+            ),
+            6,
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Deadlock real exige PostgreSQL.')
+class PostgresDeadlockRetryTests(TransactionTestCase):
+    def test_opposite_lock_order_is_resolved_by_retry(self):
+        first = Group.objects.create(name='Deadlock A')
+        second = Group.objects.create(name='Deadlock B')
+        barrier = threading.Barrier(2, timeout=10)
+        errors = []
+
+        @service_transaction('deadlock_probe')
+        def lock_pair(ids):
+            Group.objects.select_for_update().get(pk=ids[0])
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+            Group.objects.select_for_update().get(pk=ids[1])
+
+        def worker(ids):
+            try:
+                lock_pair(ids)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker, args=([first.pk, second.pk],)),
+            threading.Thread(target=worker, args=([second.pk, first.pk],)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
@@ -0,0 +1,130 @@
+import json
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from apps.pomodoro.models import (
+    Activity,
+    ActivityPreferenceEvent,
+    ActivityQueue,
+    Category,
+    Group,
+)
+from apps.pomodoro.services.activity_queue import _favorite_weights, _weighted_order
+from apps.pomodoro.services.preference_weights import record_preference_event
+from apps.pomodoro.services.weighted_shuffle import (
+    efraimidis_spirakis_keys,
+    weighted_permutation,
+)
+
+
+class WeightedShuffleTests(SimpleTestCase):
+    def test_same_seed_produces_same_permutation(self):
+        weights = [1, 4, 1, 1, 4, 1] * 50
+
+        first = weighted_permutation(weights, rng=random.Random(7))
+        second = weighted_permutation(weights, rng=random.Random(7))
+
+        self.assertEqual(first, second)
+        self.assertEqual(sorted(first), list(range(len(weights))))
+
+    def test_keys_preserve_power_key_order(self):
+        draws = [0.1, 0.25, 0.5, 0.9]
+        weights = [1, 4, 2, 1]
+
+        class Fixed:
+            def __init__(self):
+                self.values = iter(draws)
+
+            def random(self):
+                return next(self.values)
+
+        keys = efraimidis_spirakis_keys(weights, rng=Fixed())
+        power = [(1 - u) ** (1 / w) for u, w in zip(draws, weights)]
+
+        self.assertEqual(
+            sorted(range(4), key=keys.__getitem__),
+            sorted(range(4), key=power.__getitem__),
+        )
+
+    def test_zero_draw_does_not_fail(self):
+        class Zero:
+            def random(self):
+                return 0.0
+
+        self.assertEqual(list(efraimidis_spirakis_keys([1, 4], rng=Zero())), [0.0, 0.0])
+
+    def test_heavier_items_come_first_more_often(self):
+        rng = random.Random(11)
+        heavy_first = sum(
+            weighted_permutation([1, 4], rng=rng)[0] == 1 for _ in range(2000)
+        )
+
+        # P(peso 4 antes de peso 1) = 4 / 5.
+        self.assertAlmostEqual(heavy_first / 2000, 0.8, delta=0.04)
+
+
+class WeightedOrderTests(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name='Casa')
+        category = Category.objects.create(name='Tarefas', group=self.group)
+        self.activities = [
+            Activity.objects.create(name=f'Atividade {index}', category=category)
+            for index in range(4)
+        ]
+        self.queue = ActivityQueue.objects.create(
+            group=self.group,
+            scope_key='scope',
+            state=ActivityQueue.STATE_CLOSED,
+        )
+
+    def event(self, activity, event_type):
+        record_preference_event(
+            ActivityPreferenceEvent.objects.create(
+                activity=activity,
+                queue=self.queue,
+                event_type=event_type,
+            ),
+            self.queue,
+        )
+
+    def test_favorite_weights_come_from_a_single_query(self):
+        favorite, skipped = self.activities[:2]
+        self.event(favorite, ActivityPreferenceEvent.EVENT_FAVORITE_COMPLETED)
+        self.event(favorite, ActivityPreferenceEvent.EVENT_FAVORITE_COMPLETED)
+        self.event(skipped, ActivityPreferenceEvent.EVENT_SKIPPED)
+
+        with self.assertNumQueries(1):
+            weights = _favorite_weights('scope', self.group)
+
+        self.assertEqual(weights, {favorite.id: 4})
+        self.assertEqual(_favorite_weights('outro', self.group), {})
+
+    def test_weighted_order_is_seedable(self):
+        first = _weighted_order(self.activities, 'scope', self.group, rng=random.Random(5))
+        second = _weighted_order(self.activities, 'scope', self.group, rng=random.Random(5))
+
+        self.assertEqual([a.id for a in first], [a.id for a in second])
+        self.assertCountEqual(first, self.activities)
+
+
+class BenchmarkWeightedShuffleCommandTests(TestCase):
+    def test_benchmark_command_reports_throughput(self):
+        stdout = StringIO()
+
+        call_command(
+            'benchmark_weighted_shuffle',
+            '--activities=1000',
+            '--repeat=2',
+            stdout=stdout,
+        )
+
+        report = json.loads(stdout.getvalue())
+        self.assertEqual((report['activities'], report['eligible']), (1000, 1000))
+        self.assertGreater(report['favorites'], 0)
+        self.assertEqual(set(report['phases']), {'weighted_order', 'create_queue'})
+        self.assertTrue(all(phase['activities_per_second'] > 0 for phase in report['phases'].values()))
+        self.assertFalse(Activity.objects.exists())
+        self.assertFalse(ActivityQueue.objects.exists())
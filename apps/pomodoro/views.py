@@ -6,6 +6,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_api_key.permissions import HasAPIKey
 
+from config.db_router import use_replica_for_reads
 from .models import Activity, ActivityQueueItem, Group, History, Schedule
 from .serializers import (
     ActivityExecutionSerializer,
@@ -18,29 +19,98 @@ from .services.activity_execution import (
     ActivityExecutionConflict,
     build_scope_key,
     complete_schedule,
-    get_active_schedule,
+    derived_scope_key,
     reconcile_schedule,
     start_activity,
 )
 from .services.activity_queue import (
     QueueConflict,
+    check_queue_version,
     expire_finished_premiums,
     get_requested_group,
     present_next_item,
     skip_item,
 )
+from .services.active_wait import LongPollBusy, long_poll_params, wait_for_active_change
 from .services.activity_queue_reconciliation import activity_snapshot, reconcile_activity
+from .services.execution_cache import active_execution_payload, execution_payload
+from .services.scope_registry import record_scope_seen
+from .services.transactions import RetryableServiceError
 
 logger = logging.getLogger(__name__)
 
 
+class RetryableServiceErrorMixin:
+    """Converte falhas transitórias de transação em respostas que o cliente pode repetir."""
+
+    def handle_exception(self, exc):
+        if not isinstance(exc, RetryableServiceError):
+            return super().handle_exception(exc)
+        response_status = (
+            status.HTTP_503_SERVICE_UNAVAILABLE
+            if exc.code == 'statement_timeout'
+            else status.HTTP_409_CONFLICT
+        )
+        return Response(
+            {"code": exc.code, "detail": exc.detail, **exc.payload},
+            status=response_status,
+            headers={'Retry-After': str(exc.retry_after)},
+        )
+
+
+class ScopeRegistryMixin:
+    """Registra em ScopeRegistry, uma vez por requisição, o escopo usado pela view.
+
+    Só requisições que derivaram o escopo são registradas; ``scope_group``
+    guarda o grupo da fila apresentada quando a action o conhece.
+    """
+
+    scope_group = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        scope_key = derived_scope_key(request)
+        if scope_key is not None:
+            record_scope_seen(scope_key, group=self.scope_group)
+        return response
+
+
 class GroupViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [HasAPIKey]
     serializer_class = GroupSerializer
     queryset = Group.objects.all()
 
+    @use_replica_for_reads
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @use_replica_for_reads
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+def _if_match_version(request):
+    """Lê a versão da fila de If-Match ("7", W/"7" ou 7); * e ausência ignoram."""
+    header = (request.headers.get('If-Match') or '').strip()
+    if not header or header == '*':
+        return None
+    value = header.removeprefix('W/').strip('"')
+    if not value.isdigit():
+        raise ValueError(header)
+    return int(value)
+
 
-class ActivityViewSet(viewsets.ModelViewSet):
+def _invalid_if_match_response():
+    return Response(
+        {
+            "code": "invalid_if_match",
+            "detail": "O cabecalho If-Match deve conter a versao numerica da fila.",
+        },
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+class ActivityViewSet(ScopeRegistryMixin, RetryableServiceErrorMixin, viewsets.ModelViewSet):
     permission_classes = [HasAPIKey]
     serializer_class = ActivitySerializer
     queryset = Activity.objects.all().select_related('category', 'category__group')
@@ -74,10 +144,12 @@ class ActivityViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def next(self, request):
+        scope_key = build_scope_key(request)
         result = present_next_item(
-            scope_key=build_scope_key(request),
+            scope_key=scope_key,
             selected_group=get_requested_group(request),
         )
+        self.scope_group = result.group
         if not result.item:
             return Response(
                 {
@@ -92,17 +164,20 @@ class ActivityViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_404_NOT_FOUND,
             )
-        return Response(ActivityQueueItemSerializer(
-            result.item,
-            context={
-                'request': request,
-                'group_daily_metrics': {
-                    'group_max_daily_minutes': result.group.max_daily_minutes,
-                    'group_consumed_daily_minutes': result.consumed_daily_minutes,
-                    'group_remaining_daily_minutes': result.remaining_daily_minutes,
+        return Response(
+            ActivityQueueItemSerializer(
+                result.item,
+                context={
+                    'request': request,
+                    'group_daily_metrics': {
+                        'group_max_daily_minutes': result.group.max_daily_minutes,
+                        'group_consumed_daily_minutes': result.consumed_daily_minutes,
+                        'group_remaining_daily_minutes': result.remaining_daily_minutes,
+                    },
                 },
-            },
-        ).data)
+            ).data,
+            headers={'ETag': f'"{result.item.queue.version}"'},
+        )
 
     @action(detail=True, methods=['post'])
     def start(self, request, pk=None):
@@ -117,6 +192,11 @@ class ActivityViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        try:
+            expected_version = _if_match_version(request)
+        except ValueError:
+            return _invalid_if_match_response()
+
         try:
             queue_item = ActivityQueueItem.objects.select_related('queue').get(pk=queue_item_id)
         except ActivityQueueItem.DoesNotExist:
@@ -125,11 +205,24 @@ class ActivityViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+        try:
+            check_queue_version(
+                queue_item_id=queue_item.id,
+                expected_version=expected_version,
+                idempotent_state=ActivityQueueItem.STATE_STARTED,
+            )
+        except QueueConflict as exc:
+            return Response(
+                {"code": exc.code, "detail": exc.detail, **exc.payload},
+                status=status.HTTP_409_CONFLICT,
+            )
+
         try:
             schedule, created = start_activity(
                 activity=activity,
                 queue_item=queue_item,
                 scope_key=build_scope_key(request),
+                expected_version=expected_version,
             )
         except ActivityExecutionConflict as exc:
             payload = {
@@ -143,6 +236,8 @@ class ActivityViewSet(viewsets.ModelViewSet):
                     context={'request': request},
                 ).data
             return Response(payload, status=status.HTTP_409_CONFLICT)
+        except RetryableServiceError:
+            raise
         except Exception:
             logger.exception(
                 'Unexpected failure while starting activity',
@@ -198,12 +293,44 @@ class ActivityViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def active(self, request):
-        schedule = get_active_schedule(build_scope_key(request))
-        if not schedule:
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(ActivityExecutionSerializer(schedule, context={'request': request}).data)
+        try:
+            params = long_poll_params(request.query_params)
+        except ValueError:
+            return Response(
+                {
+                    "code": "invalid_long_poll",
+                    "detail": "wait e since_version devem ser numeros nao negativos.",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        scope_key = build_scope_key(request)
+        if params is not None:
+            try:
+                wait_for_active_change(scope_key, *params)
+            except LongPollBusy as exc:
+                # Responder na hora com o mesmo ETag levaria o cliente a repetir a espera em laço.
+                return Response(
+                    {
+                        "code": "long_poll_busy",
+                        "detail": "Nenhuma vaga para espera longa; consulte de novo apos o Retry-After.",
+                        "retry_after_seconds": exc.retry_after,
+                        "recoverable": True,
+                    },
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={'Retry-After': str(exc.retry_after)},
+                )
+        payload, version = active_execution_payload(
+            scope_key,
+            lambda schedule: ActivityExecutionSerializer(schedule, context={'request': request}).data,
+        )
+        # A versao do escopo vai no ETag, inclusive no 204, para o since_version da proxima espera.
+        headers = {'ETag': f'"{version}"'}
+        if payload is None:
+            return Response(status=status.HTTP_204_NO_CONTENT, headers=headers)
+        return Response(payload, headers=headers)
 
     @action(detail=False, methods=['get'])
+    @use_replica_for_reads
     def history(self, request):
         history_entries = (
             History.objects.select_related('activity__category__group')
@@ -221,32 +348,43 @@ class ActivityViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path=r'status/(?P<schedule_id>[^/.]+)')
     def status(self, request, schedule_id=None):
-        try:
-            schedule = Schedule.objects.select_related(
-                'activity__category__group',
-                'queue_item__queue__group',
-            ).get(pk=schedule_id, scope_key=build_scope_key(request))
-        except Schedule.DoesNotExist:
+        payload = None
+        if str(schedule_id).isdigit():
+            payload = execution_payload(
+                build_scope_key(request),
+                int(schedule_id),
+                lambda schedule: ActivityExecutionSerializer(schedule, context={'request': request}).data,
+            )
+        if payload is None:
             return Response(
                 {"error": "Schedule nao encontrado"},
                 status=status.HTTP_404_NOT_FOUND,
             )
-        schedule = reconcile_schedule(schedule)
-        response_data = ActivityExecutionSerializer(schedule, context={'request': request}).data
-        response_data['schedule_id'] = schedule.id
-        return Response(response_data)
+        payload['schedule_id'] = payload['id']
+        return Response(payload)
 
 
-class ActivityQueueItemViewSet(viewsets.GenericViewSet):
+class ActivityQueueItemViewSet(ScopeRegistryMixin, RetryableServiceErrorMixin, viewsets.GenericViewSet):
     permission_classes = [HasAPIKey]
     queryset = ActivityQueueItem.objects.select_related('queue', 'activity__category__group')
 
     @action(detail=True, methods=['post'])
     def skip(self, request, pk=None):
         try:
+            expected_version = _if_match_version(request)
+        except ValueError:
+            return _invalid_if_match_response()
+
+        try:
+            check_queue_version(
+                queue_item_id=int(pk),
+                expected_version=expected_version,
+                idempotent_state=ActivityQueueItem.STATE_SKIPPED,
+            )
             item = skip_item(
                 queue_item_id=int(pk),
                 scope_key=build_scope_key(request),
+                expected_version=expected_version,
             )
         except ActivityQueueItem.DoesNotExist:
             return Response(
@@ -258,6 +396,8 @@ class ActivityQueueItemViewSet(viewsets.GenericViewSet):
                 {"code": exc.code, "detail": exc.detail, **exc.payload},
                 status=status.HTTP_409_CONFLICT,
             )
+        except RetryableServiceError:
+            raise
         except Exception:
             logger.exception(
                 'Unexpected failure while skipping queue item',
@@ -290,7 +430,7 @@ class ActivityQueueItemViewSet(viewsets.GenericViewSet):
         return Response(payload, status=status.HTTP_200_OK)
 
 
-class ActivityExecutionViewSet(viewsets.GenericViewSet):
+class ActivityExecutionViewSet(ScopeRegistryMixin, RetryableServiceErrorMixin, viewsets.GenericViewSet):
     permission_classes = [HasAPIKey]
     queryset = Schedule.objects.select_related(
         'activity__category__group',
@@ -298,12 +438,16 @@ class ActivityExecutionViewSet(viewsets.GenericViewSet):
     )
 
     def retrieve(self, request, pk=None):
-        try:
-            schedule = self.get_queryset().get(pk=pk, scope_key=build_scope_key(request))
-        except Schedule.DoesNotExist:
+        payload = None
+        if str(pk).isdigit():
+            payload = execution_payload(
+                build_scope_key(request),
+                int(pk),
+                lambda schedule: ActivityExecutionSerializer(schedule, context={'request': request}).data,
+            )
+        if payload is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        schedule = reconcile_schedule(schedule)
-        return Response(ActivityExecutionSerializer(schedule, context={'request': request}).data)
+        return Response(payload)
 
     @action(detail=True, methods=['post'])
     def reconcile(self, request, pk=None):
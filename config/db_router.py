@@ -0,0 +1,121 @@
+"""Roteamento opcional de leituras para a réplica PostgreSQL.
+
+Somente leituras marcadas explicitamente com ``replica_reads`` podem sair do
+banco principal. Qualquer leitura dentro de ``transaction.atomic`` (incluindo
+``select_for_update``) permanece no principal, assim como todas as escritas.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from config.settings.database import REPLICA_DATABASE_ALIAS
+
+
+logger = logging.getLogger(__name__)
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_lag_lock = threading.Lock()
+_lag_state = {'checked_at': None, 'fresh': False}
+
+
+@contextmanager
+def replica_reads():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads_active() -> bool:
+    return _replica_reads.get()
+
+
+def use_replica_for_reads(view_func):
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view_func(*args, **kwargs)
+
+    return wrapper
+
+
+def measure_replica_lag() -> float:
+    with connections[REPLICA_DATABASE_ALIAS].cursor() as cursor:
+        cursor.execute(REPLICA_LAG_SQL)
+        (lag,) = cursor.fetchone()
+    return float(lag or 0)
+
+
+def replica_is_fresh() -> bool:
+    """Mede o atraso da réplica no máximo uma vez por intervalo configurado."""
+    interval = getattr(settings, 'DATABASE_REPLICA_LAG_CHECK_INTERVAL_SECONDS', 2)
+    now = time.monotonic()
+    with _lag_lock:
+        checked_at = _lag_state['checked_at']
+        if checked_at is not None and now - checked_at < interval:
+            return _lag_state['fresh']
+
+        max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG_SECONDS', 5)
+        try:
+            lag = measure_replica_lag()
+        except DatabaseError:
+            logger.warning('Réplica indisponível; leituras voltam ao banco principal.')
+            fresh = False
+        else:
+            fresh = lag <= max_lag
+            if not fresh:
+                logger.warning(
+                    'Réplica atrasada; leituras voltam ao banco principal.',
+                    extra={'replica_lag_seconds': lag, 'max_lag_seconds': max_lag},
+                )
+        _lag_state.update(checked_at=now, fresh=fresh)
+        return fresh
+
+
+def reset_replica_lag_state() -> None:
+    with _lag_lock:
+        _lag_state.update(checked_at=None, fresh=False)
+
+
+class ReadReplicaRouter:
+    def _replica_configured(self) -> bool:
+        return REPLICA_DATABASE_ALIAS in settings.DATABASES
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads_active() or not self._replica_configured():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if not replica_is_fresh():
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DATABASE_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Instâncias lidas da réplica carregam _state.db='replica'; a escrita
+        # precisa ser forçada para o principal.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DATABASE_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DATABASE_ALIAS:
+            return False
+        return None
@@ -0,0 +1,14 @@
+import os
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from apps.pomodoro.services import metrics
+
+
+@require_GET
+def metrics_snapshot(request):
+    """Contadores em memória do worker que atendeu a requisição; só para a equipe."""
+    if not (request.user.is_active and request.user.is_staff):
+        return JsonResponse({"detail": "forbidden"}, status=403)
+    return JsonResponse({"pid": os.getpid(), "counters": metrics.snapshot()})
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from .database import DEFAULT_REPLICA_MAX_LAG_SECONDS
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -29,6 +31,27 @@ STEAM_ID64 = os.getenv('STEAM_ID64', '76561198065747727')
 STEAM_ACTIVITY_CATEGORY_ID = os.getenv('STEAM_ACTIVITY_CATEGORY_ID', '21')
 STEAM_ACTIVITY_DEFAULT_DURATION = os.getenv('STEAM_ACTIVITY_DEFAULT_DURATION', '60')
 STEAM_API_TIMEOUT_SECONDS = 10
+STEAM_IMPORT_BATCH_SIZE = int(os.getenv('STEAM_IMPORT_BATCH_SIZE', '500'))
+# Importações disparadas pelo admin rodam em uma thread de fundo; com False
+# rodam logo após o commit, na própria requisição. Jobs abertos sem progresso
+# há mais de IMPORT_JOB_STALE_SECONDS são tidos como interrompidos.
+IMPORT_JOBS_ASYNC = True
+IMPORT_JOB_STALE_SECONDS = int(os.getenv('IMPORT_JOB_STALE_SECONDS', '900'))
+
+# Cliente HTTP de saída: conexões keep-alive por host, até `attempts` tentativas
+# com backoff e jitter em 429/5xx e falhas de rede, e circuito aberto por
+# `reset_timeout_seconds` após `failure_threshold` chamadas falhas seguidas.
+OUTBOUND_HTTP_CLIENTS = {
+    'default': {
+        'attempts': 3,
+        'base_delay_ms': 250,
+        'max_delay_ms': 4000,
+        'pool_size': 4,
+        'idle_timeout_seconds': 30,
+        'failure_threshold': 5,
+        'reset_timeout_seconds': 30,
+    },
+}
 
 ALLOWED_HOSTS = os.getenv('DJANGO_ALLOWED_HOSTS', '').split(',')
 
@@ -128,6 +151,87 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Leituras marcadas explicitamente podem usar a réplica quando ela estiver
+# configurada; sem réplica o roteador sempre devolve o banco principal.
+DATABASE_ROUTERS = ['config.db_router.ReadReplicaRouter']
+DATABASE_REPLICA_MAX_LAG_SECONDS = DEFAULT_REPLICA_MAX_LAG_SECONDS
+DATABASE_REPLICA_LAG_CHECK_INTERVAL_SECONDS = 2
+
+# Limites aplicados com SET LOCAL às transações de serviço que bloqueiam filas,
+# categorias e grupos, bem abaixo do timeout de 60s dos workers do Gunicorn.
+SERVICE_TRANSACTION_TIMEOUTS = {
+    'default': {
+        'statement_timeout_ms': int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000')),
+        'lock_timeout_ms': int(os.getenv('DB_LOCK_TIMEOUT_MS', '2000')),
+    },
+    # Reconciliação de atividade bloqueia todas as filas normais ativas.
+    'reconcile_activity': {
+        'statement_timeout_ms': int(os.getenv('DB_RECONCILE_STATEMENT_TIMEOUT_MS', '15000')),
+        'lock_timeout_ms': int(os.getenv('DB_RECONCILE_LOCK_TIMEOUT_MS', '5000')),
+    },
+}
+SERVICE_TIMEOUT_RETRY_AFTER_SECONDS = 2
+
+# Deadlocks e falhas de serialização são repetidos com backoff exponencial e
+# jitter completo antes de responder 409 transaction_conflict.
+SERVICE_TRANSACTION_RETRY = {
+    'attempts': 3,
+    'base_delay_ms': 20,
+    'max_delay_ms': 200,
+}
+
+# Filas encerradas e execuções mais antigas que o horizonte são movidas para
+# ArchivedRecord pelo comando archive_old_records.
+ARCHIVE_RETENTION_DAYS = max(int(os.getenv('ARCHIVE_RETENTION_DAYS', '90')), 1)
+
+# Meia-vida dos scores de preferência usados no sorteio das filas. Vazio
+# desliga o decaimento: uma atividade favorita permanece favorita.
+PREFERENCE_WEIGHT_HALF_LIFE_DAYS = (
+    float(os.getenv('PREFERENCE_WEIGHT_HALF_LIFE_DAYS'))
+    if os.getenv('PREFERENCE_WEIGHT_HALF_LIFE_DAYS')
+    else None
+)
+
+# Fração consumida (ou expirada) de uma fila a partir da qual a próxima pool
+# normal é montada em segundo plano e apenas promovida quando a atual se
+# esgota. Vazio desliga a pré-montagem.
+QUEUE_PREFETCH_THRESHOLD = (
+    float(os.getenv('QUEUE_PREFETCH_THRESHOLD', '0.8'))
+    if os.getenv('QUEUE_PREFETCH_THRESHOLD', '0.8')
+    else None
+)
+# Com False a pré-montagem roda logo após o commit, na própria requisição.
+QUEUE_PREFETCH_ASYNC = True
+
+# Pools com mais atividades que QUEUE_LAZY_MIN_POOL guardam a ordem sorteada
+# compactada e criam os itens em janelas de QUEUE_MATERIALIZE_WINDOW. Vazio
+# desliga a materialização sob demanda.
+QUEUE_LAZY_MIN_POOL = (
+    int(os.getenv('QUEUE_LAZY_MIN_POOL', '200'))
+    if os.getenv('QUEUE_LAZY_MIN_POOL', '200')
+    else None
+)
+QUEUE_MATERIALIZE_WINDOW = int(os.getenv('QUEUE_MATERIALIZE_WINDOW', '25'))
+
+# Respostas de /active/, /status/<id>/ e da leitura de execução ficam no cache
+# do Django por alguns segundos, com chave (escopo, execução, versão); o saldo
+# do grupo pode atrasar até esse prazo. 0 desliga.
+EXECUTION_RESPONSE_CACHE_SECONDS = int(os.getenv('EXECUTION_RESPONSE_CACHE_SECONDS', '5'))
+
+# Espera longa de /active/ (?wait=&since_version=): teto da espera, abaixo do
+# proxy_read_timeout do nginx; intervalo entre as consultas das versões dos
+# escopos em espera; quantas threads de cada worker podem esperar ao mesmo
+# tempo, abaixo de GUNICORN_THREADS para sobrar thread às demais rotas; e o
+# Retry-After do 503 enviado quando todas estão ocupadas.
+ACTIVE_LONG_POLL_MAX_SECONDS = int(os.getenv('ACTIVE_LONG_POLL_MAX_SECONDS', '25'))
+ACTIVE_LONG_POLL_INTERVAL_SECONDS = float(os.getenv('ACTIVE_LONG_POLL_INTERVAL_SECONDS', '1'))
+ACTIVE_LONG_POLL_MAX_WAITERS = int(os.getenv('ACTIVE_LONG_POLL_MAX_WAITERS', '4'))
+ACTIVE_LONG_POLL_RETRY_AFTER_SECONDS = int(os.getenv('ACTIVE_LONG_POLL_RETRY_AFTER_SECONDS', '5'))
+
+# Intervalo mínimo, por processo, entre as atualizações de last_seen_at de um
+# escopo em ScopeRegistry. 0 atualiza a cada requisição.
+SCOPE_REGISTRY_TOUCH_SECONDS = int(os.getenv('SCOPE_REGISTRY_TOUCH_SECONDS', '300'))
+
 REST_FRAMEWORK = {
     # Configuração CORRETA - HasAPIKey como permission class
     'DEFAULT_PERMISSION_CLASSES': [
@@ -13,6 +13,8 @@ REQUIRED_POSTGRES_VARIABLES = (
     "DB_HOST",
     "DB_PORT",
 )
+REPLICA_DATABASE_ALIAS = "replica"
+DEFAULT_REPLICA_MAX_LAG_SECONDS = 5
 
 
 def build_database_config(
@@ -50,6 +52,45 @@ def _build_postgres_config(*, environ: Mapping[str, str]) -> dict[str, object]:
     }
 
 
+def build_replica_database_config(
+    *,
+    app_env: str,
+    environ: Mapping[str, str],
+) -> dict[str, object] | None:
+    """Build the optional read replica; credentials default to the primary ones."""
+    if app_env not in POSTGRES_ENVIRONMENTS or not environ.get("DB_REPLICA_HOST"):
+        return None
+
+    primary = _build_postgres_config(environ=environ)
+    return {
+        **primary,
+        "NAME": environ.get("DB_REPLICA_NAME") or primary["NAME"],
+        "USER": environ.get("DB_REPLICA_USER") or primary["USER"],
+        "PASSWORD": environ.get("DB_REPLICA_PASS") or primary["PASSWORD"],
+        "HOST": environ["DB_REPLICA_HOST"],
+        "PORT": environ.get("DB_REPLICA_PORT") or primary["PORT"],
+        # Testes nunca criam um banco próprio para a réplica.
+        "TEST": {"MIRROR": "default"},
+    }
+
+
+def build_replica_max_lag_seconds(*, environ: Mapping[str, str]) -> float:
+    raw_value = environ.get("DB_REPLICA_MAX_LAG_SECONDS")
+    if not raw_value:
+        return DEFAULT_REPLICA_MAX_LAG_SECONDS
+    try:
+        value = float(raw_value)
+    except ValueError as exc:
+        raise ImproperlyConfigured(
+            "DB_REPLICA_MAX_LAG_SECONDS deve ser um número não negativo."
+        ) from exc
+    if value < 0:
+        raise ImproperlyConfigured(
+            "DB_REPLICA_MAX_LAG_SECONDS deve ser um número não negativo."
+        )
+    return value
+
+
 def _build_test_database_config(
     *,
     environ: Mapping[str, str],
@@ -4,7 +4,12 @@ import os
 load_dotenv('.env.local')
 
 from .base import *
-from .database import build_database_config
+from .database import (
+    REPLICA_DATABASE_ALIAS,
+    build_database_config,
+    build_replica_database_config,
+    build_replica_max_lag_seconds,
+)
 
 
 APP_ENV = "development"
@@ -16,3 +21,7 @@ DATABASES = {
         base_dir=BASE_DIR,
     )
 }
+REPLICA_DATABASE = build_replica_database_config(app_env=APP_ENV, environ=os.environ)
+if REPLICA_DATABASE:
+    DATABASES[REPLICA_DATABASE_ALIAS] = REPLICA_DATABASE
+DATABASE_REPLICA_MAX_LAG_SECONDS = build_replica_max_lag_seconds(environ=os.environ)
@@ -7,7 +7,12 @@ from django.core.exceptions import ImproperlyConfigured
 load_dotenv()
 
 from .base import *
-from .database import build_database_config
+from .database import (
+    REPLICA_DATABASE_ALIAS,
+    build_database_config,
+    build_replica_database_config,
+    build_replica_max_lag_seconds,
+)
 
 
 APP_ENV = "production"
@@ -36,6 +41,10 @@ DATABASES = {
         base_dir=BASE_DIR,
     )
 }
+REPLICA_DATABASE = build_replica_database_config(app_env=APP_ENV, environ=os.environ)
+if REPLICA_DATABASE:
+    DATABASES[REPLICA_DATABASE_ALIAS] = REPLICA_DATABASE
+DATABASE_REPLICA_MAX_LAG_SECONDS = build_replica_max_lag_seconds(environ=os.environ)
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.getenv('DJANGO_STATIC_ROOT', BASE_DIR / 'staticfiles')
@@ -15,3 +15,10 @@ DATABASES = {
         base_dir=BASE_DIR,
     )
 }
+QUEUE_PREFETCH_ASYNC = False
+IMPORT_JOBS_ASYNC = False
+EXECUTION_RESPONSE_CACHE_SECONDS = 0
+ACTIVE_LONG_POLL_INTERVAL_SECONDS = 0.02
+OUTBOUND_HTTP_CLIENTS = {
+    'default': {**OUTBOUND_HTTP_CLIENTS['default'], 'base_delay_ms': 1, 'max_delay_ms': 5},
+}
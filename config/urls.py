@@ -21,10 +21,12 @@ from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.conf.urls.static import static
 
 from config.health import health_check
+from config.metrics import metrics_snapshot
 from user_profile.views import home
 
 urlpatterns = [
     path('healthz/', health_check, name='health-check'),
+    path('metrics/', metrics_snapshot, name='metrics-snapshot'),
     path('', home, name='home'),
     path('admin/', admin.site.urls),
     path('api/', include('apps.pomodoro.urls')),
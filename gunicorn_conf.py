@@ -3,7 +3,9 @@ import os
 
 bind = "0.0.0.0:8000"
 workers = int(os.getenv("GUNICORN_WORKERS", "2"))
-threads = int(os.getenv("GUNICORN_THREADS", "2"))
+# Workers gthread: até ACTIVE_LONG_POLL_MAX_WAITERS threads podem ficar na
+# espera longa de /active/; as restantes atendem as demais rotas.
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
 timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
 graceful_timeout = 30
 max_requests = 1000
@@ -6,6 +6,8 @@ from django.core.exceptions import ImproperlyConfigured
 from config.settings.database import (
     build_database_config,
     build_legacy_sqlite_config,
+    build_replica_database_config,
+    build_replica_max_lag_seconds,
 )
 
 
@@ -143,3 +145,68 @@ class BuildLegacySqliteConfigTests(TestCase):
 
         self.assertEqual(database["ENGINE"], "django.db.backends.sqlite3")
         self.assertEqual(database["NAME"], sqlite_copy)
+
+
+class BuildReplicaDatabaseConfigTests(TestCase):
+    def setUp(self):
+        self.environment = {
+            "DB_NAME": "pomodoro_task_prod",
+            "DB_USER": "pomodoro_task_user",
+            "DB_PASS": "secret",
+            "DB_HOST": "postgres",
+            "DB_PORT": "5432",
+        }
+
+    def test_replica_is_optional(self):
+        self.assertIsNone(
+            build_replica_database_config(
+                app_env="production",
+                environ=self.environment,
+            )
+        )
+
+    def test_replica_is_never_configured_for_tests(self):
+        self.assertIsNone(
+            build_replica_database_config(
+                app_env="test",
+                environ={**self.environment, "DB_REPLICA_HOST": "replica"},
+            )
+        )
+
+    def test_replica_reuses_primary_credentials_by_default(self):
+        database = build_replica_database_config(
+            app_env="production",
+            environ={**self.environment, "DB_REPLICA_HOST": "postgres-replica"},
+        )
+
+        self.assertEqual(database["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(database["HOST"], "postgres-replica")
+        self.assertEqual(database["NAME"], "pomodoro_task_prod")
+        self.assertEqual(database["USER"], "pomodoro_task_user")
+        self.assertEqual(database["PORT"], "5432")
+        self.assertEqual(database["TEST"], {"MIRROR": "default"})
+
+    def test_replica_accepts_dedicated_credentials(self):
+        database = build_replica_database_config(
+            app_env="development",
+            environ={
+                **self.environment,
+                "DB_REPLICA_HOST": "127.0.0.1",
+                "DB_REPLICA_PORT": "5433",
+                "DB_REPLICA_USER": "pomodoro_task_reader",
+                "DB_REPLICA_PASS": "reader-secret",
+            },
+        )
+
+        self.assertEqual(database["PORT"], "5433")
+        self.assertEqual(database["USER"], "pomodoro_task_reader")
+        self.assertEqual(database["PASSWORD"], "reader-secret")
+
+    def test_rejects_invalid_replica_lag_limit(self):
+        self.assertEqual(build_replica_max_lag_seconds(environ={}), 5)
+        self.assertEqual(
+            build_replica_max_lag_seconds(environ={"DB_REPLICA_MAX_LAG_SECONDS": "1.5"}),
+            1.5,
+        )
+        with self.assertRaisesRegex(ImproperlyConfigured, "DB_REPLICA_MAX_LAG_SECONDS"):
+            build_replica_max_lag_seconds(environ={"DB_REPLICA_MAX_LAG_SECONDS": "-1"})
@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+from django.db import DatabaseError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework_api_key.models import APIKey
+
+from apps.pomodoro.models import Group
+from config.db_router import (
+    ReadReplicaRouter,
+    replica_is_fresh,
+    replica_reads,
+    replica_reads_active,
+    reset_replica_lag_state,
+)
+
+
+@patch.object(ReadReplicaRouter, '_replica_configured', return_value=True)
+class ReadReplicaRouterTests(TransactionTestCase):
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+        reset_replica_lag_state()
+        self.addCleanup(reset_replica_lag_state)
+
+    def test_reads_stay_on_primary_unless_explicitly_marked(self, _configured):
+        self.assertEqual(self.router.db_for_read(Group), 'default')
+
+    @patch('config.db_router.replica_is_fresh', return_value=True)
+    def test_marked_reads_use_the_replica(self, _fresh, _configured):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Group), 'replica')
+        self.assertFalse(replica_reads_active())
+
+    @patch('config.db_router.replica_is_fresh', return_value=True)
+    def test_reads_inside_transactions_stay_on_primary(self, _fresh, _configured):
+        with replica_reads(), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Group), 'default')
+
+    @patch('config.db_router.replica_is_fresh', return_value=False)
+    def test_lagging_replica_falls_back_to_primary(self, _fresh, _configured):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Group), 'default')
+
+    def test_writes_always_use_primary(self, _configured):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Group), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'pomodoro'))
+
+    @override_settings(
+        DATABASE_REPLICA_MAX_LAG_SECONDS=5,
+        DATABASE_REPLICA_LAG_CHECK_INTERVAL_SECONDS=60,
+    )
+    def test_lag_guard_caches_measurement(self, _configured):
+        with patch('config.db_router.measure_replica_lag', return_value=1.0) as measure:
+            self.assertTrue(replica_is_fresh())
+            self.assertTrue(replica_is_fresh())
+        self.assertEqual(measure.call_count, 1)
+
+        reset_replica_lag_state()
+        with patch('config.db_router.measure_replica_lag', return_value=30.0), \
+                self.assertLogs('config.db_router', level='WARNING'):
+            self.assertFalse(replica_is_fresh())
+
+        reset_replica_lag_state()
+        with patch('config.db_router.measure_replica_lag', side_effect=DatabaseError), \
+                self.assertLogs('config.db_router', level='WARNING'):
+            self.assertFalse(replica_is_fresh())
+
+
+class ReplicaReadViewTests(TestCase):
+    def setUp(self):
+        _, api_key = APIKey.objects.create_key(name='replica-key')
+        self.headers = {'HTTP_AUTHORIZATION': f'Api-Key {api_key}'}
+        Group.objects.create(name='Leitura')
+
+    def test_group_and_history_reads_are_marked_for_the_replica(self):
+        observed = []
+
+        def record(router, model, **hints):
+            observed.append((model.__name__, replica_reads_active()))
+            return 'default'
+
+        with patch.object(ReadReplicaRouter, 'db_for_read', autospec=True, side_effect=record):
+            groups = self.client.get('/api/groups/', **self.headers)
+            history = self.client.get('/api/activities/history/', **self.headers)
+
+        self.assertEqual(groups.status_code, 200)
+        self.assertEqual(history.status_code, 404)
+        self.assertIn(('Group', True), observed)
+        self.assertIn(('History', True), observed)
+        self.assertIn(('APIKey', False), observed)
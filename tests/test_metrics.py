@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.pomodoro.services import metrics
+
+
+class MetricsSnapshotTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        metrics.increment(
+            "service_transaction_timeouts",
+            operation="start_activity",
+            code="lock_timeout",
+        )
+
+    def test_staff_sees_the_worker_counters(self):
+        staff = get_user_model().objects.create_user("ops", password="secret", is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get("/metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["counters"],
+            {"service_transaction_timeouts{code=lock_timeout,operation=start_activity}": 1},
+        )
+        self.assertIsInstance(response.json()["pid"], int)
+
+    def test_anonymous_and_regular_users_are_forbidden(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+
+        user = get_user_model().objects.create_user("user", password="secret")
+        self.client.force_login(user)
+
+        response = self.client.get("/metrics/")
+
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn("counters", response.json())